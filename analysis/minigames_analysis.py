@@ -20,17 +20,24 @@ Usage pattern (example):
     common   = top_errors(errors["minor"], top_n=5)
 """
 
-from decimal import Decimal
-import json
+from datetime import date
 import logging
 import re
 import os
+import threading
+import time
 from collections import Counter, defaultdict
-from statistics import mean
 
 from sqlalchemy import text
 
-from utils.db import engine  # existing module in your project
+from config import Config
+from utils.db import read_connection
+from utils import attempt_summary
+from utils import ingest
+from utils import prompt_budget
+from utils import results_cache
+from utils import vector_stats
+from analysis.records import fetch_records
 
 logger = logging.getLogger(__name__)
 
@@ -58,7 +65,7 @@ def get_list_of_minigames():
         """
     )
     try:
-        with engine.connect() as conn:
+        with read_connection() as conn:
             rows = conn.execute(query).fetchall()
         games = [dict(r._mapping) for r in rows]
         logger.info("Fetched %d minigames", len(games))
@@ -75,9 +82,10 @@ def get_minigame_attempts(game_id: int):
     """
     Pull every attempt of a given mini-game (level) across all users.
 
-    Returns a list of dicts:
+    Returns a list of compact MinigameAttempt records (see analysis.records):
         {
             "Session_ID": …,
+            "Plan_Game_ID": …,
             "User_ID": …,
             "Status": "complete" | "fail" | "toplay",
             "Score": 87,
@@ -89,6 +97,7 @@ def get_minigame_attempts(game_id: int):
     query = text(
         """
         SELECT psgs.Session_ID,
+               psgs.Plan_Game_ID,
                ps.User_ID,
                psgs.Status,
                psgs.Score,
@@ -104,9 +113,10 @@ def get_minigame_attempts(game_id: int):
         """
     )
     try:
-        with engine.connect() as conn:
-            rows = conn.execute(query, {"game_id": game_id}).fetchall()
-        attempts = [dict(r._mapping) for r in rows]
+        with read_connection() as conn:
+            attempts = fetch_records(
+                conn.execute(query, {"game_id": game_id}), "MinigameAttempt"
+            )
         logger.info("Fetched %d attempts for minigame %s", len(attempts), game_id)
         return attempts
     except Exception as exc:
@@ -114,84 +124,110 @@ def get_minigame_attempts(game_id: int):
         return []
 
 
-def get_minigame_attempts_by_mode(game_id: int, mode: str = "all"):
+ERROR_CATEGORIES = ("imprecision", "warning", "minor", "severe")
+
+WARNING_TREND_MONTHS = 12
+
+
+def _month_starts(months: int, today: date = None):
+    """
+    First day of each of the last `months` calendar months (oldest first),
+    ending with the current month.
     """
-    Pull every attempt of a given mini-game (level) across all users,
-    filtered by mode ('practice', 'training', or 'all').
+    today = today or date.today()
+    index = today.year * 12 + today.month - 1
+    return [
+        date(i // 12, i % 12 + 1, 1) for i in range(index - months + 1, index + 1)
+    ]
 
-    Returns a list of dicts:
-        {
-            "Session_ID": …,
-            "User_ID": …,
-            "Status": "complete" | "fail" | "Userexit" | "toplay",
-            "Score": 87,
-            "Results": '{…JSON…}',   # can be NULL
-            "Game_Start": "2025-05-22 02:12:34",
-            "Game_End":   "2025-05-22 02:17:41",
-            "Mode": "practice" | "training" | "unknown"
-        }
+
+def get_minigame_error_trend(game_id: int, months: int = WARNING_TREND_MONTHS):
     """
-    # Build optional WHERE clause
-    mode = (mode or "all").lower()
-    if mode == "practice":
-        mode_pred = (
-            "AND (LOWER(ps.Results) LIKE '%practice%' "
-            "  OR LOWER(psgs.Results) LIKE '%practice%')"
-        )
-    elif mode == "training":
-        mode_pred = (
-            "AND (LOWER(ps.Results) LIKE '%training%' "
-            "  OR LOWER(psgs.Results) LIKE '%training%')"
+    Per-month error counts for a mini-game (IMA_Plan_Game.Level) over the last
+    `months` calendar months, by month of Game_End. Months without attempts are
+    included with zero counts.
+
+    Returns a list, oldest month first:
+        [{"month": "2025-05", "attempts": 40, "imprecision": 3,
+          "warning": 12, "minor": 5, "severe": 1}, …]
+
+    Reads the per-month counters kept by the ingester when available; otherwise
+    counts from Results with a plain Game_End range (index-friendly), taking the
+    JSON length of each category once per attempt.
+    """
+    starts = _month_starts(months)
+    params = {"game_id": game_id, "since": starts[0]}
+
+    counts = None
+    if attempt_summary.summary_ready():
+        try:
+            counts = _error_trend_from_counters(params)
+        except Exception as e:
+            logger.warning(f"Attempt summary unavailable, parsing Results instead: {e}")
+
+    if counts is None:
+        try:
+            counts = _error_trend_from_results(params)
+        except Exception as exc:
+            logger.error("Failed to fetch error trend for game %s: %s", game_id, exc)
+            counts = {}
+
+    trend = []
+    for start in starts:
+        row = counts.get((start.year, start.month), {})
+        trend.append(
+            {
+                "month": f"{start.year:04d}-{start.month:02d}",
+                "attempts": int(row.get("attempts") or 0),
+                **{c: int(row.get(c) or 0) for c in ERROR_CATEGORIES},
+            }
         )
-    else:
-        mode_pred = ""
+    return trend
+
+
+def _error_trend_from_counters(params):
+    from utils.ingest import GAME_LEVEL_MONTH_TABLE
 
     query = text(
         f"""
-        SELECT 
-            psgs.Session_ID,
-            ps.User_ID,
-            psgs.Status,
-            psgs.Score,
-            psgs.Results,
-            psgs.Game_Start,
-            psgs.Game_End,
-            CASE 
-                WHEN LOWER(ps.Results) LIKE '%practice%' 
-                     OR LOWER(psgs.Results) LIKE '%practice%' 
-                     THEN 'practice'
-                WHEN LOWER(ps.Results) LIKE '%training%' 
-                     OR LOWER(psgs.Results) LIKE '%training%' 
-                     THEN 'training'
-                ELSE 'unknown'
-            END AS Mode
-        FROM IMA_Plan_Game AS pg
-        JOIN IMA_Plan_Session_Game_Status AS psgs
-          ON pg.Plan_Game_ID = psgs.Plan_Game_ID
-        JOIN IMA_Plan_Session AS ps
-          ON ps.Session_ID = psgs.Session_ID
-        WHERE pg.Level = :game_id
-        {mode_pred}
-        ORDER BY psgs.Game_Start, psgs.Session_ID;
-    """
+        SELECT Month, Attempts AS attempts, Imprecisions AS imprecision,
+               Warnings AS warning, Minors AS minor, Severes AS severe
+        FROM {GAME_LEVEL_MONTH_TABLE}
+        WHERE Game_Level = :game_id AND Month >= :since
+        """
     )
+    with read_connection() as conn:
+        rows = conn.execute(query, params).mappings().all()
+    return {(r["Month"].year, r["Month"].month): r for r in rows}
 
-    try:
-        with engine.connect() as conn:
-            rows = conn.execute(query, {"game_id": game_id}).fetchall()
-        attempts = [dict(r._mapping) for r in rows]
-        logger.info(
-            "Fetched %d attempts for minigame %s (mode=%s)",
-            len(attempts),
-            game_id,
-            mode,
-        )
-        return attempts
-    except Exception as exc:
-        logger.error(
-            "Failed to fetch attempts for game %s (mode=%s): %s", game_id, mode, exc
-        )
-        return []
+
+def _error_trend_from_results(params):
+    query = text(
+        """
+        SELECT YEAR(e.Game_End) AS y, MONTH(e.Game_End) AS m,
+               COUNT(*) AS attempts,
+               COALESCE(SUM(e.imprecision), 0) AS imprecision,
+               COALESCE(SUM(e.warning), 0) AS warning,
+               COALESCE(SUM(e.minor), 0) AS minor,
+               COALESCE(SUM(e.severe), 0) AS severe
+        FROM (
+            SELECT psgs.Game_End,
+                   JSON_LENGTH(psgs.Results, '$.errors.imprecision') AS imprecision,
+                   JSON_LENGTH(psgs.Results, '$.errors.warning') AS warning,
+                   JSON_LENGTH(psgs.Results, '$.errors.minor') AS minor,
+                   JSON_LENGTH(psgs.Results, '$.errors.severe') AS severe
+            FROM IMA_Plan_Game AS pg
+            JOIN IMA_Plan_Session_Game_Status AS psgs
+              ON pg.Plan_Game_ID = psgs.Plan_Game_ID
+            WHERE pg.Level = :game_id
+              AND psgs.Game_End >= :since
+        ) AS e
+        GROUP BY YEAR(e.Game_End), MONTH(e.Game_End);
+        """
+    )
+    with read_connection() as conn:
+        rows = conn.execute(query, params).mappings().all()
+    return {(r["y"], r["m"]): r for r in rows}
 
 
 def get_minigame_warning_trend(game_id: int):
@@ -206,76 +242,20 @@ def get_minigame_warning_trend(game_id: int):
             "PercentChange": -33.33
         }
     """
-    query = text(
-        """
-        SELECT
-            SUM(CASE
-                    WHEN MONTH(psgs.Game_End) = MONTH(CURDATE()) 
-                     AND YEAR(psgs.Game_End) = YEAR(CURDATE())
-                        THEN JSON_LENGTH(JSON_EXTRACT(psgs.Results, '$.errors.warning'))
-                    ELSE 0
-                END) AS ThisMonthWarnings,
-            SUM(CASE
-                    WHEN MONTH(psgs.Game_End) = MONTH(CURDATE() - INTERVAL 1 MONTH)
-                     AND YEAR(psgs.Game_End) = YEAR(CURDATE() - INTERVAL 1 MONTH)
-                        THEN JSON_LENGTH(JSON_EXTRACT(psgs.Results, '$.errors.warning'))
-                    ELSE 0
-                END) AS LastMonthWarnings,
-            ROUND(
-                (
-                    SUM(CASE
-                            WHEN MONTH(psgs.Game_End) = MONTH(CURDATE()) 
-                             AND YEAR(psgs.Game_End) = YEAR(CURDATE())
-                                THEN JSON_LENGTH(JSON_EXTRACT(psgs.Results, '$.errors.warning'))
-                            ELSE 0
-                        END)
-                    -
-                    SUM(CASE
-                            WHEN MONTH(psgs.Game_End) = MONTH(CURDATE() - INTERVAL 1 MONTH)
-                             AND YEAR(psgs.Game_End) = YEAR(CURDATE() - INTERVAL 1 MONTH)
-                                THEN JSON_LENGTH(JSON_EXTRACT(psgs.Results, '$.errors.warning'))
-                            ELSE 0
-                        END)
-                ) / NULLIF(
-                    SUM(CASE
-                            WHEN MONTH(psgs.Game_End) = MONTH(CURDATE() - INTERVAL 1 MONTH)
-                             AND YEAR(psgs.Game_End) = YEAR(CURDATE() - INTERVAL 1 MONTH)
-                                THEN JSON_LENGTH(JSON_EXTRACT(psgs.Results, '$.errors.warning'))
-                            ELSE 0
-                        END), 0
-                ) * 100, 2
-            ) AS PercentChange
-        FROM IMA_Plan_Game AS pg
-        JOIN IMA_Plan_Session_Game_Status AS psgs
-          ON pg.Plan_Game_ID = psgs.Plan_Game_ID
-        JOIN IMA_Plan_Session AS ps
-          ON ps.Session_ID = psgs.Session_ID
-        WHERE pg.Level = :game_id;
-    """
-    )
+    last, this = get_minigame_error_trend(game_id, months=2)
+    return _month_over_month(this["warning"], last["warning"])
 
-    try:
-        with engine.connect() as conn:
-            row = conn.execute(query, {"game_id": game_id}).fetchone()
 
-        if row:
-            result = dict(row._mapping)
-            logger.info(
-                "Fetched monthly warning trend for game %s: %s", game_id, result
-            )
-            return result
-        else:
-            logger.warning("No warning data found for game %s", game_id)
-            return {
-                "ThisMonthWarnings": 0,
-                "LastMonthWarnings": 0,
-                "PercentChange": None,
-            }
-    except Exception as exc:
-        logger.error(
-            "Failed to fetch monthly warning trend for game %s: %s", game_id, exc
-        )
-        return {"ThisMonthWarnings": 0, "LastMonthWarnings": 0, "PercentChange": None}
+def _month_over_month(this_month, last_month):
+    return {
+        "ThisMonthWarnings": this_month,
+        "LastMonthWarnings": last_month,
+        "PercentChange": (
+            round((this_month - last_month) / last_month * 100, 2)
+            if last_month
+            else None
+        ),
+    }
 
 
 # ────────────────────────────────────────────────────────────────────────────────
@@ -283,137 +263,354 @@ def get_minigame_warning_trend(game_id: int):
 # ────────────────────────────────────────────────────────────────────────────────
 def analyse_minigame_attempts(attempt_rows):
     """
-    Produce aggregate statistics for a list of attempt dicts.
+    Produce aggregate statistics for a list of attempt records (or dicts).
     """
     if not attempt_rows:
         return {}
 
-    scores = [row["Score"] for row in attempt_rows if row["Score"] is not None]
-    completions = [row for row in attempt_rows if row["Status"] == "complete"]
-    fails = [row for row in attempt_rows if row["Status"] == "fail"]
-
-    summary = {
-        "total_attempts": len(attempt_rows),
-        "unique_users": len({r["User_ID"] for r in attempt_rows}),
-        "completed": len(completions),
-        "failed": len(fails),
-        "completion_rate": (
-            round(len(completions) / len(attempt_rows) * 100, 2) if attempt_rows else 0
+    # Single pass over the attempts, no intermediate row lists
+    scores = []
+    users = set()
+    completed = failed = 0
+    for row in attempt_rows:
+        score = row["Score"]
+        if score is not None:
+            scores.append(score)
+        status = row["Status"]
+        if status == "complete":
+            completed += 1
+        elif status == "fail":
+            failed += 1
+        users.add(row["User_ID"])
+
+    average_score, min_score, max_score = vector_stats.score_stats(scores)
+    return _attempt_summary(
+        total=len(attempt_rows),
+        unique_users=len(users),
+        completed=completed,
+        failed=failed,
+        average_score=average_score,
+        min_score=min_score,
+        max_score=max_score,
+    )
+
+
+def _attempt_summary(
+    total, unique_users, completed, failed, average_score, min_score, max_score
+):
+    # Shared shape of the per-level summary, from in-memory or SQL aggregates
+    return {
+        "total_attempts": total,
+        "unique_users": unique_users,
+        "completed": completed,
+        "failed": failed,
+        "completion_rate": round(completed / total * 100, 2) if total else 0,
+        "average_score": (
+            round(float(average_score), 2) if average_score is not None else 0
         ),
-        "average_score": round(mean(scores), 2) if scores else 0,
-        "min_score": min(scores) if scores else 0,
-        "max_score": max(scores) if scores else 0,
+        "min_score": min_score if min_score is not None else 0,
+        "max_score": max_score if max_score is not None else 0,
     }
-    return summary
 
 
-def _summarize_attempts_for_mode(attempts):
+def get_minigame_summaries(level_ids=None):
     """
-    attempts: list[dict] from get_minigame_attempts_by_mode(...)
-    returns per-mode summary:
-      {
-        "mode": "practice|training",
-        "completed": int, "failed": int, "userexit": int, "unique_users": int,
-        "failure_success_ratio": float|None, "failure_success_str": "f:c",
-        "avg_attempts_before_success": float|None, "users_considered": int
-      }
+    Summary stats (same shape as analyse_minigame_attempts) for many mini-games,
+    keyed by Level_ID, from the shared level stats (see get_level_stats).
+    Levels without attempts are absent.
     """
-    if not attempts:
-        return {
-            "mode": None,
-            "completed": 0,
-            "failed": 0,
-            "userexit": 0,
-            "unique_users": 0,
-            "failure_success_ratio": None,
-            "failure_success_str": "0:0",
-            "avg_attempts_before_success": None,
-            "users_considered": 0,
-        }
+    levels = get_level_stats()["levels"]
+    if level_ids is None:
+        return dict(levels)
+    return {lid: levels[lid] for lid in level_ids if lid in levels}
 
-    mode = attempts[0].get("Mode") or None
-    completed = sum(1 for a in attempts if a.get("Status") == "complete")
-    failed = sum(1 for a in attempts if a.get("Status") == "fail")
-    userexit = sum(1 for a in attempts if a.get("Status") == "Userexit")
-    users = {a.get("User_ID") for a in attempts if a.get("User_ID") is not None}
-    unique_users = len(users)
-
-    ratio = (failed / completed) if completed > 0 else None
-    ratio_str = f"{failed}:{completed}"
-
-    # Average attempts before first success per user:
-    # number of attempts strictly before the first 'complete' for that user in this mode.
-    attempts_by_user = {}
-    for a in sorted(
-        attempts,
-        key=lambda x: (x.get("Game_Start") or x.get("Game_End"), x.get("Session_ID")),
-    ):
-        uid = a.get("User_ID")
-        if uid is None:
-            continue
-        attempts_by_user.setdefault(uid, []).append(a)
 
-    per_user_counts = []
-    for uid, seq in attempts_by_user.items():
-        first_success_idx = next(
-            (i for i, row in enumerate(seq) if row.get("Status") == "complete"), None
+def get_completion_rates():
+    """
+    Completion counts and % for every mini-game in get_list_of_minigames(),
+    including levels nobody has played yet (0 %).
+    """
+    levels = get_level_stats()["levels"]
+    rows = []
+    for g in get_list_of_minigames():
+        s = levels.get(g["Level_ID"], {})
+        rows.append(
+            {
+                "Level_ID": g["Level_ID"],
+                "Name": g["Name"],
+                "completed": int(s.get("completed", 0)),
+                "attempted": int(s.get("total_attempts", 0)),
+                "completion_rate": float(s.get("completion_rate", 0.0)),
+            }
         )
-        if first_success_idx is not None:
-            per_user_counts.append(
-                first_success_idx
-            )  # N-1 attempts before success (0-based index)
-    users_considered = len(per_user_counts)
-    avg_before = (
-        round(sum(per_user_counts) / users_considered, 2)
-        if users_considered > 0
-        else None
+    return rows
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# 🧮  Level stats engine
+# ────────────────────────────────────────────────────────────────────────────────
+# Every per-level and per-(level, mode) number served by the minigame endpoints
+# (stats, completion, ai-priority, combined-stats, ai-explain) comes from two
+# grouped queries over the attempts, without Results blobs. The result is kept
+# per process until the data version changes; the version is re-checked at most
+# every MINIGAME_STATS_RECHECK_INTERVAL seconds. Once the summary is ready the
+# version is the ingester watermark, which also moves when an open attempt
+# ends; before that it is the newest attempt key, read off the primary key, so
+# status changes of older attempts wait for the next new attempt. One thread recomputes at a time,
+# outside the lock, while the others keep serving the previous stats.
+
+_level_stats = {"version": None, "checked_at": None, "stats": None, "computing": False}
+_level_stats_lock = threading.Lock()
+_level_stats_done = threading.Condition(_level_stats_lock)
+
+EMPTY_LEVEL_STATS = {"levels": {}, "modes": {}, "names": {}}
+
+LIVE_VERSION_SQL = text(
+    """
+    SELECT Session_ID, Plan_Game_ID
+    FROM IMA_Plan_Session_Game_Status
+    ORDER BY Session_ID DESC, Plan_Game_ID DESC
+    LIMIT 1
+    """
+)
+
+INGEST_VERSION_SQL = text(
+    f"""
+    SELECT Last_Session_ID, Last_Game_End, Rows_Ingested
+    FROM {ingest.STATE_TABLE}
+    WHERE Name = :name
+    """
+)
+
+LEVEL_NAMES_SQL = text(
+    """
+    SELECT Level_ID, Game_ID, REPLACE(Name, '<br>', ' - ') AS Name
+    FROM IMA_Game_Level
+    """
+)
+
+LEVEL_SUMMARY_SQL = text(
+    """
+    SELECT pg.Level AS Level_ID,
+           COUNT(*) AS total,
+           COUNT(DISTINCT ps.User_ID) AS unique_users,
+           SUM(CASE WHEN s.Status = 'complete' THEN 1 ELSE 0 END) AS completed,
+           SUM(CASE WHEN s.Status = 'fail' THEN 1 ELSE 0 END) AS failed,
+           AVG(s.Score) AS average_score,
+           MIN(s.Score) AS min_score,
+           MAX(s.Score) AS max_score
+    FROM IMA_Plan_Session_Game_Status s
+    JOIN IMA_Plan_Game pg
+      ON pg.Plan_Game_ID = s.Plan_Game_ID
+    JOIN IMA_Plan_Session ps
+      ON ps.Session_ID = s.Session_ID
+    GROUP BY pg.Level
+    """
+)
+
+
+def _mode_summary_sql(mode_join, mode_expr):
+    """
+    Per (level, mode) status counts, unique users and attempts before each
+    user's first success. Attempts are numbered per (level, mode, user) in
+    play order; the number of the first complete one, minus one, is the count
+    of attempts before it.
+    """
+    return text(
+        f"""
+        SELECT Level_ID, Mode,
+               SUM(completed) AS completed,
+               SUM(failed) AS failed,
+               SUM(userexit) AS userexit,
+               COUNT(User_ID) AS unique_users,
+               COUNT(before_success) AS users_considered,
+               AVG(before_success) AS avg_before_success
+        FROM (
+            SELECT Level_ID, Mode, User_ID,
+                   SUM(CASE WHEN Status = 'complete' THEN 1 ELSE 0 END) AS completed,
+                   SUM(CASE WHEN Status = 'fail' THEN 1 ELSE 0 END) AS failed,
+                   SUM(CASE WHEN Status = 'Userexit' THEN 1 ELSE 0 END) AS userexit,
+                   CASE WHEN User_ID IS NOT NULL
+                        THEN MIN(CASE WHEN Status = 'complete' THEN attempt_no END) - 1
+                   END AS before_success
+            FROM (
+                SELECT Level_ID, Mode, User_ID, Status,
+                       ROW_NUMBER() OVER (
+                           PARTITION BY Level_ID, Mode, User_ID
+                           ORDER BY Played_At, Session_ID, Plan_Game_ID
+                       ) AS attempt_no
+                FROM (
+                    SELECT pg.Level AS Level_ID,
+                           {mode_expr} AS Mode,
+                           ps.User_ID,
+                           s.Status,
+                           COALESCE(s.Game_Start, s.Game_End) AS Played_At,
+                           s.Session_ID,
+                           s.Plan_Game_ID
+                    FROM IMA_Plan_Session_Game_Status s
+                    JOIN IMA_Plan_Game pg
+                      ON pg.Plan_Game_ID = s.Plan_Game_ID
+                    JOIN IMA_Plan_Session ps
+                      ON ps.Session_ID = s.Session_ID
+                    {mode_join}
+                ) AS a
+            ) AS numbered
+            GROUP BY Level_ID, Mode, User_ID
+        ) AS per_user
+        GROUP BY Level_ID, Mode
+        """
     )
 
+
+def _data_version():
+    # The mode label source changes once the summary table is ready
+    if attempt_summary.summary_ready():
+        with read_connection() as conn:
+            row = conn.execute(INGEST_VERSION_SQL, {"name": ingest.STATE_NAME}).one()
+        return (True,) + tuple(row)
+    with read_connection() as conn:
+        row = conn.execute(LIVE_VERSION_SQL).one_or_none()
+    return (False,) + tuple(row or ())
+
+
+def get_level_stats(refresh: bool = False):
+    """
+    Memoized per-level / per-mode metrics:
+        {
+            "levels": {Level_ID: analyse_minigame_attempts-shaped summary},
+            "modes":  {(Level_ID, mode): per-mode summary, see _mode_summary},
+            "names":  {Level_ID: {"Game_ID": …, "Name": …}},
+        }
+    While another thread recomputes, the previous stats are returned; only
+    the first load (or refresh=True) waits for it.
+    """
+    with _level_stats_lock:
+        stats = _level_stats["stats"]
+        checked_at = _level_stats["checked_at"]
+        if (
+            not refresh
+            and stats is not None
+            and time.monotonic() - checked_at < Config.MINIGAME_STATS_RECHECK_INTERVAL
+        ):
+            return stats
+        if _level_stats["computing"]:
+            if stats is not None and not refresh:
+                return stats
+            _level_stats_done.wait_for(lambda: not _level_stats["computing"])
+            return _level_stats["stats"] or EMPTY_LEVEL_STATS
+        _level_stats["computing"] = True
+        known_version = _level_stats["version"]
+
+    try:
+        try:
+            version = _data_version()
+        except Exception as exc:
+            logger.error("Failed to read minigame data version: %s", exc)
+            return stats or EMPTY_LEVEL_STATS
+
+        if refresh or stats is None or version != known_version:
+            try:
+                stats = _compute_level_stats()
+            except Exception as exc:
+                logger.error("Failed to compute minigame stats: %s", exc)
+                return stats or EMPTY_LEVEL_STATS
+
+        with _level_stats_lock:
+            _level_stats["version"] = version
+            _level_stats["stats"] = stats
+            _level_stats["checked_at"] = time.monotonic()
+        return stats
+    finally:
+        with _level_stats_lock:
+            _level_stats["computing"] = False
+            _level_stats_done.notify_all()
+
+
+def _compute_level_stats():
+    mode_join, mode_expr = _mode_sql("s")
+    with read_connection() as conn:
+        level_rows = conn.execute(LEVEL_SUMMARY_SQL).fetchall()
+        mode_rows = conn.execute(_mode_summary_sql(mode_join, mode_expr)).fetchall()
+        names = {
+            r.Level_ID: {"Game_ID": r.Game_ID, "Name": r.Name}
+            for r in conn.execute(LEVEL_NAMES_SQL)
+        }
+
+    logger.info(
+        "Computed minigame stats for %d levels, %d level modes",
+        len(level_rows),
+        len(mode_rows),
+    )
     return {
-        "mode": mode,
+        "levels": {
+            r.Level_ID: _attempt_summary(
+                total=r.total,
+                unique_users=r.unique_users,
+                completed=int(r.completed or 0),
+                failed=int(r.failed or 0),
+                average_score=r.average_score,
+                min_score=r.min_score,
+                max_score=r.max_score,
+            )
+            for r in level_rows
+        },
+        "modes": {(r.Level_ID, r.Mode): _mode_summary(r) for r in mode_rows},
+        "names": names,
+    }
+
+
+def _mode_summary(row):
+    """
+    Per-mode summary:
+      {
+        "mode": "practice|training|unknown",
+        "completed": int, "failed": int, "userexit": int, "unique_users": int,
+        "failure_success_ratio": float|None, "failure_success_str": "f:c",
+        "avg_attempts_before_success": float|None, "users_considered": int
+      }
+    """
+    completed, failed = int(row.completed or 0), int(row.failed or 0)
+    return {
+        "mode": row.Mode,
         "completed": completed,
         "failed": failed,
-        "userexit": userexit,
-        "unique_users": unique_users,
-        "failure_success_ratio": None if ratio is None else round(float(ratio), 2),
-        "failure_success_str": ratio_str,
-        "avg_attempts_before_success": avg_before,
-        "users_considered": users_considered,
+        "userexit": int(row.userexit or 0),
+        "unique_users": row.unique_users,
+        "failure_success_ratio": (
+            round(failed / completed, 2) if completed > 0 else None
+        ),
+        "failure_success_str": f"{failed}:{completed}",
+        "avg_attempts_before_success": (
+            round(float(row.avg_before_success), 2)
+            if row.avg_before_success is not None
+            else None
+        ),
+        "users_considered": row.users_considered,
     }
 
 
+def _selected_modes(mode: str):
+    m = (mode or "all").lower()
+    return (m,) if m in ("practice", "training") else ("practice", "training")
+
+
 def build_ai_explain_payload_from_attempts(level_id: int, mode: str = "all"):
     """
-    Uses get_minigame_attempts_by_mode to build the AI explain payload.
+    Build the AI explain payload from the shared level stats.
     If mode='all', returns both practice and training rows (if present).
     """
-    # Get identity/name
-    ident_sql = text(
-        """
-        SELECT gl.Level_ID, gl.Game_ID, REPLACE(gl.Name, '<br>', ' - ') AS Name
-        FROM IMA_Game_Level gl WHERE gl.Level_ID = :level_id LIMIT 1;
-    """
-    )
-    with engine.connect() as conn:
-        ident = conn.execute(ident_sql, {"level_id": level_id}).mappings().first()
-
+    stats = get_level_stats()
+    ident = stats["names"].get(level_id)
     if not ident:
         return {"level_id": level_id, "rows": []}
 
-    rows = []
-    m = (mode or "all").lower()
-    if m == "all":
-        for m1 in ("practice", "training"):
-            attempts = get_minigame_attempts_by_mode(level_id, m1)
-            if attempts:
-                rows.append(_summarize_attempts_for_mode(attempts))
-    else:
-        attempts = get_minigame_attempts_by_mode(level_id, m)
-        if attempts:
-            rows.append(_summarize_attempts_for_mode(attempts))
-
+    rows = [
+        stats["modes"][(level_id, m)]
+        for m in _selected_modes(mode)
+        if (level_id, m) in stats["modes"]
+    ]
     return {
-        "level_id": ident["Level_ID"],
+        "level_id": level_id,
         "game_id": ident["Game_ID"],
         "name": ident["Name"],
         "rows": rows,
@@ -517,18 +714,10 @@ def ai_prioritise_low_performing(
     Selection rule used: {picked_by}
 
     Priority list (lowest completion first):
-    {[
-        {'id': r['Level_ID'], 'name': r['Name'], 'completion_%': r['completion_rate'],
-        'attempted': r['attempted'], 'completed': r['completed']}
-        for r in priority
-    ]}
+    {prompt_budget.payload(_completion_rows(priority), "minigame_priorities", share=0.4)}
 
     All games (for context):
-    {[
-        {'id': r['Level_ID'], 'name': r['Name'], 'completion_%': r['completion_rate'],
-        'attempted': r['attempted'], 'completed': r['completed']}
-        for r in games_ranked
-    ]}
+    {prompt_budget.payload(_completion_rows(games_ranked), "minigame_priorities", share=0.6)}
 
     Write a concise, actionable markdown brief:
     - Bullet a ranked priority list with reasons (e.g., low completion %, high attempts but low success).
@@ -537,11 +726,25 @@ def ai_prioritise_low_performing(
     Keep it under 250 words.
     """.strip()
 
+    prompt_budget.log_prompt("minigame_priorities", prompt)
     return ai_generic_markdown(
         prompt, client, system="Respond in concise, actionable Markdown."
     )
 
 
+def _completion_rows(games):
+    return [
+        {
+            "id": r["Level_ID"],
+            "name": r["Name"],
+            "completion_%": r["completion_rate"],
+            "attempted": r["attempted"],
+            "completed": r["completed"],
+        }
+        for r in games
+    ]
+
+
 def ai_explain_minigame_from_attempts(level_name: str, payload: dict, llm_client):
     def line(r):
         return (
@@ -563,6 +766,7 @@ def ai_explain_minigame_from_attempts(level_name: str, payload: dict, llm_client
         "2) Likely friction points (ambiguity, UI cues, timing, cognitive load, exit causes).\n"
         "3) 3–5 concrete redesign actions improving early success without dumbing down the skill."
     )
+    prompt_budget.log_prompt("minigame_explain_attempts", prompt)
     try:
         return _llm_complete_universal(
             llm_client,
@@ -581,6 +785,7 @@ def aggregate_minigame_errors(attempt_rows):
     """
     Traverse the Results JSON of each attempt and merge all errors into
     combined category lists: imprecision / warning / minor / severe.
+    Finished attempts are decoded once and then served from utils.results_cache.
 
     Returns:
         {
@@ -592,17 +797,13 @@ def aggregate_minigame_errors(attempt_rows):
     """
     buckets = defaultdict(list)  # category -> list[dict]
 
-    for row in attempt_rows:
-        raw = row.get("Results")
-        if not raw:
-            continue
-        try:
-            data = json.loads(raw)
-            err = data.get("errors", {})
-            for cat in ("imprecision", "warning", "minor", "severe"):
-                buckets[cat].extend(err.get(cat, []))
-        except json.JSONDecodeError:
+    attempt_rows = list(attempt_rows)
+    for row, results in zip(attempt_rows, results_cache.results_for_rows(attempt_rows)):
+        if not results.valid:
             logger.debug("Bad JSON skipped for Session %s", row["Session_ID"])
+            continue
+        for cat in ERROR_CATEGORIES:
+            buckets[cat].extend(results.errors(cat))
 
     # Deduplicate within each bucket
     return {cat: deduplicate(entries) for cat, entries in buckets.items()}
@@ -672,12 +873,14 @@ def ai_explain_for_minigame(game_name: str, payload: dict, client):
 
     Data to analyze:
     SUMMARY_STATS:
-    {json.dumps(summary_stats, indent=2)}
+    {prompt_budget.payload(summary_stats, "minigame_explain", share=0.5)}
 
     ERROR_BUCKETS:
-    {json.dumps(errors, indent=2)}
+    {prompt_budget.payload(errors, "minigame_explain", share=0.5)}
     """
 
+    prompt_budget.log_prompt("minigame_explain", prompt)
+
     try:
         resp = client.chat.completions.create(
             model="deepseek-chat",
@@ -719,12 +922,14 @@ def ai_summary_for_minigame(game_name: str, summary_stats: dict, errors: dict, c
 
     Data to analyze:
     SUMMARY_STATS:
-    {json.dumps(summary_stats, indent=2)}
+    {prompt_budget.payload(summary_stats, "minigame_summary", share=0.5)}
 
     ERROR_BUCKETS:
-    {json.dumps(errors, indent=2)}
+    {prompt_budget.payload(errors, "minigame_summary", share=0.5)}
     """
 
+    prompt_budget.log_prompt("minigame_summary", prompt)
+
     if callable(client):
         # If client is a callable function (e.g., local LLM)
         return cleanup_llm_response(client(prompt.strip()))
@@ -744,123 +949,27 @@ def get_combined_game_stats(mode: str = "all"):
     """
     Per-minigame combined stats with optional filtering by Practice/Training/All.
     When mode='all', rows are separated by Mode ('practice' / 'training'), and
-    'unknown' is EXCLUDED by default to avoid mixed/ambiguous sessions.
-    """
-    pred, params = _mode_predicate_and_params(mode)
-
-    # When showing "all", hide unknown by requiring either practice or training text present.
-    unknown_filter_all = (
-        "AND (COALESCE(LOWER(ps.Results),'') LIKE '%practice%' "
-        "  OR COALESCE(LOWER(ps.Results),'') LIKE '%training%' "
-        "  OR COALESCE(LOWER(s.Results),'')  LIKE '%practice%' "
-        "  OR COALESCE(LOWER(s.Results),'')  LIKE '%training%')"
-        if (mode or "all").lower() == "all"
-        else ""
-    )
-
-    # ── Failure / Success / Userexit, Users ─────────────────────────────────────
-    ratio_sql = text(
-        f"""
-        SELECT
-            gl.Level_ID,
-            gl.Game_ID,
-            REPLACE(gl.Name, '<br>', ' - ') AS Name,
-            {MODE_EXPR} AS Mode,
-            COALESCE(SUM(CASE WHEN s.Status = 'complete' THEN 1 END), 0) AS completed,
-            COALESCE(SUM(CASE WHEN s.Status = 'fail'     THEN 1 END), 0) AS failed,
-            COALESCE(SUM(CASE WHEN s.Status = 'Userexit' THEN 1 END), 0) AS userexit,
-            COALESCE(COUNT(DISTINCT ps.User_ID), 0) AS unique_users
-        FROM IMA_Game_Level gl
-        LEFT JOIN IMA_Plan_Game pg
-               ON pg.Level   = gl.Level_ID
-              AND pg.Game_ID = gl.Game_ID
-        LEFT JOIN IMA_Plan_Session_Game_Status s
-               ON s.Plan_Game_ID = pg.Plan_Game_ID
-        LEFT JOIN IMA_Plan_Session ps
-               ON ps.Session_ID = s.Session_ID
-        WHERE 1=1
-        {pred}
-        {unknown_filter_all}
-        GROUP BY gl.Level_ID, gl.Game_ID, gl.Name, {MODE_EXPR}
-        ORDER BY gl.Game_ID, gl.Level_ID, {MODE_EXPR};
+    'unknown' is EXCLUDED to avoid mixed/ambiguous sessions.
     """
-    )
-
-    # ── Avg attempts before first success (partition by Mode too) ───────────────
-    avg_sql = text(
-        f"""
-        WITH attempts AS (
-            SELECT
-                gl.Level_ID,
-                gl.Game_ID,
-                ps.User_ID,
-                s.Status,
-                s.Session_ID,
-                s.Plan_Game_ID,
-                COALESCE(s.Game_Start, s.Game_End) AS ts,
-                {MODE_EXPR} AS Mode,
-                ROW_NUMBER() OVER (
-                    PARTITION BY gl.Level_ID, gl.Game_ID, ps.User_ID, {MODE_EXPR}
-                    ORDER BY COALESCE(s.Game_Start, s.Game_End), s.Session_ID, s.Plan_Game_ID
-                ) AS rn
-            FROM IMA_Plan_Session_Game_Status s
-            JOIN IMA_Plan_Game pg
-              ON pg.Plan_Game_ID = s.Plan_Game_ID
-            JOIN IMA_Game_Level gl
-              ON gl.Level_ID = pg.Level AND gl.Game_ID = pg.Game_ID
-            JOIN IMA_Plan_Session ps
-              ON ps.Session_ID = s.Session_ID
-            WHERE 1=1
-            {pred}
-            {unknown_filter_all}
-        ),
-        first_success AS (
-            SELECT Level_ID, Game_ID, User_ID, Mode, MIN(rn) AS first_success_rn
-            FROM attempts
-            WHERE Status = 'complete'
-            GROUP BY Level_ID, Game_ID, User_ID, Mode
-        )
-        SELECT
-            Level_ID,
-            Game_ID,
-            Mode,
-            AVG(first_success_rn - 1) AS avg_attempts_before_success,
-            COUNT(User_ID) AS users_considered
-        FROM first_success
-        GROUP BY Level_ID, Game_ID, Mode;
-    """
-    )
-
-    with engine.connect() as conn:
-        ratio_rows = {
-            (r.Level_ID, r.Game_ID, r.Mode): dict(r._mapping)
-            for r in conn.execute(ratio_sql, params).fetchall()
-        }
-        avg_rows = {
-            (r.Level_ID, r.Game_ID, r.Mode): dict(r._mapping)
-            for r in conn.execute(avg_sql, params).fetchall()
-        }
+    stats = get_level_stats()
+    names = stats["names"]
+    wanted = _selected_modes(mode)
 
     combined = []
-    for key, base in ratio_rows.items():
-        avg = avg_rows.get(key, {})
-        completed = base["completed"] or 0
-        failed = base["failed"] or 0
-        ratio = (failed / completed) if completed > 0 else None
+    for (level_id, m), summary in stats["modes"].items():
+        ident = names.get(level_id)
+        if m not in wanted or not ident:
+            continue
         combined.append(
             {
-                **base,  # includes Mode
-                "failure_success_ratio": ratio,
-                "failure_success_str": f"{failed}:{completed}",
-                "avg_attempts_before_success": (
-                    None
-                    if avg.get("avg_attempts_before_success") is None
-                    else round(float(avg["avg_attempts_before_success"]), 2)
-                ),
-                "users_considered": avg.get("users_considered", 0),
+                "Level_ID": level_id,
+                "Game_ID": ident["Game_ID"],
+                "Name": ident["Name"],
+                "Mode": m,
+                **{k: v for k, v in summary.items() if k != "mode"},
             }
         )
-
+    combined.sort(key=lambda r: (r["Game_ID"], r["Level_ID"], r["Mode"]))
     return combined
 
 
@@ -884,54 +993,61 @@ def search_minigames_by_name(query: str):
         ORDER BY Game_ID, Level_ID;
     """
     )
-    with engine.connect() as conn:
+    with read_connection() as conn:
         rows = conn.execute(query, {"like_query": like_query}).fetchall()
     return [dict(r._mapping) for r in rows]
 
 
-def _mode_predicate_and_params(mode: str):
+def _results_mode_expr(status_alias: str = "s"):
     """
-    Filter by Practice / Training / All.
-    We match on BOTH ps.Results and s.Results (case-insensitive).
+    Label expression for session mode, matched on BOTH ps.Results and the game
+    status Results (case-insensitive). Only used for attempts the ingester has
+    not summarised yet.
     """
-    m = (mode or "all").lower()
-    if m == "practice":
-        return (
-            "AND (COALESCE(LOWER(ps.Results),'') LIKE :practice_q "
-            "  OR COALESCE(LOWER(s.Results),'') LIKE :practice_q)",
-            {"practice_q": "%practice%"},
-        )
-    if m == "training":
-        return (
-            "AND (COALESCE(LOWER(ps.Results),'') LIKE :training_q "
-            "  OR COALESCE(LOWER(s.Results),'') LIKE :training_q)",
-            {"training_q": "%training%"},
-        )
-    return "", {}
+    return (
+        "CASE "
+        " WHEN COALESCE(LOWER(ps.Results),'') LIKE '%practice%' "
+        f"   OR COALESCE(LOWER({status_alias}.Results),'')  LIKE '%practice%' THEN 'practice' "
+        " WHEN COALESCE(LOWER(ps.Results),'') LIKE '%training%' "
+        f"   OR COALESCE(LOWER({status_alias}.Results),'')  LIKE '%training%' THEN 'training' "
+        " ELSE 'unknown' END"
+    )
 
 
-# Label expression for session mode
-MODE_EXPR = (
-    "CASE "
-    " WHEN COALESCE(LOWER(ps.Results),'') LIKE '%practice%' "
-    "   OR COALESCE(LOWER(s.Results),'')  LIKE '%practice%' THEN 'practice' "
-    " WHEN COALESCE(LOWER(ps.Results),'') LIKE '%training%' "
-    "   OR COALESCE(LOWER(s.Results),'')  LIKE '%training%' THEN 'training' "
-    " ELSE 'unknown' END"
-)
+def _mode_sql(status_alias: str = "s"):
+    """
+    Return (join, label) expressions for an attempt's mode
+    ('practice' / 'training' / 'unknown').
+
+    Once the ingester has caught up, the label reads the precomputed
+    Dashboard_Attempt_Summary.Play_Mode column, falling back to the Results
+    text for attempts summarised after the last ingest run. Before that, it
+    scans Results.
+    """
+    like_expr = _results_mode_expr(status_alias)
+    if not attempt_summary.summary_ready():
+        return "", like_expr
+    join = (
+        f"LEFT JOIN {attempt_summary.SUMMARY_TABLE} ds "
+        f"ON ds.Session_ID = {status_alias}.Session_ID "
+        f"AND ds.Plan_Game_ID = {status_alias}.Plan_Game_ID"
+    )
+    return join, f"COALESCE(ds.Play_Mode, {like_expr})"
 
 
-def fetch_warning_stats(game_id: int):
+def fetch_warning_stats(game_id: int, months: int = WARNING_TREND_MONTHS):
     """
-    Wrapper around get_minigame_warning_trend that returns keys compatible
-    with the API response (monthly stats).
+    Warning stats for the API response: this month vs last month plus the
+    per-month error trend over the last `months` months (at least 2).
     """
-    trend = get_minigame_warning_trend(game_id)
+    monthly = get_minigame_error_trend(game_id, months=max(months, 2))
+    trend = _month_over_month(monthly[-1]["warning"], monthly[-2]["warning"])
 
     return {
-        "this_month_warnings": trend.get("ThisMonthWarnings", 0),
-        "last_month_warnings": trend.get("LastMonthWarnings", 0),
-        "percent_change": trend.get("PercentChange"),
+        "this_month_warnings": trend["ThisMonthWarnings"],
+        "last_month_warnings": trend["LastMonthWarnings"],
+        "percent_change": trend["PercentChange"],
+        "monthly": monthly,
     }
 
 
@@ -939,9 +1055,6 @@ def ai_summary_for_warnings(game_name: str, warning_stats: dict, client):
     """
     Call an LLM to produce a natural-language summary of warning trends for a mini-game.
     """
-    safe_stats = {
-        k: float(v) if isinstance(v, Decimal) else v for k, v in warning_stats.items()
-    }
     prompt = f"""
     You are an expert training analyst.
 
@@ -949,15 +1062,17 @@ def ai_summary_for_warnings(game_name: str, warning_stats: dict, client):
     Return exactly these sections as second-level headings (##). Use short paragraphs (no bullet symbols). Do not include any introduction before the first heading.
 
     ## Warning Trends
-    Summarize this month vs last month warning counts, percentage change, and any notable trends.
+    Summarize this month vs last month warning counts, percentage change, and the longer-term trend in the `monthly` list (warnings alongside imprecision, minor and severe errors and attempts per month).
 
     ## Insights
     Explain what these warnings indicate about student performance or common mistakes.
 
     WARNING_STATS:
-    {json.dumps(safe_stats, indent=2)}    
+    {prompt_budget.payload(warning_stats, "warning_summary")}
     """
 
+    prompt_budget.log_prompt("warning_summary", prompt)
+
     if callable(client):
         return cleanup_llm_response(client(prompt))
     else:
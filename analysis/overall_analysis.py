@@ -1,124 +1,573 @@
-from sqlalchemy import text
-from utils.db import engine
-from collections import defaultdict
-import json
+from sqlalchemy import bindparam, case, func, literal_column, select
+from utils.db import read_connection, stream_rows
+from utils import attempt_summary
+from utils import descriptors
+from utils import prompt_budget
+from utils import results_cache
+from utils import vector_stats
+from utils.query_builder import (
+    SESSION_MODES,
+    account,
+    attempt_summary as attempt_summary_table,
+    game_status,
+    in_date_range,
+    plan_session,
+    query_params,
+    scope_by_session,
+    scope_by_user,
+    session_mode_in,
+)
+from config import Config
+from collections import Counter, defaultdict
+from operator import itemgetter
+import heapq
 import math
 import re
 import logging
+import threading
+import time
 from datetime import datetime
-from sqlalchemy import bindparam
-from flask import session
-from datetime import datetime
+from abc import ABC, abstractmethod
 
 logger = logging.getLogger(__name__)
 
-# -- Error Frequency Over Time --
-def get_error_frequency_results(start_month=None, end_month=None):
-    # print(f"[DEBUG] get_error_frequency_results called with: start_month={start_month}, end_month={end_month}")
-    role = session.get("role")  
-    user_id = session.get("user_id")
+# -- Statements (built once; role scope and date range are parameters) --
+IPS = plan_session.alias("IPS")
+IPSGS = game_status.alias("IPSGS")
+DS = attempt_summary_table.alias("ds")
+A = account.alias("A")
+
+BIN_SIZE = bindparam("bin_size")
+
+# Sibling NESTED PATHs yield one row per error with only its own category's column set
+ERROR_TIMES = (
+    func.JSON_TABLE(
+        IPSGS.c.Results,
+        literal_column(
+            """'$.errors' COLUMNS (
+                NESTED PATH '$.warning[*]' COLUMNS (warning_time DOUBLE PATH '$.time'),
+                NESTED PATH '$.minor[*]'   COLUMNS (minor_time DOUBLE PATH '$.time'),
+                NESTED PATH '$.severe[*]'  COLUMNS (severe_time DOUBLE PATH '$.time')
+            )"""
+        ),
+    )
+    .table_valued("warning_time", "minor_time", "severe_time")
+    .alias("jt")
+)
+_error_time = func.coalesce(
+    ERROR_TIMES.c.warning_time, ERROR_TIMES.c.minor_time, ERROR_TIMES.c.severe_time
+)
+ERROR_BINS_QUERY = (
+    select(
+        func.floor(_error_time / BIN_SIZE).label("bin_idx"),
+        func.count(ERROR_TIMES.c.warning_time).label("warnings"),
+        func.count(ERROR_TIMES.c.minor_time).label("minors"),
+        func.count(ERROR_TIMES.c.severe_time).label("severes"),
+        func.max(_error_time).label("max_time"),
+    )
+    .select_from(IPSGS.join(ERROR_TIMES, literal_column("TRUE")))
+    .where(
+        _error_time.is_not(None),
+        scope_by_session(IPSGS.c.Session_ID),
+        in_date_range(IPSGS.c.Game_Start),
+    )
+    .group_by(literal_column("bin_idx"))
+)
+
+# Sessions per user and mode, with the precedence of attempt_summary.SESSION_MODE_SQL
+SESSION_MODE = case(
+    *(
+        (session_mode_in((mode,), results_col=IPS.c.Results), mode)
+        for mode in ("training", "practice", "assessment")
+    ),
+    else_="other",
+).label("mode")
+USER_SESSIONS_QUERY = (
+    select(IPS.c.User_ID.label("user_id"), SESSION_MODE, func.count().label("sessions"))
+    .where(scope_by_user(IPS.c.User_ID), in_date_range(IPS.c.Session_Start))
+    .group_by(IPS.c.User_ID, SESSION_MODE)
+)
+
+USER_ATTEMPTS_SUMMARY_QUERY = (
+    select(
+        DS.c.User_ID.label("user_id"),
+        func.count().label("attempts"),
+        func.sum(case((DS.c.Result_Status == "complete", 1), else_=0)).label("completed"),
+        func.sum(case((DS.c.Result_Status == "fail", 1), else_=0)).label("failed"),
+        func.sum(DS.c.Final_Score).label("score_sum"),
+        func.count(DS.c.Final_Score).label("scored"),
+        *(
+            func.coalesce(func.sum(DS.c[column]), 0).label(category)
+            for category, column in attempt_summary.ERROR_COLUMNS.items()
+        ),
+    )
+    .where(scope_by_user(DS.c.User_ID), in_date_range(DS.c.Game_Start))
+    .group_by(DS.c.User_ID)
+)
+
+DURATION_QUERY = select(
+    IPSGS.c.Game_Start.label("game_start"),
+    IPSGS.c.Game_End.label("game_end"),
+    IPSGS.c.Score.label("score"),
+).where(
+    IPSGS.c.Game_Start.is_not(None),
+    IPSGS.c.Game_End.is_not(None),
+    IPSGS.c.Score.is_not(None),
+    scope_by_session(IPSGS.c.Session_ID),
+    in_date_range(IPSGS.c.Game_Start),
+)
+
+# Practice/training sessions started in range; the score queries join their games
+# in the same statement rather than fetching them by a second IN (:session_ids) query
+PRACTICE_SESSION_FILTERS = (
+    scope_by_user(IPS.c.User_ID),
+    session_mode_in(("practice", "training"), results_col=IPS.c.Results),
+    in_date_range(IPS.c.Session_Start),
+)
+
+PRACTICE_SCORES_QUERY = (
+    select(
+        IPSGS.c.Session_ID,
+        IPSGS.c.Plan_Game_ID,
+        IPSGS.c.Score.label("score"),
+        IPSGS.c.Results,
+        IPSGS.c.Game_End,
+    )
+    .select_from(IPSGS.join(IPS, IPSGS.c.Session_ID == IPS.c.Session_ID))
+    .where(*PRACTICE_SESSION_FILTERS)
+)
+
+PRACTICE_SCORES_SUMMARY_QUERY = (
+    select(
+        DS.c.Session_ID,
+        DS.c.Score.label("score"),
+        func.coalesce(func.nullif(DS.c.Level_Name, ""), DS.c.Game_Name, "").label("level_name"),
+        DS.c.Max_Score.label("max_score"),
+    )
+    .select_from(DS.join(IPS, DS.c.Session_ID == IPS.c.Session_ID))
+    .where(DS.c.Results_Valid == 1, *PRACTICE_SESSION_FILTERS)
+)
+
+ERROR_TYPE_SUMMARY_QUERY = select(
+    func.coalesce(DS.c.Warning_Count, 0).label("warnings"),
+    func.coalesce(DS.c.Minor_Count, 0).label("minors"),
+    func.coalesce(DS.c.Severe_Count, 0).label("severes"),
+    DS.c.Total_Time.label("total_time"),
+).where(
+    DS.c.Score.is_not(None),
+    DS.c.Results_Valid == 1,
+    scope_by_user(DS.c.User_ID),
+    in_date_range(DS.c.Game_Start),
+)
+
+# Pre-aggregated per level name and month; several level names share a minigame
+MONTHLY_SCORES_SUMMARY_QUERY = (
+    select(
+        DS.c.Level_Name.label("level_name"),
+        func.date_format(DS.c.Game_Start, "%Y-%m").label("month_key"),
+        func.sum(DS.c.Final_Score).label("score_sum"),
+        func.count(DS.c.Final_Score).label("score_count"),
+    )
+    .where(
+        DS.c.Results_Valid == 1,
+        session_mode_in(SESSION_MODES, mode_col=DS.c.Mode),
+        DS.c.Final_Score.is_not(None),
+        DS.c.Game_Start.is_not(None),
+        scope_by_user(DS.c.User_ID),
+        in_date_range(DS.c.Game_Start),
+    )
+    .group_by(DS.c.Level_Name, literal_column("month_key"))
+)
+
+STUDENT_RESULTS_SUMMARY_QUERY = (
+    select(
+        A.c.Username.label("username"),
+        DS.c.Results_Valid.label("valid"),
+        func.coalesce(DS.c.Final_Score, 0).label("final_score"),
+        func.coalesce(DS.c.Result_Status, "").label("status"),
+        func.coalesce(DS.c.Accuracy, 0).label("accuracy"),
+        func.coalesce(DS.c.Total_Time, 0).label("total_time"),
+        DS.c.Game_Start.label("game_start"),
+    )
+    .select_from(DS.join(A, DS.c.User_ID == A.c.Id))
+    .where(scope_by_user(DS.c.User_ID), in_date_range(DS.c.Game_Start))
+)
+
+# Every row the Results aggregators can use; each one skips the rows it doesn't
+# need (no session/account, no score) the way its own query used to
+RESULTS_SCAN_QUERY = (
+    select(
+        IPSGS.c.Session_ID,
+        IPSGS.c.Plan_Game_ID,
+        IPSGS.c.Results,
+        IPSGS.c.Game_Start,
+        IPSGS.c.Game_End,
+        IPSGS.c.Score,
+        IPS.c.Results.label("session_results"),
+        IPS.c.User_ID.label("user_id"),
+        A.c.Username.label("username"),
+    )
+    .select_from(
+        IPSGS.outerjoin(IPS, IPSGS.c.Session_ID == IPS.c.Session_ID).outerjoin(
+            A, IPS.c.User_ID == A.c.Id
+        )
+    )
+    .where(scope_by_session(IPSGS.c.Session_ID), in_date_range(IPSGS.c.Game_Start))
+)
+
+
+# -- Results scan pipeline --
+# The error-bin, error-vs-time, monthly-average and student-score charts all read
+# the same game status rows. run_results_aggregators() gives each requested
+# aggregator its fast path first (SQL binning or the attempt summary); the ones
+# that still need the Results JSON share a single streamed scan. Each batch is
+# looked up in utils.results_cache: finished attempts decoded before come back
+# decoded, the rest are lazy views over the scanned blob (so a blob is decoded at
+# most once per request, and not at all when only scalars are read).
+
+class _ResultsAggregator(ABC):
+    """
+    One chart's aggregation over the scanned rows.
+    fast_path() returns the finished result without the scan, or None when the
+    rows must be scanned; add() is then called once per row with its Results
+    view (utils.results_json) and result() returns the aggregate.
+    """
+
+    def fast_path(self, params):
+        return None
+
+    @abstractmethod
+    def add(self, row, results):
+        ...
+
+    @abstractmethod
+    def result(self):
+        ...
+
+
+class _ErrorBins(_ResultsAggregator):
+    # Error times are collected per category and binned in batches (vector_stats)
+    BATCH = 100_000
+
+    def __init__(self, bin_size=5, **options):
+        self.bin_size = bin_size
+        self.times = {"warnings": [], "minors": [], "severes": []}
+        self.pending = 0
+        self.counts = {}
+        self.max_time = 0
+
+    def fast_path(self, params):
+        return _bin_errors_in_sql(params, self.bin_size)
+
+    def add(self, row, results):
+        for err_type in ["warning", "minor", "severe"]:
+            times = results.error_times(err_type)
+            self.times[f"{err_type}s"].extend(times)
+            self.pending += len(times)
+        if self.pending >= self.BATCH:
+            self._flush()
+
+    def _flush(self):
+        _, max_time = vector_stats.bin_times(self.times, self.bin_size, self.counts)
+        if max_time > self.max_time:
+            self.max_time = max_time
+        for times in self.times.values():
+            times.clear()
+        self.pending = 0
+
+    def result(self):
+        self._flush()
+        return _label_error_bins(self.counts, self.max_time, self.bin_size)
+
+
+class _ErrorVsTime(_ResultsAggregator):
+    def __init__(self, **options):
+        self.points = []
+
+    def fast_path(self, params):
+        if not attempt_summary.summary_ready():
+            return None
+        return [
+            _error_score_point(row.warnings, row.minors, row.severes, row.total_time)
+            for row in stream_rows(ERROR_TYPE_SUMMARY_QUERY, params)
+        ]
+
+    def add(self, row, results):
+        if row.Score is None or not results.valid:
+            return
+        self.points.append(
+            _error_score_point(
+                results.error_count("warning"),
+                results.error_count("minor"),
+                results.error_count("severe"),
+                results.total_time(),
+            )
+        )
 
+    def result(self):
+        return self.points
+
+
+class _MonthlyAverages(_ResultsAggregator):
+    def __init__(self, **options):
+        self.scores_by_game_month = defaultdict(lambda: [0, 0])  # score sum/count
+
+    def fast_path(self, params):
+        if not attempt_summary.summary_ready():
+            return None
+        with read_connection() as conn:
+            for row in conn.execute(MONTHLY_SCORES_SUMMARY_QUERY, params):
+                minigame = _minigame_from_level_name(row.level_name or "")
+                if not minigame:
+                    continue
+                totals = self.scores_by_game_month[(minigame, row.month_key)]
+                totals[0] += row.score_sum
+                totals[1] += row.score_count
+        return self.result()
+
+    def add(self, row, results):
+        # Same session filter as session_mode_in(SESSION_MODES) (LIKE is case-insensitive)
+        session_results = (row.session_results or "").lower()
+        if row.Game_Start is None:
+            return
+        if not any(mode in session_results for mode in SESSION_MODES):
+            return
+        score = results.score()
+        minigame = _minigame_from_level_name(results.level_name() or "")
+        if score is None or not minigame:
+            return
+        totals = self.scores_by_game_month[(minigame, row.Game_Start.strftime("%Y-%m"))]
+        totals[0] += score
+        totals[1] += 1
+
+    def result(self):
+        return _monthly_averages(self.scores_by_game_month)
+
+
+class _StudentScores(_ResultsAggregator):
+    def __init__(self, k=None, prior_weight=None, **options):
+        self.k = k
+        self.prior_weight = prior_weight
+        self.stats = {}  # username -> _StudentStats
+
+    def fast_path(self, params):
+        if not attempt_summary.summary_ready():
+            return None
+        for row in _iter_student_rows_from_summary(params):
+            self._add_row(*row)
+        return self.result()
+
+    def add(self, row, results):
+        if row.username is None or not results.valid:
+            return  # no account, or Results that can't be scored
+        self._add_row(
+            row.username,
+            True,
+            results.score(0),
+            results.status(""),
+            results.accuracy(0),
+            results.total_time(0),
+            row.Game_Start,
+        )
+
+    def _add_row(self, username, valid, score, status, accuracy, total_time, game_start):
+        if not valid or not isinstance(score, (int, float)):
+            return
+        stats = self.stats.get(username)
+        if stats is None:
+            stats = self.stats[username] = _StudentStats()
+        stats.add(score, status, accuracy, total_time, game_start)
+
+    def result(self):
+        return StudentRanking(self.stats, k=self.k, prior_weight=self.prior_weight)
+
+
+class _UserStats:
+    __slots__ = ("attempts", "completed", "failed", "score_sum", "scored", "errors")
+
+    def __init__(self):
+        self.attempts = self.completed = self.failed = self.scored = 0
+        self.score_sum = 0
+        self.errors = dict.fromkeys(attempt_summary.ERROR_COLUMNS, 0)
+
+
+class _UserSummaries(_ResultsAggregator):
+    # Attempt counts, scores and error totals per User_ID
+    def __init__(self, **options):
+        self.users = {}  # user_id -> _UserStats
+
+    def fast_path(self, params):
+        if not attempt_summary.summary_ready():
+            return None
+        for row in stream_rows(USER_ATTEMPTS_SUMMARY_QUERY, params):
+            stats = self.users[row.user_id] = _UserStats()
+            stats.attempts, stats.completed, stats.failed = (
+                row.attempts, int(row.completed or 0), int(row.failed or 0)
+            )
+            stats.score_sum, stats.scored = float(row.score_sum or 0), row.scored
+            for category in stats.errors:
+                stats.errors[category] = int(row._mapping[category])
+        return self.result()
+
+    def add(self, row, results):
+        if row.user_id is None:
+            return  # attempt without a session
+        stats = self.users.get(row.user_id)
+        if stats is None:
+            stats = self.users[row.user_id] = _UserStats()
+        stats.attempts += 1
+        if not results.valid:
+            return
+        status = results.status()
+        if status == "complete":
+            stats.completed += 1
+        elif status == "fail":
+            stats.failed += 1
+        score = results.score()
+        if isinstance(score, (int, float)) and not isinstance(score, bool):
+            stats.score_sum += score
+            stats.scored += 1
+        for category in stats.errors:
+            stats.errors[category] += results.error_count(category)
+
+    def result(self):
+        return self.users
+
+
+RESULTS_SCAN_BATCH = 1000  # scanned rows per results_cache lookup
+
+RESULTS_AGGREGATORS = {
+    "error_bins": _ErrorBins,
+    "error_vs_time": _ErrorVsTime,
+    "monthly_averages": _MonthlyAverages,
+    "student_scores": _StudentScores,
+    "user_summaries": _UserSummaries,
+}
+
+
+def run_results_aggregators(names, start_month=None, end_month=None, scope=None, **options):
+    """
+    Run the named aggregators (keys of RESULTS_AGGREGATORS) for one scope and
+    month range and return {name: result}. Options (e.g. bin_size, k) are passed
+    to every aggregator. Game status Results are scanned at most once.
+    """
     start_dt, end_dt = parse_month_range(start_month, end_month)
+    params = query_params(scope, start_dt=start_dt, end_dt=end_dt)
 
-    print(f"[DEBUG] Parsed dates: start_dt={start_dt}, end_dt={end_dt}, {user_id}")
+    results, scanning = {}, {}
+    for name in names:
+        aggregator_cls = RESULTS_AGGREGATORS[name]
+        try:
+            result = aggregator_cls(**options).fast_path(params)
+        except Exception as e:
+            logger.warning(f"Fast path for {name} failed, parsing Results instead: {e}")
+            result = None
+        if result is None:
+            scanning[name] = aggregator_cls(**options)
+        else:
+            results[name] = result
+
+    if scanning:
+        scanned, batch = 0, []
+        for row in stream_rows(RESULTS_SCAN_QUERY, params):
+            batch.append(row)
+            if len(batch) == RESULTS_SCAN_BATCH:
+                scanned += _feed_aggregators(batch, scanning.values())
+                batch = []
+        scanned += _feed_aggregators(batch, scanning.values())
+        logger.info(f"Scanned {scanned} Results rows for {', '.join(scanning)}.")
+        for name, aggregator in scanning.items():
+            results[name] = aggregator.result()
+
+    if "student_scores" in results:
+        _remember_ranking(params, results["student_scores"])
+    return results
 
-    if role == "teacher":
-        query_text = """
-            SELECT IPSGS.Results, IPSGS.Game_Start
-            FROM IMA_Plan_Session_Game_Status IPSGS
-            INNER JOIN IMA_Plan_Session IPS ON IPSGS.Session_ID = IPS.Session_ID
-            INNER JOIN IMA_Admin_User IAU ON IPS.User_ID = IAU.User_ID
-            WHERE IAU.Admin_ID = :user_id
-        """
-        params = {"user_id": user_id}
-    else:
-        query_text = """
-            SELECT IPSGS.Results, IPSGS.Game_Start
-            FROM IMA_Plan_Session_Game_Status IPSGS
-            WHERE 1=1
-        """
-        params = {}
 
-    # Add date filtering
-    if start_dt:
-        query_text += " AND IPSGS.Game_Start >= :start_dt"
-        params["start_dt"] = start_dt
-    if end_dt:
-        query_text += " AND IPSGS.Game_Start <= :end_dt"
-        params["end_dt"] = end_dt
+def _feed_aggregators(rows, aggregators):
+    views = results_cache.results_for_rows([row._mapping for row in rows])
+    for row, view in zip(rows, views):
+        for aggregator in aggregators:
+            aggregator.add(row, view)
+    return len(rows)
 
 
-    query = text(query_text)
+# -- Error Frequency Over Time --
+def get_error_frequency_bins(start_month=None, end_month=None, bin_size=5, scope=None):
+    """
+    Warning/minor/severe error counts per time bin for the error frequency chart.
 
+    The binning runs in MySQL (JSON_TABLE + FLOOR(time / bin_size) + GROUP BY) so only
+    one row per bin is transferred. If that query fails (e.g. MySQL < 8.0 or a
+    malformed Results blob), the Results are scanned and binned in Python instead
+    (_ErrorBins); both paths return the same structure.
+    """
     try:
-        with engine.connect() as conn:
-            result = conn.execute(query, params)
-            rows = result.fetchall()
-
-        results = [dict(row._mapping) for row in rows]
-        logger.info(f"Fetched {len(results)} rows from the database.")
-        return results
+        return run_results_aggregators(
+            ["error_bins"], start_month, end_month, scope, bin_size=bin_size
+        )["error_bins"]
     except Exception as e:
         logger.error(f"Failed to fetch results: {e}")
-        return []
+        return _label_error_bins({}, 0, bin_size)
 
 
-def bin_errors_over_time(results, bin_size=5):
-    aggregated_bins = defaultdict(lambda: {"warnings": 0, "minors": 0, "severes": 0})
-    max_time = 0
+def _bin_errors_in_sql(params, bin_size):
+    params = {**params, "bin_size": bin_size}
 
-    for row in results:
-        raw_json = row.get("Results") or row.get("results")
-        if not raw_json:
-            continue
+    with read_connection() as conn:
+        rows = conn.execute(ERROR_BINS_QUERY, params).fetchall()
 
-        try:
-            data = json.loads(raw_json)
-        except Exception as e:
-            logger.warning(f"Skipping invalid JSON: {e}")
-            continue
+    counts = {}
+    max_time = 0
+    for row in rows:
+        counts[int(row.bin_idx) * bin_size] = {
+            "warnings": int(row.warnings),
+            "minors": int(row.minors),
+            "severes": int(row.severes),
+        }
+        if row.max_time > max_time:
+            max_time = row.max_time
 
-        errors = data.get("errors", {})
-        for err_type in ["warning", "minor", "severe"]:
-            for err in errors.get(err_type, []):
-                t = err.get("time")
-                if t is not None:
-                    bin_start = int(t // bin_size) * bin_size
-                    bin_label = f"{bin_start}-{bin_start + bin_size}s"
-                    aggregated_bins[bin_label][f"{err_type}s"] += 1
-                    if t > max_time:
-                        max_time = t
+    logger.info(f"Binned errors in SQL into {len(counts)} non-empty bins.")
+    return _label_error_bins(counts, max_time, bin_size)
 
+
+def _label_error_bins(counts, max_time, bin_size):
+    """
+    Turn {bin_start: counts} into the ordered {"35-40s": counts} mapping used by the
+    chart and the LLM prompt, filling empty bins up to max_time.
+    """
     # Ensure all bins up to max_time are represented
+    all_counts = dict(counts)
     total_bins = math.ceil(max_time / bin_size)
     for i in range(total_bins + 1):
-        bin_start = i * bin_size
-        bin_label = f"{bin_start}-{bin_start + bin_size}s"
-        if bin_label not in aggregated_bins:
-            aggregated_bins[bin_label] = {"warnings": 0, "minors": 0, "severes": 0}
+        all_counts.setdefault(i * bin_size, {"warnings": 0, "minors": 0, "severes": 0})
 
-    sorted_bins = dict(
-        sorted(aggregated_bins.items(), key=lambda x: int(x[0].split("-")[0]))
-    )
+    return {
+        f"{bin_start}-{bin_start + bin_size}s": all_counts[bin_start]
+        for bin_start in sorted(all_counts)
+    }
 
-    return sorted_bins
 
+def has_binned_errors(binned_data):
+    """
+    True when at least one time bin holds an error.
+    """
+    return any(sum(counts.values()) > 0 for counts in binned_data.values())
 
-def error_frequency_analysis(results, client):
-    # Bin the data
-    binned_data = bin_errors_over_time(results, bin_size=5)
 
+def error_frequency_analysis(binned_data, client, bin_size=5):
     # Keep only bins with any errors
     non_empty_bins = {
         k: v for k, v in binned_data.items() if sum(v.values()) > 0
     }
 
     try:
-        compact_bins = {
-            k: {"w": v["warnings"], "m": v["minors"], "s": v["severes"]}
+        compact_bins = [
+            {"bin": k, "w": v["warnings"], "m": v["minors"], "s": v["severes"]}
             for k, v in non_empty_bins.items()
-        }
-        binned_data_json = json.dumps(compact_bins)
+        ]
+        binned_data_json = prompt_budget.payload(compact_bins, "error_frequency")
     except Exception as e:
         print("[ERROR] Failed to serialize binned data:", e)
         return [{"title": "Error", "content": "Failed to serialize data"}]
@@ -127,7 +576,7 @@ def error_frequency_analysis(results, client):
     prompt_text = f"""
     You are an expert training analyst.
 
-    I have aggregated the warning, minor and severe errors from multiple game sessions into 5-second time bins.
+    I have aggregated the warning, minor and severe errors from multiple game sessions into {bin_size}-second time bins.
     The data below shows the count of warnings and minors occurring in each time interval over the entire session duration:
 
     Return exactly these sections as second-level headings (##). Use short paragraphs (no bullet symbols). Do not include any introduction before the first heading.
@@ -151,6 +600,8 @@ def error_frequency_analysis(results, client):
     {binned_data_json}
     """
 
+    prompt_budget.log_prompt("error_frequency", prompt_text)
+
     if callable(client):
         # If client is a callable function (e.g., local LLM)
         insights_text = client(prompt_text)
@@ -170,47 +621,137 @@ def error_frequency_analysis(results, client):
 
 
 # -- Overall User Analysis --
-def get_user_results():
-    role = session.get("role")  
-    user_id = session.get("user_id")
-    if role == "teacher":
-        query = text("""SELECT IPS.User_ID , IPS.results
-                     FROM IMA_Plan_Session IPS 
-                     INNER JOIN IMA_Admin_User IAU ON IPS.User_ID = IAU.User_ID
-                     WHERE IAU.Admin_ID = :user_id
-                     ORDER BY IPS.User_ID""")
-        params = {"user_id": user_id}
-    else:
-        query = text("SELECT User_ID , results FROM IMA_Plan_Session ORDER BY User_ID")
-        params = {}
+USER_SUMMARY_EXAMPLES = 5  # lowest and highest scoring users listed in the summary
 
-    try:
-        with engine.connect() as conn:
-            result = conn.execute(query , params)
-            rows = result.fetchall()
 
-        results2 = [dict(row._mapping) for row in rows]
-        logger.info(f"Fetched {len(results2)} rows from the database.")
-        return results2
+def get_user_summary(start_month=None, end_month=None, scope=None):
+    """
+    Cohort summary of every user in scope for overall_user_analysis: session and
+    attempt totals, completion, scores, error categories, per-user distributions
+    and the USER_SUMMARY_EXAMPLES lowest and highest scoring users. Its size does
+    not depend on the number of users. Returns {} when there are no sessions.
+    """
+    start_dt, end_dt = parse_month_range(start_month, end_month)
+    params = query_params(scope, start_dt=start_dt, end_dt=end_dt)
+    sessions = defaultdict(lambda: defaultdict(int))  # user -> mode -> sessions
+    try:
+        for row in stream_rows(USER_SESSIONS_QUERY, params):
+            sessions[row.user_id][row.mode] += row.sessions
+        attempts = run_results_aggregators(
+            ["user_summaries"], start_month, end_month, scope
+        )["user_summaries"]
     except Exception as e:
-        logger.error(f"Failed to fetch results: {e}")
-        return []
+        logger.error(f"Failed to summarise users: {e}")
+        return {}
+    if not sessions:
+        return {}
+
+    users = []
+    for user_id, modes in sessions.items():
+        stats = attempts.get(user_id) or _UserStats()
+        top_error = max(stats.errors, key=stats.errors.get)
+        users.append(
+            {
+                "user_id": user_id,
+                "sessions": sum(modes.values()),
+                "attempts": stats.attempts,
+                "completion_rate": _rate(stats.completed, stats.attempts),
+                "average_score": (
+                    round(stats.score_sum / stats.scored, 2) if stats.scored else None
+                ),
+                "errors_per_attempt": _rate(sum(stats.errors.values()), stats.attempts, 1),
+                "top_error": top_error if stats.errors[top_error] else None,
+            }
+        )
+    logger.info(f"Summarised {len(users)} users for the overall user analysis.")
+
+    totals = _UserStats()
+    sessions_by_mode = defaultdict(int)
+    for user_id in sessions:
+        for mode, count in sessions[user_id].items():
+            sessions_by_mode[mode] += count
+        stats = attempts.get(user_id)
+        if stats is None:
+            continue
+        totals.attempts += stats.attempts
+        totals.completed += stats.completed
+        totals.failed += stats.failed
+        totals.score_sum += stats.score_sum
+        totals.scored += stats.scored
+        for category, count in stats.errors.items():
+            totals.errors[category] += count
+
+    scored_users = [u for u in users if u["average_score"] is not None]
+    by_score = itemgetter("average_score")
+    active = [u for u in users if u["attempts"]]
+    return {
+        "users": len(users),
+        "users_without_attempts": len(users) - len(active),
+        "sessions": sum(sessions_by_mode.values()),
+        "sessions_by_mode": dict(sessions_by_mode),
+        "attempts": totals.attempts,
+        "completed": totals.completed,
+        "failed": totals.failed,
+        "completion_rate": _rate(totals.completed, totals.attempts),
+        "average_score": (
+            round(totals.score_sum / totals.scored, 2) if totals.scored else None
+        ),
+        "errors": totals.errors,
+        "errors_per_attempt": {
+            category: _rate(count, totals.attempts, 1)
+            for category, count in totals.errors.items()
+        },
+        "users_by_top_error": dict(
+            Counter(u["top_error"] for u in users if u["top_error"]).most_common()
+        ),
+        "per_user": {
+            "sessions": descriptors.five_numbers([u["sessions"] for u in users]),
+            "attempts": descriptors.five_numbers([u["attempts"] for u in users]),
+            "completion_rate": descriptors.five_numbers(
+                [u["completion_rate"] for u in active]
+            ),
+            "average_score": descriptors.five_numbers(
+                [u["average_score"] for u in scored_users]
+            ),
+            "errors_per_attempt": descriptors.five_numbers(
+                [u["errors_per_attempt"] for u in active]
+            ),
+        },
+        "lowest_scoring_users": heapq.nsmallest(
+            USER_SUMMARY_EXAMPLES, scored_users, key=by_score
+        ),
+        "highest_scoring_users": heapq.nlargest(
+            USER_SUMMARY_EXAMPLES, scored_users, key=by_score
+        ),
+    }
+
+
+def _rate(part, whole, scale=100):
+    # part / whole as a percentage (or per-unit rate with scale=1), 2 decimals
+    return round(part / whole * scale, 2) if whole else 0
 
 
-def overall_user_analysis(results2, client):
+def overall_user_analysis(summary, client):
+    json_data = prompt_budget.payload(summary, "overall_user")
     prompt_text = f"""
     You are an expert training analyst.
 
     Return exactly these sections as second-level headings (##) for each point. Use short paragraphs (no bullet symbols). Do not include any introduction before the first heading.
 
+    The data summarises every user: session counts by mode, game attempts, completion rate (%), average score,
+    error totals and errors per attempt by category, how many users have each category as their most frequent,
+    per-user distributions (min/q1/median/q3/max/mean/std) and the lowest and highest scoring users.
+
     Data to analyze:
-    {results2}
+    {json_data}
 
     Can you analyze this data and provide the analysis and insights. Please focus
     on overall user analysis for everyone instead of individuals. 
 
     """
 
+    prompt_budget.log_prompt("overall_user", prompt_text)
+
     if callable(client):
         # If client is a callable function (e.g., local LLM)
         insights_text = client(prompt_text)
@@ -229,52 +770,15 @@ def overall_user_analysis(results2, client):
     return cleaned_insights_overall_score
 
 # -- Session Duration vs Performance --
-def get_duration_vs_errors(start_month=None, end_month=None):
-    role = session.get("role")  
-    user_id = session.get("user_id")
+def get_duration_vs_errors(start_month=None, end_month=None, scope=None):
     start_dt, end_dt = parse_month_range(start_month, end_month)
 
-    # Start with a string, not text()
-    if role == "teacher":
-        query_text = """
-            SELECT IPSGS.Game_Start AS game_start,
-                   IPSGS.Game_End AS game_end,
-                   IPSGS.Score AS score
-            FROM IMA_Plan_Session_Game_Status IPSGS
-            INNER JOIN IMA_Plan_Session IPS ON IPSGS.Session_ID = IPS.Session_ID
-            INNER JOIN IMA_Admin_User IAU ON IPS.User_ID = IAU.User_ID
-            WHERE IAU.Admin_ID = :user_id
-              AND IPSGS.Game_Start IS NOT NULL
-              AND IPSGS.Game_End IS NOT NULL
-              AND IPSGS.Score IS NOT NULL
-        """
-        params = {"user_id": user_id}
-    else:
-        query_text = """
-            SELECT Game_Start AS game_start,
-                   Game_End AS game_end,
-                   Score AS score
-            FROM IMA_Plan_Session_Game_Status
-            WHERE Game_Start IS NOT NULL
-              AND Game_End IS NOT NULL
-              AND Score IS NOT NULL
-        """
-        params = {}
-
-    # Add date filters (still strings)
-    if start_dt:
-        query_text += " AND IPSGS.Game_Start >= :start_dt" if role == "teacher" else " AND Game_Start >= :start_dt"
-        params["start_dt"] = start_dt
-    if end_dt:
-        query_text += " AND IPSGS.Game_Start <= :end_dt" if role == "teacher" else " AND Game_End <= :end_dt"
-        params["end_dt"] = end_dt
-
-    # Only convert to TextClause here
-    query = text(query_text)
+    # Both roles filter the date range on Game_Start
+    params = query_params(scope, start_dt=start_dt, end_dt=end_dt)
 
     try:
-        with engine.connect() as conn:
-            result = conn.execute(query , params)
+        with read_connection() as conn:
+            result = conn.execute(DURATION_QUERY, params)
             rows = result.fetchall()
             logger.info(f"Fetched {len(rows)} rows for perf vs dura analysis.")
             if rows:
@@ -302,13 +806,28 @@ def get_duration_vs_errors(start_month=None, end_month=None):
     return duration_score_data
 
 
-def performance_vs_duration(data, client):
-    json_data = json.dumps(data, indent=2)
+def describe_duration_vs_score(duration_data):
+    """
+    Descriptors (utils.descriptors.describe_pairs) of get_duration_vs_errors() points.
+    """
+    return descriptors.describe_pairs(
+        [entry["duration_minutes"] for entry in duration_data],
+        [entry["score"] for entry in duration_data],
+        "duration_minutes",
+        "score",
+    )
+
+
+def performance_vs_duration(summary, client):
+    json_data = prompt_budget.payload(summary, "performance_vs_duration")
 
     prompt = f"""
     You are an expert training analyst.
 
-    I have aggregated the training session data showing session duration (in minutes) and the score achieved.
+    I have summarised the training session data showing session duration (in minutes) and the score achieved.
+    The statistics cover all n sessions: five-number summaries of both, the Pearson correlation, the regression
+    slope (score per extra minute), score quartiles within duration bands (duration quartiles), and the sessions
+    whose score is furthest from the trend (outliers by IQR or z-score on the residual).
     Return exactly these sections as second-level headings (##). Use short paragraphs (no bullet symbols). Do not include any introduction before the first heading.
 
     ## Relationship
@@ -326,10 +845,12 @@ def performance_vs_duration(data, client):
     ## Additional Insights
     Provide any additional insights regarding the performance vs duration of minigames.
 
-    Data to analyze:
+    Statistics to analyze:
     {json_data}
     """
 
+    prompt_budget.log_prompt("performance_vs_duration", prompt)
+
     if callable(client):
         # If client is a callable function (e.g., local LLM)
         insights_text = client(prompt)
@@ -349,131 +870,66 @@ def performance_vs_duration(data, client):
 
 
 # -- Average Scores for all Minigames --
-def get_practice_assessment_rows(start_month=None, end_month=None):
-    print(f"[DEBUG] get_practice_assessment_rows called with: start_month={start_month}, end_month={end_month}")
-    role = session.get("role")  
-    user_id = session.get("user_id")
-
+def get_practice_assessment_scores(start_month=None, end_month=None, scope=None):
+    """
+    Score, level name and max score of every game in the practice/training
+    sessions of the range, in one round-trip.
+    Read from the attempt summary when it is built, otherwise parsed from Results.
+    """
     start_dt, end_dt = parse_month_range(start_month, end_month)
+    params = query_params(scope, start_dt=start_dt, end_dt=end_dt)
 
-    if role == "teacher":
-        query_text = """
-            SELECT IPS.Session_ID, IPS.Results, IPS.Session_Start
-            FROM IMA_Plan_Session IPS
-            INNER JOIN IMA_Admin_User IAU ON IPS.User_ID = IAU.User_ID
-            WHERE IAU.Admin_ID = :user_id
-            AND (IPS.Results LIKE '%Practice%' OR IPS.Results LIKE '%Training%')
-        """
-        params = {"user_id": user_id}
-
-    else:
-        query_text = """
-            SELECT IPS.Session_ID, IPS.Results, IPS.Session_Start
-            FROM IMA_Plan_Session IPS
-            WHERE (Results LIKE '%Practice%' OR Results LIKE '%Training%')
-        """
-        params = {}
-    
-    # Add date filtering
-    if start_dt:
-        query_text += " AND IPS.Session_Start >= :start_dt"
-        params["start_dt"] = start_dt
-    if end_dt:
-        query_text += " AND IPS.Session_Start <= :end_dt"
-        params["end_dt"] = end_dt
-
-    query = text(query_text)
+    if attempt_summary.summary_ready():
+        try:
+            return [
+                dict(row._mapping)
+                for row in stream_rows(PRACTICE_SCORES_SUMMARY_QUERY, params)
+            ]
+        except Exception as e:
+            logger.warning(f"Attempt summary unavailable, parsing Results instead: {e}")
 
     try:
-        with engine.connect() as conn:
-            result = conn.execute(query , params)
-            rows = result.fetchall()
-
-        sessions = [dict(row._mapping) for row in rows]
-        if sessions:
-            print(
-                f"[DEBUG] First 5 Session IDs: {[s['Session_ID'] for s in sessions[:5]]}"
+        with read_connection() as conn:
+            rows = conn.execute(PRACTICE_SCORES_QUERY, params).fetchall()
+        views = results_cache.results_for_rows([row._mapping for row in rows])
+
+        scores = []
+        for row, results in zip(rows, views):
+            if not results.valid:
+                logger.warning(f"Skipping session {row.Session_ID} game with invalid Results")
+                continue
+            scores.append(
+                {
+                    "Session_ID": row.Session_ID,
+                    "score": row.score,
+                    "level_name": results.level_name() or results.game(""),
+                    "max_score": results.max_score(),
+                }
             )
-
-        session_ids = [s["Session_ID"] for s in sessions]
-        scores = get_scores_for_sessions(session_ids)
-
-        scores_dict = {s["Session_ID"]: s for s in scores}
-        for s in sessions:
-            sid = s["Session_ID"]
-            if sid in scores_dict:
-                s["score"] = scores_dict[sid].get("score")
-                s["game_results"] = scores_dict[sid].get("results")
-            else:
-                s["score"] = None
-                s["game_results"] = None
-
-        return sessions
-
-    except Exception as e:
-        print(f"[ERROR] Failed to fetch practice/assessment rows or scores: {e}")
-        return []
-
-
-def get_scores_for_sessions(session_ids):
-    if not session_ids:
-        print("[WARN] No session IDs provided to fetch scores.")
-        return []
-    role = session.get("role")  
-    user_id = session.get("user_id")
-    if role == "teacher":
-        query = text(
-            """
-            SELECT IPSGS.Session_ID, IPSGS.score, IPSGS.results
-            FROM IMA_Plan_Session_Game_Status IPSGS
-            INNER JOIN IMA_Plan_Session IPS ON IPSGS.Session_ID = IPS.Session_ID
-            INNER JOIN IMA_Admin_User IAU ON IPS.User_ID = IAU.User_ID
-            WHERE IAU.Admin_ID = :user_id
-            AND IPSGS.Session_ID IN :session_ids
-        """
-        ).bindparams(bindparam("session_ids", expanding=True))
-        params = {"user_id": user_id , "session_ids": session_ids}
-    else:
-
-        query = text(
-            """
-            SELECT Session_ID, score, results
-            FROM IMA_Plan_Session_Game_Status
-            WHERE Session_ID IN :session_ids
-        """
-        ).bindparams(bindparam("session_ids", expanding=True))
-        params = {"session_ids" : session_ids}
-    try:
-        with engine.connect() as conn:
-            result = conn.execute(query, params)
-            rows = result.fetchall()
-        return [dict(row._mapping) for row in rows]
+        return scores
     except Exception as e:
         print(f"[ERROR] Failed to fetch scores: {e}")
         return []
 
 
 def calculate_avg_score_per_minigame(scores_rows):
-    from collections import defaultdict
-    import re
-    import json
-
+    """
+    Average score and max score per minigame from get_practice_assessment_scores() rows.
+    """
     scores_by_minigame = defaultdict(list)
     max_score_by_minigame = {}
+    game_keys = {}  # level name -> minigame; names repeat across rows
 
     for row in scores_rows:
         try:
-            data = json.loads(row["results"])
-
-            raw_name = data.get("level_name") or data.get("game", "")
+            raw_name = row.get("level_name") or ""
 
-            cleaned_name = re.sub(r"<.*?>", "", raw_name).strip()
-
-            match = re.match(r"(MG\d+\s+(?:Practice|Training))", cleaned_name, re.IGNORECASE)
-            game_key = match.group(1) if match else cleaned_name
+            game_key = game_keys.get(raw_name)
+            if game_key is None:
+                game_key = game_keys[raw_name] = _minigame_key(raw_name)
 
             score = row.get("score")
-            max_score = data.get("max-score") or data.get("max_score")
+            max_score = row.get("max_score")
 
             if score is not None:
                 scores_by_minigame[game_key].append(score)
@@ -491,11 +947,15 @@ def calculate_avg_score_per_minigame(scores_rows):
     return avg_scores, max_score_by_minigame
 
 
-def get_avg_scores_for_practice_assessment(start_month=None, end_month=None):
-    sessions = get_practice_assessment_rows(start_month, end_month)
-    session_ids = [s["Session_ID"] for s in sessions]
+def _minigame_key(raw_name):
+    cleaned_name = re.sub(r"<.*?>", "", raw_name).strip()
+
+    match = re.match(r"(MG\d+\s+(?:Practice|Training))", cleaned_name, re.IGNORECASE)
+    return match.group(1) if match else cleaned_name
 
-    scores_rows = get_scores_for_sessions(session_ids)
+
+def get_avg_scores_for_practice_assessment(start_month=None, end_month=None, scope=None):
+    scores_rows = get_practice_assessment_scores(start_month, end_month, scope=scope)
     avg_scores, max_score_by_minigame = calculate_avg_score_per_minigame(scores_rows)
 
     return avg_scores, max_score_by_minigame
@@ -511,7 +971,7 @@ def avg_scores_for_practice_assessment_analysis(
         for game in avg_scores
     ]
 
-    formatted_data = json.dumps(combined_scores, indent=2)
+    formatted_data = prompt_budget.payload(combined_scores, "avg_scores")
 
     prompt = f"""
     You are an expert training analyst.
@@ -538,6 +998,8 @@ def avg_scores_for_practice_assessment_analysis(
     {formatted_data}
     """
 
+    prompt_budget.log_prompt("avg_scores", prompt)
+
     if callable(client):
         # If client is a callable function (e.g., local LLM)
         insights_text = client(prompt)
@@ -556,78 +1018,54 @@ def avg_scores_for_practice_assessment_analysis(
     return cleaned_insights_avg_score
 
 # -- Total Error vs Completion Time --
-def get_error_type_vs_score(start_month=None, end_month=None):
-    role = session.get("role")
-    user_id = session.get("user_id")
-    start_dt, end_dt = parse_month_range(start_month, end_month)
-    
-    if role == "teacher":
-        query_text = """
-            SELECT IPSGS.results, IPSGS.Game_Start
-            FROM IMA_Plan_Session_Game_Status IPSGS
-            INNER JOIN IMA_Plan_Session IPS ON IPSGS.Session_ID = IPS.Session_ID
-            INNER JOIN IMA_Admin_User IAU ON IPS.User_ID = IAU.User_ID
-            WHERE IAU.Admin_ID = :user_id
-            AND IPSGS.score IS NOT NULL
-        """
-        params = {"user_id": user_id}
-    else:
-        query_text = """SELECT IPSGS.Results AS results, IPSGS.Game_Start
-            FROM IMA_Plan_Session_Game_Status IPSGS
-            WHERE IPSGS.Score IS NOT NULL"""
-        params = {}
-
-    if start_dt:
-        query_text += " AND IPSGS.Game_Start >= :start_dt"
-        params["start_dt"] = start_dt
-    if end_dt:
-        query_text += " AND IPSGS.Game_Start <= :end_dt"
-        params["end_dt"] = end_dt
-    
-    query = text(query_text)
-
+def get_error_type_vs_score(start_month=None, end_month=None, scope=None):
     try:
-        with engine.connect() as conn:
-            result = conn.execute(query, params)
-            rows = result.fetchall()
+        return run_results_aggregators(
+            ["error_vs_time"], start_month, end_month, scope
+        )["error_vs_time"]
     except Exception as e:
         logger.error(f"Failed to fetch error vs score data: {e}")
         return []
 
-    error_score_data = []
-    for row in rows:
-        try:
-            data = json.loads(row.results)
-            errors = data.get("errors", {})
 
-            # Sum all errors for this session
-            total_errors = sum(len(errors.get(err_type, [])) for err_type in ["warning", "minor", "severe"])
-
-            # Keep the breakdown if needed for analysis
-            error_counts = {
-                "warnings": len(errors.get("warning", [])),
-                "minors": len(errors.get("minor", [])),
-                "severes": len(errors.get("severe", []))
-            }
+def _error_score_point(warnings, minors, severes, total_time):
+    return {
+        "errors": {"warnings": warnings, "minors": minors, "severes": severes},  # breakdown for analysis
+        "total_errors": warnings + minors + severes,  # summed for plotting
+        "total_time": total_time,
+    }
 
-            total_time_for_session = data.get("total-time", None)
-            error_score_data.append({
-                "errors": error_counts,       # breakdown for analysis
-                "total_errors": total_errors, # summed for plotting
-                "total_time": total_time_for_session
-            })
-        except Exception as e:
-            logger.warning(f"Skipping row due to JSON or score error: {e}")
-            continue
+def describe_error_vs_time(points):
+    """
+    Descriptors of get_error_type_vs_score() points: errors vs completion time,
+    per error type effect sizes on completion time, and co-occurrence shares.
+    Points without a completion time are left out.
+    """
+    points = [p for p in points if descriptors.is_number(p["total_time"])]
+    times = [p["total_time"] for p in points]
+    counts = {
+        err_type: [p["errors"][err_type] for p in points]
+        for err_type in ("warnings", "minors", "severes")
+    }
+    summary = descriptors.describe_pairs(
+        times, [p["total_errors"] for p in points], "total_time", "total_errors"
+    )
+    if points:
+        summary["error_types"] = descriptors.effect_sizes(times, counts)
+        summary["co_occurrence"] = descriptors.co_occurrence(counts)
+    return summary
 
-    return error_score_data
 
-def error_type_vs_score_analysis(data, client):
-    json_data = json.dumps(data, indent=2)
+def error_type_vs_score_analysis(summary, client):
+    json_data = prompt_budget.payload(summary, "error_type_vs_score")
     prompt = f"""
     You are an expert training analyst.
 
-    I have aggregated session data with the total number of errors (sum of warnings, minor, and severe) and the completion time in each session.
+    I have summarised session data with the total number of errors (sum of warnings, minor, and severe) and the completion time (seconds) in each session.
+    The statistics cover all n sessions: five-number summaries, the correlation and regression slope of errors on
+    completion time, error quartiles within completion time bands, outlier sessions, and per error type the share
+    of sessions with it, mean completion time with and without it, Cohen's d and the correlation of its count with
+    completion time. co_occurrence is the share of sessions containing both error types.
     Return exactly these sections as second-level headings (##). Use short paragraphs (no bullet symbols). Do not include any introduction before the first heading.
 
     ## Error Impact
@@ -645,10 +1083,12 @@ def error_type_vs_score_analysis(data, client):
     ## Recommendations
     Suggest interventions to reduce high-impact errors and help users complete sessions more efficiently.
 
-    Data to analyze:
+    Statistics to analyze:
     {json_data}
     """
 
+    prompt_budget.log_prompt("error_type_vs_score", prompt)
+
     if callable(client):
         insights_text = client(prompt)
     else:
@@ -666,79 +1106,27 @@ def error_type_vs_score_analysis(data, client):
 
 
 # Calculate Student Improvements
-def get_monthly_avg_scores_by_minigame(start_month=None, end_month=None):
-    role = session.get("role")
-    user_id = session.get("user_id")
-    start_dt, end_dt = parse_month_range(start_month, end_month)
+def get_monthly_avg_scores_by_minigame(start_month=None, end_month=None, scope=None):
+    return run_results_aggregators(
+        ["monthly_averages"], start_month, end_month, scope
+    )["monthly_averages"]
 
-    # --- SQL query ---
-    if role == "teacher":
-        query_text = """
-            SELECT IPSGS.Game_Start, IPSGS.Results
-            FROM IMA_Plan_Session_Game_Status IPSGS
-            INNER JOIN IMA_Plan_Session IPS 
-                ON IPSGS.Session_ID = IPS.Session_ID
-            INNER JOIN IMA_Admin_User IAU 
-                ON IPS.User_ID = IAU.User_ID
-            WHERE IAU.Admin_ID = :user_id
-              AND (IPS.Results LIKE '%Practice%' OR IPS.Results LIKE '%Training%' OR IPS.Results LIKE '%Assessment%')
-        """
-        params = {"user_id": user_id}
-    else:
-        query_text = """
-            SELECT IPSGS.Game_Start, IPSGS.Results
-            FROM IMA_Plan_Session_Game_Status IPSGS
-            INNER JOIN IMA_Plan_Session IPS 
-                ON IPSGS.Session_ID = IPS.Session_ID
-            WHERE (IPS.Results LIKE '%Practice%' OR IPS.Results LIKE '%Training%' OR IPS.Results LIKE '%Assessment%')
-        """
-        params = {}
-
-    # Date filters
-    if start_dt:
-        query_text += " AND IPSGS.Game_Start >= :start_dt"
-        params["start_dt"] = start_dt
-    if end_dt:
-        query_text += " AND IPSGS.Game_Start <= :end_dt"
-        params["end_dt"] = end_dt
-
-    query = text(query_text)
-
-    # --- Fetch rows ---
-    with engine.connect() as conn:
-        rows = [dict(row._mapping) for row in conn.execute(query, params).fetchall()]
-
-    # --- Aggregate: scores by minigame + month ---
-    scores_by_game_month = defaultdict(list)
 
-    for row in rows:
-        try:
-            data = json.loads(row["Results"])
-            score = data.get("final-score")
-            level_name = data.get("level_name", "")
-
-            # Strip Game Name
-            minigame_match = re.match(r"^(MG\d+\s+(Training|Practice))<br>", level_name)
-            if minigame_match:
-                minigame = minigame_match.group(1)
-            elif level_name == "Assessment":
-                minigame = "Assessment"
-            else:
-                minigame = None
-
-            if score is None or not minigame:
-                continue
+def _minigame_from_level_name(level_name):
+    # Strip Game Name
+    minigame_match = re.match(r"^(MG\d+\s+(Training|Practice))<br>", level_name)
+    if minigame_match:
+        return minigame_match.group(1)
+    if level_name == "Assessment":
+        return "Assessment"
+    return None
 
-            month_key = row["Game_Start"].strftime("%Y-%m")
-            scores_by_game_month[(minigame, month_key)].append(score)
-        except Exception as e:
-            print(f"Error parsing row: {e}", flush=True)
-            continue
 
+def _monthly_averages(scores_by_game_month):
     # --- Compute averages ---
     results = defaultdict(list)
-    for (minigame, month_key), scores in scores_by_game_month.items():
-        avg_score = sum(scores) / len(scores)
+    for (minigame, month_key), (score_sum, score_count) in scores_by_game_month.items():
+        avg_score = score_sum / score_count
         results[minigame].append({"month": month_key, "average_score": avg_score})
 
     # --- Sort months for each minigame ---
@@ -748,8 +1136,7 @@ def get_monthly_avg_scores_by_minigame(start_month=None, end_month=None):
     return results
 
 def trend_analysis_daily_scores(daily_avg_scores, client):
-    import json
-    data_json = json.dumps(daily_avg_scores, indent=2)
+    data_json = prompt_budget.payload(daily_avg_scores, "daily_score_trend")
 
     prompt = f"""
     You are an expert training analyst.
@@ -775,6 +1162,8 @@ def trend_analysis_daily_scores(daily_avg_scores, client):
     {data_json}
     """
 
+    prompt_budget.log_prompt("daily_score_trend", prompt)
+
     if callable(client):
         insights_text = client(prompt)
     else:
@@ -789,133 +1178,189 @@ def trend_analysis_daily_scores(daily_avg_scores, client):
 
     return clear_formatting(insights_text)
 
-def get_student_game_results(start_month=None, end_month=None):
-    role = session.get("role")
-    user_id = session.get("user_id")
-    
-    start_dt, end_dt = parse_month_range(start_month, end_month)
+def get_student_game_results(start_month=None, end_month=None, scope=None):
+    """
+    Top and bottom k students with their rows, for the chart and the LLM prompt.
+    """
+    return get_student_ranking(start_month, end_month, scope).as_dict()
 
-    # Build query
-    if role == "teacher":
-        query_text = """
-            SELECT IPSGS.Results AS results,
-                   IPSGS.Game_Start AS game_start,
-                   IPS.User_ID,
-                   A.username
-            FROM IMA_Plan_Session_Game_Status IPSGS
-            INNER JOIN IMA_Plan_Session IPS ON IPSGS.Session_ID = IPS.Session_ID
-            INNER JOIN IMA_Admin_User IAU ON IPS.User_ID = IAU.User_ID
-            INNER JOIN Account A ON IPS.User_ID = A.Id
-            WHERE IAU.Admin_ID = :user_id
-        """
-        params = {"user_id": user_id}
-    else:
-        query_text = """
-            SELECT IPSGS.Results AS results,
-                   IPSGS.Game_Start AS game_start,
-                   IPS.User_ID,
-                   A.username
-            FROM IMA_Plan_Session_Game_Status IPSGS
-            INNER JOIN IMA_Plan_Session IPS ON IPSGS.Session_ID = IPS.Session_ID
-            INNER JOIN Account A ON IPS.User_ID = A.Id
-            WHERE 1=1
-        """
-        params = {}
 
-    if start_dt:
-        query_text += " AND IPSGS.Game_Start >= :start_dt"
-        params["start_dt"] = start_dt
-    if end_dt:
-        query_text += " AND IPSGS.Game_Start <= :end_dt"
-        params["end_dt"] = end_dt
+def get_student_ranking(start_month=None, end_month=None, scope=None, k=None, prior_weight=None):
+    """
+    StudentRanking for a scope and month range. A ranking built in the last
+    Config.STUDENT_RANKING_TTL seconds (e.g. by the /overall page) is reused, so
+    per-student lookups don't rescan the attempts.
+    """
+    start_dt, end_dt = parse_month_range(start_month, end_month)
+    params = query_params(scope, start_dt=start_dt, end_dt=end_dt)
+    key = _ranking_key(params, *_ranking_weights(k, prior_weight))
 
-    query = text(query_text)
+    with _rankings_lock:
+        entry = _rankings.get(key)
+    if entry and entry[0] > time.monotonic():
+        return entry[1]
 
     try:
-        with engine.connect() as conn:
-            result = conn.execute(query, params)
-            rows = [dict(row._mapping) for row in result.fetchall()]
+        return run_results_aggregators(
+            ["student_scores"], start_month, end_month, scope, k=k, prior_weight=prior_weight
+        )["student_scores"]
     except Exception as e:
         print(f"[ERROR] Failed to fetch student game results: {e}")
-        return {"raw": [], "top": [], "bottom": [], "top_rows": [], "bottom_rows": []}
+        return StudentRanking({}, k=k, prior_weight=prior_weight)
 
-    # Track performance and completion
-    performance = defaultdict(list)
-    completion_counts = defaultdict(lambda: {"completed": 0, "total": 0})
 
-    for row in rows:
-        try:
-            result_data = json.loads(row["results"])
-            score = result_data.get("final-score", 0)
-            performance[row["username"]].append(score)
-
-            status = result_data.get("status", "").lower()
-            completion_counts[row["username"]]["total"] += 1
-            if status == "complete":
-                completion_counts[row["username"]]["completed"] += 1
-        except Exception:
-            continue
+_rankings = {}  # (admin_id, start_dt, end_dt, k, prior_weight) -> (expires_at, StudentRanking)
+_rankings_lock = threading.Lock()
 
-    # Weighted average calculation
-    all_scores = [score for scores in performance.values() for score in scores]
-    global_avg = sum(all_scores) / len(all_scores) if all_scores else 0
-    k = 3  # Confidence weight in a single game's information of being accurate
-
-    weighted_scores = {}
-    for u, scores in performance.items():
-        n = len(scores)
-        if n > 0:
-            # Use Bayesian Average which balances two competing feature
-            # Formula for Bayesian Average
-            # WeightedAvg = [sum(scores) + k * global average score across all students] / no. of games the student played + k
-            weighted_avg = (sum(scores) + global_avg * k) / (n + k)
-            weighted_scores[u] = weighted_avg
-
-    sorted_students = sorted(weighted_scores.items(), key=lambda x: x[1], reverse=True)
-
-    top_usernames = {u for u, _ in sorted_students[:3]}
-    bottom_usernames = {u for u, _ in sorted_students[-3:]}
-
-    def simplify_rows(rows_list):
-        simplified = []
-        for r in rows_list:
-            try:
-                results_data = json.loads(r.get("results", "{}"))
-            except Exception:
-                results_data = {}
-            counts = completion_counts[r["username"]]
-            simplified.append({
-                "username": r["username"],
-                "completion_rate": round(counts["completed"]/counts["total"]*100, 2) if counts["total"]>0 else 0,
-                "games_played": counts["total"],
-                "status": results_data.get("status", ""),
-                "accuracy": results_data.get("accuracy", 0),
-                "total_time": results_data.get("total-time", 0)
-            })
-        return simplified
-
-    top_rows = simplify_rows([r for r in rows if r["username"] in top_usernames])
-    bottom_rows = simplify_rows([r for r in rows if r["username"] in bottom_usernames])
 
-    return {
-        "top": sorted_students[:3],
-        "bottom": sorted_students[-3:],
-        "top_rows": top_rows,
-        "bottom_rows": bottom_rows
-    }
+def _ranking_weights(k, prior_weight):
+    return (
+        Config.TOP_BOTTOM_STUDENTS if k is None else k,
+        Config.STUDENT_SCORE_PRIOR_WEIGHT if prior_weight is None else prior_weight,
+    )
+
+
+def _ranking_key(params, k, prior_weight):
+    # The student set follows from admin_id, so it isn't part of the key
+    return (params["admin_id"], params["start_dt"], params["end_dt"], k, prior_weight)
+
+
+def _remember_ranking(params, ranking):
+    now = time.monotonic()
+    with _rankings_lock:
+        for key in [key for key, (expires_at, _) in _rankings.items() if expires_at <= now]:
+            del _rankings[key]
+        _rankings[_ranking_key(params, ranking.k, ranking.prior_weight)] = (
+            now + Config.STUDENT_RANKING_TTL,
+            ranking,
+        )
+
+
+class _StudentStats:
+    """
+    Running totals for one student; status/accuracy/time are from the latest game.
+    """
+
+    __slots__ = ("score_sum", "games", "completed", "last_start", "status", "accuracy", "total_time")
+
+    def __init__(self):
+        self.score_sum = 0
+        self.games = 0
+        self.completed = 0
+        self.last_start = None
+
+    def add(self, score, status, accuracy, total_time, game_start):
+        self.score_sum += score
+        self.games += 1
+        if isinstance(status, str) and status.lower() == "complete":
+            self.completed += 1
+        if self.games == 1 or (
+            game_start is not None and (self.last_start is None or game_start >= self.last_start)
+        ):
+            self.last_start = game_start
+            self.status = status
+            self.accuracy = accuracy
+            self.total_time = total_time
+
+
+class StudentRanking:
+    """
+    Students ranked by a Bayesian average of their scores:
+
+        (sum(scores) + prior_weight * global average) / (games + prior_weight)
+
+    which pulls students with few games toward the global average.
+    top()/bottom() pick k students with heapq; row() and rank() answer for one
+    student without rescanning.
+    """
+
+    def __init__(self, stats, k=None, prior_weight=None):
+        self.k, self.prior_weight = _ranking_weights(k, prior_weight)
+        self._stats = stats
+
+        total_score = sum(s.score_sum for s in stats.values())
+        total_games = sum(s.games for s in stats.values())
+        global_avg = total_score / total_games if total_games else 0
+        self.weighted = {
+            username: (s.score_sum + global_avg * self.prior_weight) / (s.games + self.prior_weight)
+            for username, s in stats.items()
+        }
+        self._ranks = None
+
+    def __len__(self):
+        return len(self.weighted)
+
+    def top(self, k=None):
+        """
+        [(username, weighted average)] of the k best students, best first.
+        """
+        return heapq.nlargest(self.k if k is None else k, self.weighted.items(), key=itemgetter(1))
+
+    def bottom(self, k=None):
+        """
+        The k lowest-ranked students, listed best first like top().
+        """
+        lowest = heapq.nsmallest(self.k if k is None else k, self.weighted.items(), key=itemgetter(1))
+        return lowest[::-1]
+
+    def rank(self, username):
+        """
+        1-based rank of a student (1 = best), or None if they have no scored games.
+        """
+        if self._ranks is None:
+            ordered = sorted(self.weighted, key=self.weighted.get, reverse=True)
+            self._ranks = {u: position for position, u in enumerate(ordered, 1)}
+        return self._ranks.get(username)
+
+    def row(self, username):
+        """
+        Summary row of one student, or None if they have no scored games.
+        """
+        stats = self._stats.get(username)
+        if stats is None:
+            return None
+        return {
+            "username": username,
+            "completion_rate": round(stats.completed / stats.games * 100, 2),
+            "games_played": stats.games,
+            "status": stats.status,
+            "accuracy": stats.accuracy,
+            "total_time": stats.total_time,
+        }
+
+    def as_dict(self):
+        top, bottom = self.top(), self.bottom()
+        return {
+            "top": top,
+            "bottom": bottom,
+            "top_rows": [self.row(username) for username, _ in top],
+            "bottom_rows": [self.row(username) for username, _ in bottom],
+        }
+
+
+def _iter_student_rows_from_summary(params):
+    """
+    Yield (username, valid, final_score, status, accuracy, total_time, game_start)
+    per game, read from the attempt summary.
+    """
+    for row in stream_rows(STUDENT_RESULTS_SUMMARY_QUERY, params):
+        yield (
+            row.username,
+            bool(row.valid),
+            row.final_score,
+            row.status,
+            row.accuracy,
+            row.total_time,
+            row.game_start,
+        )
 
 
 def top_vs_bottom_analysis(student_data, client):
     """
-    Analyze top vs bottom students using AI, safely handling datetime objects.
+    Analyze top vs bottom students using AI.
     Assumes student_data rows are already simplified with key fields.
     """
 
-    def default_serializer(o):
-        if isinstance(o, datetime):
-            return o.isoformat()
-        raise TypeError(f"Type {type(o)} not serializable")
-
     # Use the rows as-is; no further parsing needed
     top_summary = student_data.get("top", [])
     bottom_summary = student_data.get("bottom", [])
@@ -930,14 +1375,14 @@ def top_vs_bottom_analysis(student_data, client):
         "bottom_rows": bottom_rows
     }
 
-    json_data = json.dumps(analysis_payload, indent=2, default=default_serializer)
+    json_data = prompt_budget.payload(analysis_payload, "top_vs_bottom")
 
     # Construct AI prompt
     prompt = f"""
     You are an expert training analyst.
 
     I have aggregated data on student performance from training sessions. Focus specifically on the top performers and bottom performers. 
-    Top and bottom summaries contain usernames and average scores. Detailed rows contain completion_rate, games_played, status, accuracy, and total_time for each game.
+    Top and bottom summaries contain usernames and average scores. Detailed rows contain one row per student with completion_rate and games_played, plus the status, accuracy, and total_time of their latest game.
 
     Return exactly these sections as second-level headings (##). Use short paragraphs, no bullet points, and avoid introducing the analysis before the first heading. Only use normal sentences in short paragraphs.
 
@@ -957,6 +1402,8 @@ def top_vs_bottom_analysis(student_data, client):
     {json_data}
     """
 
+    prompt_budget.log_prompt("top_vs_bottom", prompt)
+
     # Send prompt to AI
     if callable(client):
         insights_text = client(prompt)
@@ -976,10 +1423,10 @@ def personalised_feedback_analysis(student_row, client):
     prompt = f"""
     You are an expert training analyst.
 
-    Analyze the following student's performance data which contains usernames and average scores. Detailed rows contain completion_rate, games_played, status, accuracy, and total_time for each gameand provide feedback.
+    Analyze the following student's performance data and provide feedback. It contains their average score, rank among all students, completion_rate, games_played, and the status, accuracy, and total_time of their latest game.
 
     Data:
-    {json.dumps(student_row, indent=2)}
+    {prompt_budget.payload(student_row, "personalised_feedback")}
 
     Return exactly these sections as second-level headings (##). Use short paragraphs, no bullet points, and avoid introducing the analysis before the first heading.
 
@@ -993,6 +1440,8 @@ def personalised_feedback_analysis(student_row, client):
     Suggest motivational strategies that can help support this student.
     """
 
+    prompt_budget.log_prompt("personalised_feedback", prompt)
+
     # Send prompt to AI
     if callable(client):
         feedback = client(prompt)
@@ -0,0 +1,84 @@
+"""
+records.py
+----------
+Compact, tuple-backed row records used by the analysis fetchers.
+
+A record stores one row as a plain tuple (no per-row ``__dict__``) and keeps
+the column -> position map on its class, so it costs a fraction of
+``dict(row._mapping)`` while still supporting the access patterns the
+analysis code already uses:
+
+    rec["Score"], rec.get("Status"), rec.Score
+
+Convert to dicts only at the JSON boundary with ``as_dicts(records)``.
+"""
+
+from functools import lru_cache
+
+
+class Record(tuple):
+    """
+    Immutable row with named access. Subclasses are created by record_type().
+    """
+
+    __slots__ = ()
+    _fields = ()
+    _index = {}
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return tuple.__getitem__(self, self._index[key])
+        return tuple.__getitem__(self, key)
+
+    def __getattr__(self, name):
+        try:
+            return tuple.__getitem__(self, self._index[name])
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def get(self, key, default=None):
+        index = self._index.get(key)
+        return default if index is None else tuple.__getitem__(self, index)
+
+    def keys(self):
+        return self._fields
+
+    def to_dict(self):
+        return dict(zip(self._fields, self))
+
+    def __repr__(self):
+        fields = ", ".join(f"{k}={v!r}" for k, v in zip(self._fields, self))
+        return f"{type(self).__name__}({fields})"
+
+
+@lru_cache(maxsize=None)
+def record_type(name: str, fields: tuple):
+    """
+    Return (and cache) a Record subclass for the given column names.
+    Column names may contain spaces (e.g. "Minor Errors"); those are only
+    reachable by key, not by attribute.
+    """
+    return type(
+        name,
+        (Record,),
+        {
+            "__slots__": (),
+            "_fields": fields,
+            "_index": {field: i for i, field in enumerate(fields)},
+        },
+    )
+
+
+def fetch_records(result, name: str = "Record"):
+    """
+    Materialise a SQLAlchemy result as a list of compact records.
+    """
+    cls = record_type(name, tuple(result.keys()))
+    return [cls(row) for row in result]
+
+
+def as_dicts(records):
+    """
+    Convert records to plain dicts (for jsonify / templates).
+    """
+    return [r.to_dict() for r in records]
@@ -1,7 +1,13 @@
 from flask import session
-from sqlalchemy import text
-from utils.db import engine
-import json
+from sqlalchemy import bindparam, text
+from utils.db import read_connection
+from utils.student_scope import get_student_ids
+from utils import attempt_summary, level_map
+from utils import prompt_budget
+from utils import results_cache
+from utils import vector_stats
+from utils.results_json import Results, decode
+from analysis.records import fetch_records, record_type
 import logging
 import re
 from statistics import mean
@@ -9,6 +15,16 @@ from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
 
+USER_GAME_RESULT_FIELDS = (
+    "User_ID", "Game_Start", "Game_End", "Status", "Score", "Overall_Results",
+    "GameLevel", "Imprecisions", "Warnings", "Minor Errors", "Severe Errors",
+)
+
+USER_ALL_GAMES_RESULT_FIELDS = (
+    "Level_ID", "Game_Name", "Status", "Game_Start", "Game_End", "Score",
+    "Overall_Results",
+)
+
 
 def get_list_of_users():
     role = session.get("role")
@@ -20,11 +36,10 @@ def get_list_of_users():
             """
             SELECT DISTINCT Id as "user_id", Username as "username"
             FROM Account A
-            INNER JOIN IMA_Admin_User IAU ON A.Id = IAU.User_ID
-            WHERE IAU.Admin_ID = :user_id
+            WHERE A.Id IN :student_ids
         """
-        )
-        params = {"user_id": user_id}
+        ).bindparams(bindparam("student_ids", expanding=True))
+        params = {"student_ids": list(get_student_ids(user_id))}
     else:
         query = text(
             """
@@ -35,7 +50,7 @@ def get_list_of_users():
         params = {}
 
     try:
-        with engine.connect() as conn:
+        with read_connection() as conn:
             result = conn.execute(query, params)
             users = [dict(row._mapping) for row in result.fetchall()]
 
@@ -73,7 +88,7 @@ def get_list_of_games():
     )
 
     try:
-        with engine.connect() as conn:
+        with read_connection() as conn:
             result = conn.execute(query)
             games = [dict(row._mapping) for row in result.fetchall()]
 
@@ -127,63 +142,71 @@ def categorize_user(user_id) -> str:
 
 
 def get_user_game_results(user_id, game_id, date_start=None, date_end=None):
-    query = """
-        WITH combined AS (
-            SELECT
-                ps.User_ID, psgs.Game_Start, psgs.Game_End, psgs.Status, 
-                psgs.Score, psgs.Results AS "Overall_Results",
-                CASE 
-                WHEN ps.Results LIKE '%Training%' 
-                    THEN MAX(CASE WHEN psl.Sequence_Order = 0 THEN psl.Level_ID END)
-                WHEN ps.Results LIKE '%Practice%' 
-                    THEN MAX(CASE WHEN psl.Sequence_Order = 1 THEN psl.Level_ID END)
-                END AS GameLevel
-            FROM IMA_Plan_Session AS ps
-            JOIN IMA_Plan_Session_Game_Status AS psgs ON ps.Session_ID = psgs.Session_ID
-            JOIN IMA_Plan_Game AS pg ON psgs.Plan_Game_ID = pg.Plan_Game_ID
-            JOIN IMA_Progression_Sequence_Level AS psl ON pg.Sequence = psl.Sequence_ID
-            GROUP BY ps.Session_ID, pg.Plan_Game_ID
-
-            UNION
-
-            -- SELECT RESULTS THAT ARE NOT MATCHED ABOVE WITH NO PROGRESSION SEQUENCE (e.g. Assessment Levels)
-            SELECT
-                ps.User_ID, psgs.Game_Start, psgs.Game_End, psgs.Status, 
-                psgs.Score, psgs.Results AS "Overall_Results",
-                pg.Level AS GameLevel
-            FROM IMA_Plan_Session AS ps
-            JOIN IMA_Plan_Session_Game_Status AS psgs ON ps.Session_ID = psgs.Session_ID
-            JOIN IMA_Plan_Game AS pg ON psgs.Plan_Game_ID = pg.Plan_Game_ID
-            WHERE NOT EXISTS (
-                SELECT 1
-                FROM IMA_Progression_Sequence_Level psl2
-                WHERE pg.Sequence = psl2.Sequence_ID
+    if attempt_summary.summary_ready():
+        try:
+            return _get_user_game_results_from_summary(
+                user_id, game_id, date_start, date_end
             )
-        )
-        SELECT *,
-        JSON_LENGTH(Overall_Results->'$.errors.imprecision') AS "Imprecisions",
-        JSON_LENGTH(Overall_Results->'$.errors.warning')     AS "Warnings",
-        JSON_LENGTH(Overall_Results->'$.errors.minor')       AS "Minor Errors",
-        JSON_LENGTH(Overall_Results->'$.errors.severe')      AS "Severe Errors"
-        FROM combined
-        WHERE User_ID = :user_id and GameLevel = :game_id
-    """
+        except Exception as e:
+            logger.warning(f"Attempt summary unavailable, using live query: {e}")
 
-    params = {"user_id": user_id, "game_id": game_id}
+    # Levels are resolved from the cached plan game map; SQL only reads this
+    # user's attempts of the plan games that can resolve to the level
+    try:
+        level_id = int(game_id)
+    except (TypeError, ValueError):
+        return []
 
+    date_filter = ""
+    params = {"user_id": user_id}
     if date_start and date_end:
-        query += " AND Game_Start BETWEEN :date_start AND :date_end"
+        date_filter = "AND psgs.Game_Start BETWEEN :date_start AND :date_end"
         params["date_start"] = date_start + " 00:00:00"
         params["date_end"] = date_end + " 23:59:59"
 
-    query = text(query)
+    query = text(
+        f"""
+        SELECT
+            ps.Results AS Session_Results, psgs.Plan_Game_ID,
+            ps.User_ID, psgs.Game_Start, psgs.Game_End, psgs.Status,
+            psgs.Score, psgs.Results AS Overall_Results,
+            JSON_LENGTH(psgs.Results->'$.errors.imprecision') AS Imprecisions,
+            JSON_LENGTH(psgs.Results->'$.errors.warning')     AS Warnings,
+            JSON_LENGTH(psgs.Results->'$.errors.minor')       AS Minor_Errors,
+            JSON_LENGTH(psgs.Results->'$.errors.severe')      AS Severe_Errors
+        FROM IMA_Plan_Session AS ps
+        JOIN IMA_Plan_Session_Game_Status AS psgs ON ps.Session_ID = psgs.Session_ID
+        WHERE ps.User_ID = :user_id
+        AND psgs.Plan_Game_ID IN :plan_game_ids
+        {date_filter}
+        ORDER BY psgs.Game_Start, psgs.Session_ID
+    """
+    ).bindparams(bindparam("plan_game_ids", expanding=True))
 
     try:
-        with engine.connect() as conn:
-            result = conn.execute(query, params)
-            rows = result.fetchall()
+        params["plan_game_ids"] = level_map.plan_games_for_level(level_id)
+        if not params["plan_game_ids"]:
+            logger.info(f"No plan games resolve to game {game_id}")
+            return []
+
+        UserGameResult = record_type("UserGameResult", USER_GAME_RESULT_FIELDS)
+        results = []
+        with read_connection() as conn:
+            for row in conn.execute(query, params):
+                mode = level_map.session_mode(row.Session_Results)
+                if level_map.resolve_level(row.Plan_Game_ID, mode) != level_id:
+                    continue
+                results.append(
+                    UserGameResult(
+                        (
+                            row.User_ID, row.Game_Start, row.Game_End, row.Status,
+                            row.Score, row.Overall_Results, level_id,
+                            row.Imprecisions, row.Warnings,
+                            row.Minor_Errors, row.Severe_Errors,
+                        )
+                    )
+                )
 
-        results = [dict(row._mapping) for row in rows]
         logger.info(
             f"Fetched {len(results)} game results for user {user_id} and game {game_id}"
         )
@@ -195,73 +218,86 @@ def get_user_game_results(user_id, game_id, date_start=None, date_end=None):
         return []
 
 
+def _get_user_game_results_from_summary(user_id, game_id, date_start=None, date_end=None):
+    """
+    Same rows as get_user_game_results(), with the level resolution and error
+    counts read from the attempt summary instead of recomputed per request.
+    """
+    query = f"""
+        SELECT
+            ds.User_ID, psgs.Game_Start, psgs.Game_End, psgs.Status,
+            psgs.Score, psgs.Results AS "Overall_Results",
+            ds.Level_ID AS GameLevel,
+            ds.Imprecision_Count AS "Imprecisions",
+            ds.Warning_Count     AS "Warnings",
+            ds.Minor_Count       AS "Minor Errors",
+            ds.Severe_Count      AS "Severe Errors"
+        FROM {attempt_summary.SUMMARY_TABLE} ds
+        JOIN IMA_Plan_Session_Game_Status AS psgs
+            ON psgs.Session_ID = ds.Session_ID AND psgs.Plan_Game_ID = ds.Plan_Game_ID
+        WHERE ds.User_ID = :user_id AND ds.Level_ID = :game_id
+    """
+
+    params = {"user_id": user_id, "game_id": game_id}
+
+    if date_start and date_end:
+        query += " AND ds.Game_Start BETWEEN :date_start AND :date_end"
+        params["date_start"] = date_start + " 00:00:00"
+        params["date_end"] = date_end + " 23:59:59"
+
+    with read_connection() as conn:
+        results = fetch_records(conn.execute(text(query), params), "UserGameResult")
+
+    logger.info(
+        f"Fetched {len(results)} game results for user {user_id} and game {game_id} from summary"
+    )
+    return results
+
+
 def get_user_all_games_results(user_id):
     """
-    Get all games played by a specific user across all minigames
-    Reuses existing query logic but for all games
+    Get all games played by a specific user across all minigames, with each
+    attempt's level resolved from the cached plan game map (utils.level_map)
     """
     query = text(
         """
-        WITH combined AS (
-            SELECT
-                ps.Session_ID, ps.User_ID, ps.Results,
-                psgs.Plan_Game_ID, psgs.Status, psgs.Game_Start, psgs.Game_End, 
-                psgs.Score, psgs.Results AS "Overall_Results",
-                CASE 
-                    WHEN ps.Results LIKE '%Training%' 
-                        THEN MAX(CASE WHEN psl.Sequence_Order = 0 THEN psl.Level_ID END)
-                    WHEN ps.Results LIKE '%Practice%' 
-                        THEN MAX(CASE WHEN psl.Sequence_Order = 1 THEN psl.Level_ID END)
-                END AS GameLevel
-            FROM IMA_Plan_Session AS ps
-            JOIN IMA_Plan_Session_Game_Status AS psgs 
-                ON ps.Session_ID = psgs.Session_ID
-            JOIN IMA_Plan_Game AS pg 
-                ON psgs.Plan_Game_ID = pg.Plan_Game_ID
-            JOIN IMA_Progression_Sequence_Level AS psl 
-                ON pg.Sequence = psl.Sequence_ID
-            GROUP BY ps.Session_ID, ps.User_ID, ps.Results,
-                    psgs.Plan_Game_ID, psgs.Status, psgs.Game_Start, 
-                    psgs.Game_End, psgs.Score, psgs.Results
-            UNION
-            SELECT
-                ps.Session_ID, ps.User_ID, ps.Results,
-                psgs.Plan_Game_ID, psgs.Status, psgs.Game_Start, psgs.Game_End, 
-                psgs.Score, psgs.Results AS "Overall_Results",
-                pg.Level AS GameLevel
-            FROM IMA_Plan_Session AS ps
-            JOIN IMA_Plan_Session_Game_Status AS psgs 
-                ON ps.Session_ID = psgs.Session_ID
-            JOIN IMA_Plan_Game AS pg 
-                ON psgs.Plan_Game_ID = pg.Plan_Game_ID
-            WHERE NOT EXISTS (
-                SELECT 1
-                FROM IMA_Progression_Sequence_Level psl2
-                WHERE pg.Sequence = psl2.Sequence_ID
-            )
-        )
         SELECT
-            c.GameLevel AS Level_ID,
-            REPLACE(igl.Name, '<br>', ' - ') AS Game_Name,
-            c.Status,
-            c.Game_Start,
-            c.Game_End,
-            c.Score,
-            c.Overall_Results
-        FROM combined c
-        JOIN IMA_Game_Level igl 
-            ON c.GameLevel = igl.Level_ID
-        WHERE c.User_ID = :user_id
-        ORDER BY igl.Name, c.Game_Start;
+            ps.Results AS Session_Results, psgs.Plan_Game_ID,
+            psgs.Status, psgs.Game_Start, psgs.Game_End,
+            psgs.Score, psgs.Results AS Overall_Results
+        FROM IMA_Plan_Session AS ps
+        JOIN IMA_Plan_Session_Game_Status AS psgs
+            ON ps.Session_ID = psgs.Session_ID
+        WHERE ps.User_ID = :user_id
     """
     )
 
     try:
-        with engine.connect() as conn:
-            result = conn.execute(query, {"user_id": user_id})
-            rows = result.fetchall()
+        UserAllGamesResult = record_type(
+            "UserAllGamesResult", USER_ALL_GAMES_RESULT_FIELDS
+        )
+        keyed = []
+        with read_connection() as conn:
+            for row in conn.execute(query, {"user_id": user_id}):
+                mode = level_map.session_mode(row.Session_Results)
+                level_id = level_map.resolve_level(row.Plan_Game_ID, mode)
+                name = level_map.level_name(level_id)
+                if name is None:
+                    continue
+                display_name, raw_name = name
+                record = UserAllGamesResult(
+                    (
+                        level_id, display_name, row.Status, row.Game_Start,
+                        row.Game_End, row.Score, row.Overall_Results,
+                    )
+                )
+                # Ordered by level name, then start time (unstarted first)
+                start = row.Game_Start
+                keyed.append(((raw_name, start is not None, start or datetime.min), record))
+
+        keyed.sort(key=lambda item: item[0])
+        results = [record for _, record in keyed]
 
-        results = [dict(row._mapping) for row in rows]
         logger.info(f"Fetched {len(results)} total game results for user {user_id}")
         return results
     except Exception as e:
@@ -276,23 +312,26 @@ def analyze_results(results, analysis_type="single_game"):
     if analysis_type == "overall_assessment":
         return analyze_overall_assessment(results)
 
-    # Existing single game analysis
-    all_scores = [r["Score"] for r in results if r["Score"] is not None]
-    completed = [r for r in results if r["Status"] == "complete"]
-    failed = [r for r in results if r["Status"] == "fail"]
-
+    # Existing single game analysis, done in one pass over the attempts
+    all_scores = []
+    completed = failed = 0
+    score_trend = []
     error_trend = []
 
-    # Create a trend based on order of attempts
-    score_trend = [
-        {"Attempt": f"Attempt {i+1}", "Score": r["Score"]}
-        for i, r in enumerate(results)
-        if r["Score"] is not None
-    ]
-
     for i, r in enumerate(results):
-        # Collect error counts per attempt
         attempt_label = f"Attempt {i+1}"
+        score = r["Score"]
+        if score is not None:
+            all_scores.append(score)
+            # Create a trend based on order of attempts
+            score_trend.append({"Attempt": attempt_label, "Score": score})
+
+        if r["Status"] == "complete":
+            completed += 1
+        elif r["Status"] == "fail":
+            failed += 1
+
+        # Collect error counts per attempt
         error_trend.append(
             {
                 "Attempt": attempt_label,
@@ -303,13 +342,14 @@ def analyze_results(results, analysis_type="single_game"):
             }
         )
 
+    average_score, min_score, max_score = vector_stats.score_stats(all_scores)
     return {
         "attempts": len(results),
-        "completed_attempts": len(completed),
-        "failed_attempts": len(failed),
-        "average_score": round(mean(all_scores), 2) if all_scores else 0,
-        "min_score": min(all_scores) if all_scores else 0,
-        "max_score": max(all_scores) if all_scores else 0,
+        "completed_attempts": completed,
+        "failed_attempts": failed,
+        "average_score": round(average_score, 2) if all_scores else 0,
+        "min_score": min_score if all_scores else 0,
+        "max_score": max_score if all_scores else 0,
         "trend": score_trend,
         "errors": error_trend,
     }
@@ -338,13 +378,14 @@ def analyze_overall_assessment(results):
     for game_name, game_results in games_data.items():
         scores = [r["score"] for r in game_results if r["score"] is not None]
         if scores:
+            average_score, min_score, max_score = vector_stats.score_stats(scores)
             game_stats.append(
                 {
                     "game_name": game_name,
-                    "average_score": round(mean(scores), 2),
+                    "average_score": round(average_score, 2),
                     "total_attempts": len(game_results),
-                    "min_score": min(scores),
-                    "max_score": max(scores),
+                    "min_score": min_score,
+                    "max_score": max_score,
                     "completed": len(
                         [r for r in game_results if r["status"] == "complete"]
                     ),
@@ -380,6 +421,13 @@ def analyze_overall_assessment(results):
 
 def analyze_single_attempt(results, client):
 
+    # The attempt's Results arrive as a JSON string; decoded, their lists can be
+    # sampled entry by entry when the payload is over budget
+    attempt = dict(results)
+    overall = decode(attempt.get("Overall_Results"))
+    if overall is not None:
+        attempt["Overall_Results"] = overall
+
     prompt_text = f"""
     You are an expert training analyst. I will provide you with the detailed JSON result of a user's attempt in a serious game training module. Your task is to analyze the performance based on the structured metrics provided.
 
@@ -419,9 +467,11 @@ def analyze_single_attempt(results, client):
     Your response must be in English language.
 
     Here is the data:
-    {json.dumps(results, indent=2)}
+    {prompt_budget.payload(attempt, "single_attempt")}
     """
 
+    prompt_budget.log_prompt("single_attempt", prompt_text)
+
     if callable(client):
         # If client is a callable function (e.g., local LLM)
         return client(prompt_text)
@@ -442,9 +492,8 @@ def analyze_multiple_attempts(results, client):
     summarized_attempts = []
 
     for attempt in results:
-        try:
-            raw = json.loads(attempt.get("Overall_Results", "{}"))
-        except json.JSONDecodeError:
+        view = Results(attempt.get("Overall_Results", "{}"))
+        if not view.valid:
             continue
 
         summarized_attempts.append(
@@ -452,26 +501,23 @@ def analyze_multiple_attempts(results, client):
                 "Start": attempt.get("Game_Start"),
                 "End": attempt.get("Game_End"),
                 "Status": attempt.get("Status"),
-                "Final Score": raw.get("final-score", 0),
-                "Accuracy (%)": raw.get("accuracy", 0),
-                "Duration (s)": round(raw.get("total-time", 0), 2),
-                "Minor Errors": raw.get("minor-count", 0),
-                "Warnings": raw.get("warning-count", 0),
-                "Severe Errors": raw.get("severe-count", 0),
-                "Good Actions": len(raw.get("errors", {}).get("good", [])),
-                "Minor Actions": len(raw.get("errors", {}).get("minor", [])),
-                "Warning Actions": len(raw.get("errors", {}).get("warning", [])),
-                "Severe Actions": len(raw.get("errors", {}).get("severe", [])),
+                "Final Score": view.score(0),
+                "Accuracy (%)": view.accuracy(0),
+                "Duration (s)": round(view.total_time(0), 2),
+                "Minor Errors": view.get("minor-count", 0),
+                "Warnings": view.get("warning-count", 0),
+                "Severe Errors": view.get("severe-count", 0),
+                "Good Actions": view.error_count("good"),
+                "Minor Actions": view.error_count("minor"),
+                "Warning Actions": view.error_count("warning"),
+                "Severe Actions": view.error_count("severe"),
             }
         )
 
-        # If more than 20 attempts, summarize to the first 20
-        if len(summarized_attempts) > 20:
-            summarized_attempts = summarized_attempts[:20]
-
     prompt_text = f"""
-    You are an expert training analyst. Below is a JSON list of gameplay attempts for a training module by the same user. 
-    Each object contains the attempt's status, start and end time, final score, and a result field with detailed breakdown.
+    You are an expert training analyst. Below is a JSON table of gameplay attempts for a training module by the same user, in order.
+    Each row contains the attempt's status, start and end time, final score, and a detailed breakdown of its results.
+    When there are many attempts, an evenly spaced sample of rows is shown, with total_rows and a column_summary covering every attempt.
 
     Please analyze the entire dataset holistically by:
     1. Identify performance trends across attempts (improving, stable, declining).
@@ -486,9 +532,11 @@ def analyze_multiple_attempts(results, client):
     No overall title is needed, just start with the main paragraphs and its headings. The headings should be third-level headings (###).
 
     JSON Data:
-    {json.dumps(summarized_attempts, indent=2)}
+    {prompt_budget.payload(summarized_attempts, "multiple_attempts")}
     """
 
+    prompt_budget.log_prompt("multiple_attempts", prompt_text)
+
     if callable(client):
         # If client is a callable function (e.g., local LLM)
         return client(prompt_text)
@@ -561,7 +609,7 @@ def fetch_user_errors(user_id):
 
     query = text(
         """
-        SELECT GS.results
+        SELECT GS.Session_ID, GS.Plan_Game_ID, GS.Results, GS.Game_End
         FROM IMA_Plan_Session_Game_Status AS GS
         INNER JOIN IMA_Plan_Session AS PS ON GS.Session_ID = PS.Session_ID
         WHERE PS.User_ID = :user_id
@@ -570,7 +618,7 @@ def fetch_user_errors(user_id):
     )
 
     try:
-        with engine.connect() as conn:
+        with read_connection() as conn:
             result = conn.execute(
                 query, {"user_id": user_id, "thirty_days_ago": thirty_days_ago}
             )
@@ -579,19 +627,14 @@ def fetch_user_errors(user_id):
         # Storage for all error categories
         all_imprecision, all_warning, all_minor, all_severe = [], [], [], []
 
-        for row in rows:
-            raw = row[0]
-            if raw is None:
-                continue
-
-            try:
-                data = json.loads(raw)
-                all_imprecision.extend(data.get("errors", {}).get("imprecision", []))
-                all_warning.extend(data.get("errors", {}).get("warning", []))
-                all_minor.extend(data.get("errors", {}).get("minor", []))
-                all_severe.extend(data.get("errors", {}).get("severe", []))
-            except json.JSONDecodeError as e:
-                logger.warning(f"Skipping invalid JSON: {e}")
+        # Finished attempts' errors come decoded from the shared cache
+        for results in results_cache.results_for_rows([row._mapping for row in rows]):
+            if not results.valid:
+                continue  # no Results yet, or invalid JSON
+            all_imprecision.extend(results.errors("imprecision"))
+            all_warning.extend(results.errors("warning"))
+            all_minor.extend(results.errors("minor"))
+            all_severe.extend(results.errors("severe"))
 
         # Deduplicate results
         all_imprecision = deduplicate(all_imprecision)
@@ -612,11 +655,17 @@ def fetch_user_errors(user_id):
 
 
 def categorize_mistakes(errors, client):
-    prompt_text = f"""
+    # Texts must come back unchanged, so the errors are never sampled or cut:
+    # they are split into parts within the budget, one LLM call per part
+    parts = prompt_budget.chunks(errors, "categorize_mistakes")
+    outputs = []
+    for number, data in enumerate(parts, 1):
+        part = f" (part {number} of {len(parts)})" if len(parts) > 1 else ""
+        prompt_text = f"""
     You are an expert training analyst.
-    The data below shows the text and types of errors that a user has made:
+    The data below shows the text and types of errors that a user has made{part}:
 
-    {errors}
+    {data}
 
     Please help to categorize these errors according to their texts 
     and provide any recommendations on what the user can do to reduce making these errors in the game
@@ -624,24 +673,25 @@ def categorize_mistakes(errors, client):
 
     Ensure that the texts are kept exactly the same
     """
-    if callable(client):
-        # If client is a callable function (e.g., local LLM)
-        raw_output = client(prompt_text)
-    else:
-        # API supports role-based messages
-        response = client.chat.completions.create(
-            model="deepseek-chat",
-            messages=[
-                {"role": "system", "content": "You are a gameplay data analyst."},
-                {"role": "user", "content": prompt_text},
-            ],
-        )
-        raw_output = response.choices[0].message.content
+        prompt_budget.log_prompt("categorize_mistakes", prompt_text)
+        if callable(client):
+            # If client is a callable function (e.g., local LLM)
+            raw_output = client(prompt_text)
+        else:
+            # API supports role-based messages
+            response = client.chat.completions.create(
+                model="deepseek-chat",
+                messages=[
+                    {"role": "system", "content": "You are a gameplay data analyst."},
+                    {"role": "user", "content": prompt_text},
+                ],
+            )
+            raw_output = response.choices[0].message.content
 
-    cleaned_ouput = response_cleanup(raw_output)
-    final_output = trim_first_and_last_line(cleaned_ouput)
+        cleaned_ouput = response_cleanup(raw_output)
+        outputs.append(trim_first_and_last_line(cleaned_ouput))
 
-    return final_output
+    return "\n\n".join(outputs)
 
 
 def generate_error_trend_prompt(user_id, game_id, errors, scores, client):
@@ -676,11 +726,13 @@ def generate_error_trend_prompt(user_id, game_id, errors, scores, client):
     User ID: {user_id}
     Game ID: {game_id}
     Errors:
-    {json.dumps(errors, indent=2)}
+    {prompt_budget.payload(errors, "error_trend", share=0.7)}
     Scores:
-    {scores}
+    {prompt_budget.payload(scores, "error_trend", share=0.3)}
     """
 
+    prompt_budget.log_prompt("error_trend", prompt_text)
+
     if callable(client):
         # If client is a callable function (e.g., local LLM)
         return client(prompt_text)
@@ -2,6 +2,7 @@ from flask import Flask
 
 from utils.db import test_db_connection
 from utils.cache import init_cache
+from utils.ingest import start_ingester
 from config import Config
 
 import logging
@@ -14,6 +15,7 @@ from routes.overall import overall_bp
 from routes.user import user_bp
 from routes.minigame import minigame_bp
 from routes.login import login_bp
+from routes.status import status_bp
 
 app = Flask(__name__)
 app.config["AI-TYPE"] = "API"  # Default to API model
@@ -38,8 +40,10 @@ app.register_blueprint(overall_bp)
 app.register_blueprint(user_bp)
 app.register_blueprint(minigame_bp)
 app.register_blueprint(login_bp)
+app.register_blueprint(status_bp)
 
 init_cache(app)
+start_ingester()
 
 
 # Route to test round robin of nginx load balancing
@@ -33,7 +33,77 @@ class Config:
     DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
     OLLAMA_PATH = os.getenv("OLLAMA_PATH")
 
-    DB_URI = f"mysql+mysqlconnector://{SQL_USER}:{SQL_PASSWORD}@{SQL_HOST}:{SQL_PORT}/{SQL_DATABASE}"
+    # DBAPI driver; "pymysql" (or "mysqldb") enables true server-side cursors for streamed reads
+    DB_DRIVER = os.getenv("DB_DRIVER", "mysqlconnector")
+
+    DB_URI = f"mysql+{DB_DRIVER}://{SQL_USER}:{SQL_PASSWORD}@{SQL_HOST}:{SQL_PORT}/{SQL_DATABASE}"
+
+    # Connection pool tuning (optional, shared by every module using utils.db)
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))  # seconds to wait for a checkout
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds before a connection is replaced
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "10"))
+    DB_STREAM_BATCH_SIZE = int(os.getenv("DB_STREAM_BATCH_SIZE", "1000"))  # rows per streamed fetch
+
+    # Read replicas for the read-only analysis queries (optional, comma-separated URIs)
+    DB_REPLICA_URIS = [
+        uri.strip() for uri in os.getenv("DB_REPLICA_URIS", "").split(",") if uri.strip()
+    ]
+    DB_REPLICA_MAX_LAG = int(os.getenv("DB_REPLICA_MAX_LAG", "30"))  # seconds behind primary
+    DB_REPLICA_CHECK_INTERVAL = int(os.getenv("DB_REPLICA_CHECK_INTERVAL", "15"))  # seconds
+
+    # Materialised attempt summary and its background ingester (utils/attempt_summary.py, utils/ingest.py)
+    ATTEMPT_SUMMARY_ENABLED = os.getenv("ATTEMPT_SUMMARY_ENABLED", "true").lower() == "true"
+    ATTEMPT_SUMMARY_REFRESH_INTERVAL = int(os.getenv("ATTEMPT_SUMMARY_REFRESH_INTERVAL", "60"))  # seconds between ingest runs
+    ATTEMPT_SUMMARY_LOOKBACK_SESSIONS = int(os.getenv("ATTEMPT_SUMMARY_LOOKBACK_SESSIONS", "50"))  # re-checked for late rows
+
+    # Concurrent data fetches for the /overall page (routes/overall.py); keep workers below the DB pool size
+    OVERALL_FETCH_WORKERS = int(os.getenv("OVERALL_FETCH_WORKERS", "4"))
+    OVERALL_FETCH_TIMEOUT = int(os.getenv("OVERALL_FETCH_TIMEOUT", "30"))  # seconds for the whole page
+
+    # Scatter charts on /overall: "points" (every session) or "summary" (descriptors); ?chart_mode= overrides
+    OVERALL_CHART_MODE = os.getenv("OVERALL_CHART_MODE", "points").lower()
+
+    # Seconds between data-version checks for the memoized minigame stats (analysis/minigames_analysis.py)
+    MINIGAME_STATS_RECHECK_INTERVAL = int(os.getenv("MINIGAME_STATS_RECHECK_INTERVAL", "30"))
+
+    # Seconds the Plan_Game_ID -> Level_ID map is reused before a version check (utils/level_map.py)
+    LEVEL_MAP_TTL = int(os.getenv("LEVEL_MAP_TTL", "300"))
+
+    # Top/bottom student ranking (analysis/overall_analysis.py): students shown at each end,
+    # prior weight in games for the Bayesian average, and seconds a ranking is reused
+    TOP_BOTTOM_STUDENTS = int(os.getenv("TOP_BOTTOM_STUDENTS", "3"))
+    STUDENT_SCORE_PRIOR_WEIGHT = float(os.getenv("STUDENT_SCORE_PRIOR_WEIGHT", "3"))
+    STUDENT_RANKING_TTL = int(os.getenv("STUDENT_RANKING_TTL", "120"))
+
+    # JSON backend for Results decoding (utils/results_json.py): auto (orjson, then ujson, if installed) or json
+    RESULTS_JSON_BACKEND = os.getenv("RESULTS_JSON_BACKEND", "auto").lower()
+
+    # Array backend for binning and score stats (utils/vector_stats.py): auto (numpy, if installed) or python
+    VECTOR_STATS_BACKEND = os.getenv("VECTOR_STATS_BACKEND", "auto").lower()
+
+    # Decoded Results cache (utils/results_cache.py): per-process LRU plus a SQLite file shared by
+    # the workers on a host; an empty RESULTS_CACHE_PATH keeps it in memory only
+    RESULTS_CACHE_ENABLED = os.getenv("RESULTS_CACHE_ENABLED", "true").lower() == "true"
+    RESULTS_CACHE_MEMORY_MB = int(os.getenv("RESULTS_CACHE_MEMORY_MB", "64"))
+    RESULTS_CACHE_PATH = os.getenv("RESULTS_CACHE_PATH", "results_cache/results.sqlite3")
+    RESULTS_CACHE_DISK_MB = int(os.getenv("RESULTS_CACHE_DISK_MB", "512"))
+
+    # LLM prompt payloads (utils/prompt_budget.py): token budget per payload, per-endpoint overrides as
+    # comma-separated name=tokens pairs, and the tokenizer: auto (tiktoken, if installed) or heuristic
+    PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "4000"))
+    PROMPT_TOKEN_BUDGETS = {
+        name.strip(): int(tokens)
+        for name, _, tokens in (
+            pair.partition("=") for pair in os.getenv("PROMPT_TOKEN_BUDGETS", "").split(",") if pair.strip()
+        )
+    }
+    PROMPT_TOKENIZER = os.getenv("PROMPT_TOKENIZER", "auto").lower()
+
+    # Seconds a teacher's student list is cached (utils/student_scope.py)
+    STUDENT_SCOPE_TTL = int(os.getenv("STUDENT_SCOPE_TTL", "300"))
 
     SECRET_KEY = os.environ["SECRET_KEY"]
 
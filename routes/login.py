@@ -1,6 +1,10 @@
 from flask import Blueprint, render_template, request, redirect, url_for, session, flash
 import hashlib
+import logging
 from .models import SessionLocal, User
+from utils.student_scope import get_student_ids, invalidate_student_ids
+
+logger = logging.getLogger(__name__)
 
 login_bp = Blueprint("login", __name__, template_folder="templates")
 
@@ -27,6 +31,11 @@ def login():
             
             if "teacher" in username:
                 session["role"] = "teacher"
+                # Resolve the student scope once per login; queries reuse the cached set
+                try:
+                    get_student_ids(user.Id, refresh=True)
+                except Exception as e:
+                    logger.warning(f"Could not preload students for teacher {user.Id}: {e}")
             else:
                 session["role"] = "admin"  
 
@@ -41,6 +50,8 @@ def login():
 
 @login_bp.route("/logout")
 def logout():
+    if session.get("role") == "teacher":
+        invalidate_student_ids(session.get("user_id"))
     session.pop("user", None)
     session.clear()
     flash("You have been logged out.", "info")
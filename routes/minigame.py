@@ -26,6 +26,26 @@ def api_minigames_list():
     return jsonify(games)
 
 
+@minigame_bp.route("/api/minigames/stats")
+@login_required
+def api_minigames_stats_batch():
+    """
+    Summary stats for many mini-games at once, keyed by Level_ID.
+    ?ids=1,2,3 limits the levels; without it every level with attempts is returned.
+    Used by minigames.html for the card grid (filters/sort) instead of one
+    /stats call per card.
+    """
+    ids = request.args.get("ids")
+    level_ids = None
+    if ids:
+        try:
+            level_ids = [int(i) for i in ids.split(",") if i.strip()]
+        except ValueError:
+            return jsonify({"error": "ids must be a comma-separated list of integers"}), 400
+
+    return jsonify(mg.get_minigame_summaries(level_ids))
+
+
 @minigame_bp.route("/api/minigames/<int:game_id>/stats")
 @login_required
 def api_minigame_stats(game_id):
@@ -33,13 +53,13 @@ def api_minigame_stats(game_id):
     Aggregate numeric stats + grouped error buckets for one mini-game,
     including monthly warning trends.
     """
-    # Fetch all attempts
-    attempts = mg.get_minigame_attempts(game_id)
-    if not attempts:
+    # Basic stats from the shared level stats
+    summary = mg.get_minigame_summaries([game_id]).get(game_id)
+    if not summary:
         return jsonify({"message": "No attempts found for this mini-game."})
 
-    # Basic stats
-    summary = mg.analyse_minigame_attempts(attempts)
+    # Error buckets need the Results of every attempt
+    attempts = mg.get_minigame_attempts(game_id)
     errors = mg.aggregate_minigame_errors(attempts)
 
     # Top errors for display
@@ -96,8 +116,13 @@ def api_warnings_ai_summary(game_id):
     """
     Generate an LLM-powered executive summary of monthly warnings.
     """
-    # Get warning stats
-    stats = mg.fetch_warning_stats(game_id)
+    # Get warning stats (this vs last month plus the monthly trend)
+    try:
+        months = int(request.args.get("months", mg.WARNING_TREND_MONTHS))
+    except ValueError:
+        months = mg.WARNING_TREND_MONTHS
+    months = min(max(months, 2), 36)
+    stats = mg.fetch_warning_stats(game_id, months=months)
     if not stats:
         return jsonify({"analysis": "No warning data available for this mini-game."})
 
@@ -128,11 +153,11 @@ def api_minigame_ai_summary(game_id):
     Generate an LLM-powered executive summary for the selected mini-game.
     (Called on demand from the front-end because it’s relatively expensive.)
     """
-    attempts = mg.get_minigame_attempts(game_id)
-    if not attempts:
+    summary_stats = mg.get_minigame_summaries([game_id]).get(game_id)
+    if not summary_stats:
         return jsonify({"analysis": "No gameplay data available for this mini-game."})
 
-    summary_stats = mg.analyse_minigame_attempts(attempts)
+    attempts = mg.get_minigame_attempts(game_id)
     error_buckets = mg.aggregate_minigame_errors(attempts)
 
     # Resolve a human-friendly game name
@@ -190,37 +215,7 @@ def minigames_combined_stats():
 @login_required
 def api_minigames_completion():
     """Return per-minigame completion % with counts."""
-    games = mg.get_list_of_minigames()
-    out = []
-    for g in games:
-        gid = g["Level_ID"]
-        attempts = mg.get_minigame_attempts(gid)
-        if not attempts:
-            out.append(
-                {
-                    "Level_ID": gid,
-                    "Name": g["Name"],
-                    "completed": 0,
-                    "attempted": 0,
-                    "completion_rate": 0.0,
-                }
-            )
-            continue
-
-        summary = mg.analyse_minigame_attempts(attempts)  # you already have this
-        completed = summary.get("completed", 0)
-        attempted = summary.get("total_attempts", 0)
-        rate = float(summary.get("completion_rate", 0.0))  # already in %
-
-        out.append(
-            {
-                "Level_ID": gid,
-                "Name": g["Name"],
-                "completed": completed,
-                "attempted": attempted,
-                "completion_rate": rate,
-            }
-        )
+    out = mg.get_completion_rates()
     # sort by name for stable chart order
     out.sort(key=lambda r: r["Name"].lower())
     return jsonify({"rows": out})
@@ -244,32 +239,7 @@ def api_minigames_ai_priority():
         top_n = None
 
     # Build game list
-    games = []
-    for g in mg.get_list_of_minigames():
-        gid = g["Level_ID"]
-        attempts = mg.get_minigame_attempts(gid)
-        if not attempts:
-            games.append(
-                {
-                    "Level_ID": gid,
-                    "Name": g["Name"],
-                    "completion_rate": 0.0,
-                    "attempted": 0,
-                    "completed": 0,
-                }
-            )
-            continue
-
-        s = mg.analyse_minigame_attempts(attempts)
-        games.append(
-            {
-                "Level_ID": gid,
-                "Name": g["Name"],
-                "completion_rate": float(s.get("completion_rate", 0.0)),
-                "attempted": int(s.get("total_attempts", 0)),
-                "completed": int(s.get("completed", 0)),
-            }
-        )
+    games = mg.get_completion_rates()
 
     ranked = sorted(games, key=lambda r: r["completion_rate"])
 
@@ -1,8 +1,7 @@
-from sqlalchemy import create_engine, Column, Integer, String
+from sqlalchemy import Column, Integer, String
 from sqlalchemy.orm import declarative_base, sessionmaker
-from config import Config
+from utils.db import engine
 
-engine = create_engine(Config.DB_URI)
 SessionLocal = sessionmaker(bind=engine)
 Base = declarative_base()
 
@@ -1,11 +1,132 @@
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+import logging
+import time
+
 from flask import Blueprint, render_template, request, jsonify
 from analysis import overall_analysis as oa
+from config import Config
 from utils.context import get_llm_client
 from utils.cache import generate_cache_key, cache
 from utils.auth import login_required
+from utils.db import statement_deadline
+from utils.query_builder import current_scope
 
 
 overall_bp = Blueprint("overall", __name__, template_folder="templates")
+logger = logging.getLogger(__name__)
+
+ERROR_BIN_SIZE = 5  # seconds per bin in the error frequency chart
+
+# /overall charts built by oa.run_results_aggregators: aggregator -> (chart, default)
+RESULTS_CHARTS_TASK = "Results charts"
+RESULTS_CHARTS = {
+    "error_bins": ("Error Frequency", {}),
+    "error_vs_time": ("Errors vs Completion Time", []),
+    "monthly_averages": ("Student Improvements", {}),
+    "student_scores": ("Top vs Bottom Students", oa.StudentRanking({})),
+}
+
+def _summary_scatter(summary, x_name, y_name, label, color):
+    """
+    Chart.js scatter datasets drawn from describe_pairs() descriptors instead of
+    every point: band medians and quartiles, the trend line and the outliers.
+    """
+    if not summary.get("n"):
+        return {"datasets": []}
+
+    def band_points(stat):
+        return [
+            {"x": round(sum(band[x_name]) / 2, 3), "y": band[y_name][stat]}
+            for band in summary["bands"]
+        ]
+
+    datasets = [
+        {
+            "label": f"{label} (band median)",
+            "data": band_points("median"),
+            "backgroundColor": color,
+            "borderColor": color,
+            "showLine": True,
+            "pointRadius": 6,
+        },
+        {
+            "label": "Band Q1 / Q3",
+            "data": band_points("q1") + band_points("q3"),
+            "backgroundColor": "rgba(128, 128, 128, 0.6)",
+            "pointRadius": 4,
+        },
+    ]
+    if summary["slope"] is not None:
+        x_min, x_max = summary[x_name]["min"], summary[x_name]["max"]
+        datasets.append(
+            {
+                "label": "Trend",
+                "data": [
+                    {"x": x, "y": round(summary["intercept"] + summary["slope"] * x, 3)}
+                    for x in (x_min, x_max)
+                ],
+                "borderColor": "gray",
+                "showLine": True,
+                "pointRadius": 0,
+            }
+        )
+    datasets.append(
+        {
+            "label": f"Outliers ({summary['outliers']['count']})",
+            "data": [
+                {"x": point[x_name], "y": point[y_name]}
+                for point in summary["outliers"]["points"]
+            ],
+            "backgroundColor": "red",
+            "pointRadius": 4,
+        }
+    )
+    return {"datasets": datasets}
+
+
+# Shared by all /overall requests so concurrent page loads can't exhaust the DB pool
+_fetch_pool = ThreadPoolExecutor(
+    max_workers=Config.OVERALL_FETCH_WORKERS, thread_name_prefix="overall-fetch"
+)
+
+
+def _run_by(deadline, fn, kwargs):
+    # A worker thread can't be interrupted, so the deadline is enforced by the
+    # database instead: queries still running at the deadline are aborted, and a
+    # task that only starts after it (queued behind other page loads) skips its
+    # queries, so a timed-out fetch frees its worker soon after the page gives up
+    with statement_deadline(deadline):
+        return fn(**kwargs)
+
+
+def _fetch_concurrently(tasks, timeout):
+    """
+    Run {name: (fn, kwargs, default)} on the shared pool and return
+    ({name: result}, [names that failed or timed out]).
+    The fetchers run outside the request, so kwargs must carry the scope.
+    """
+    deadline = time.monotonic() + timeout
+    futures = {
+        name: _fetch_pool.submit(_run_by, deadline, fn, kwargs)
+        for name, (fn, kwargs, _) in tasks.items()
+    }
+
+    results, failed = {}, []
+    for name, future in futures.items():
+        try:
+            results[name] = future.result(timeout=max(deadline - time.monotonic(), 0))
+        except FutureTimeout:
+            # Only drops the task if it hasn't started; a running one ends at
+            # the statement deadline (see _run_by)
+            future.cancel()
+            logger.warning(f"/overall fetch '{name}' timed out after {timeout}s")
+            results[name] = tasks[name][2]
+            failed.append(name)
+        except Exception as e:
+            logger.error(f"/overall fetch '{name}' failed: {e}")
+            results[name] = tasks[name][2]
+            failed.append(name)
+    return results, failed
 
 
 @overall_bp.route("/api/analysis/avg-scores")
@@ -42,13 +163,14 @@ def api_error_frequency_analysis():
     start_month = request.args.get("start_month")
     end_month = request.args.get("end_month")
     # print(f"[DEBUG] Start Month and End Month Specific: {start_month, end_month}", flush=True)
-    results = oa.get_error_frequency_results(start_month=start_month, end_month=end_month)
-    # print(f"[DEBUG] /api/analysis/error-frequency results length: {len(results) if results else 0}", flush=True)
-    if not results:
+    binned = oa.get_error_frequency_bins(
+        start_month=start_month, end_month=end_month, bin_size=ERROR_BIN_SIZE
+    )
+    if not oa.has_binned_errors(binned):
         return jsonify({"text": "No data found."})
 
     # Cache the error frequency analysis
-    key = generate_cache_key("error_frequency_analysis", {"results": results})
+    key = generate_cache_key("error_frequency_analysis", {"binned": binned})
 
     # Check for force refresh (bypass cache)
     force_refresh = request.args.get("force_refresh", "false").lower() == "true"
@@ -56,7 +178,7 @@ def api_error_frequency_analysis():
 
     if not error_frequency_analysis_response:
         error_frequency_analysis_response = oa.error_frequency_analysis(
-            results, get_llm_client()
+            binned, get_llm_client(), bin_size=ERROR_BIN_SIZE
         )
         cache.set(key, error_frequency_analysis_response)
 
@@ -73,10 +195,11 @@ def api_performance_duration_analysis():
     if not duration_data:
         return jsonify({"text": "No session duration data available."})
 
+    # The LLM gets descriptors of the points, not the points themselves
+    summary = oa.describe_duration_vs_score(duration_data)
+
     # Cache the performance duration analysis
-    key = generate_cache_key(
-        "performance_duration_analysis", {"duration_data": duration_data}
-    )
+    key = generate_cache_key("performance_duration_analysis", {"summary": summary})
 
     # Check for force refresh (bypass cache)
     force_refresh = request.args.get("force_refresh", "false").lower() == "true"
@@ -84,7 +207,7 @@ def api_performance_duration_analysis():
 
     if not performance_duration_analysis_response:
         performance_duration_analysis_response = oa.performance_vs_duration(
-            duration_data, get_llm_client()
+            summary, get_llm_client()
         )
         cache.set(key, performance_duration_analysis_response)
 
@@ -94,12 +217,13 @@ def api_performance_duration_analysis():
 @overall_bp.route("/api/analysis/overall-user")
 @login_required
 def api_overall_user_analysis():
-    results2 = oa.get_user_results()
-    if not results2:
+    # Pre-aggregated per user and cohort, so the prompt size doesn't grow with users
+    summary = oa.get_user_summary()
+    if not summary:
         return jsonify({"text": "No user data available."})
 
     # Cache the overall user analysis
-    key = generate_cache_key("overall_user_analysis", {"results": results2})
+    key = generate_cache_key("overall_user_analysis", {"summary": summary})
 
     # Check for force refresh (bypass cache)
     force_refresh = request.args.get("force_refresh", "false").lower() == "true"
@@ -107,7 +231,7 @@ def api_overall_user_analysis():
 
     if not overall_user_analysis_response:
         overall_user_analysis_response = oa.overall_user_analysis(
-            results2, get_llm_client()
+            summary, get_llm_client()
         )
         cache.set(key, overall_user_analysis_response)
 
@@ -123,8 +247,10 @@ def api_error_completion_analysis():
     if not duration_vs_errors:
         return jsonify({"text": "No error vs completion data available."})
 
+    summary = oa.describe_error_vs_time(duration_vs_errors)
+
     # Cache key
-    key = generate_cache_key("error_completion_analysis", {"data": duration_vs_errors})
+    key = generate_cache_key("error_completion_analysis", {"summary": summary})
 
     force_refresh = request.args.get("force_refresh", "false").lower() == "true"
     error_completion_analysis_response = None if force_refresh else cache.get(key)
@@ -132,7 +258,7 @@ def api_error_completion_analysis():
     if not error_completion_analysis_response:
         # Call the analysis function for error vs completion
         error_completion_analysis_response = oa.error_type_vs_score_analysis(
-            duration_vs_errors, get_llm_client()
+            summary, get_llm_client()
         )
         cache.set(key, error_completion_analysis_response)
 
@@ -194,18 +320,22 @@ def api_personalised_feedback(username):
     start_month = request.args.get("start_month")
     end_month = request.args.get("end_month")
 
-    results = oa.get_student_game_results(start_month=start_month, end_month=end_month)
-
-    if not results:
+    # Usually the ranking /overall just built, so this is a lookup, not a rescan
+    ranking = oa.get_student_ranking(start_month=start_month, end_month=end_month)
+    if not len(ranking):
         return jsonify({"text": "No student game results found."})
 
-    # Combine rows so we can find this student
-    all_rows = results.get("top_rows", []) + results.get("bottom_rows", [])
-    student_row = next((r for r in all_rows if r["username"] == username), None)
-
+    student_row = ranking.row(username)
     if not student_row:
         return jsonify({"text": f"No data found for student '{username}'."})
 
+    student_row = {
+        **student_row,
+        "average_score": round(ranking.weighted[username], 2),
+        "rank": ranking.rank(username),
+        "students_ranked": len(ranking),
+    }
+
     key = generate_cache_key("personalised-feedback", {"username": username, "data": student_row})
 
     force_refresh = request.args.get("force_refresh", "false").lower() == "true"
@@ -231,9 +361,35 @@ def overall():
     start_month = request.args.get("start_month")
     end_month = request.args.get("end_month")      
     print(f"[DEBUG] Start Month and End Month Overall: {start_month, end_month}", flush=True)
+    # "summary" draws the scatter charts from descriptors instead of every point
+    chart_mode = request.args.get("chart_mode", Config.OVERALL_CHART_MODE).lower()
+
+    # The fetches are independent, so they run concurrently; a failed or slow one
+    # leaves its chart empty instead of failing the page
+    scope = current_scope()
+    months = {"start_month": start_month, "end_month": end_month, "scope": scope}
+    data, unavailable = _fetch_concurrently(
+        {
+            "Average Scores": (oa.get_avg_scores_for_practice_assessment, months, ({}, {})),
+            "Performance vs Duration": (oa.get_duration_vs_errors, months, []),
+            # One task, so the Results are read and parsed once for all four charts
+            RESULTS_CHARTS_TASK: (
+                oa.run_results_aggregators,
+                {**months, "names": list(RESULTS_CHARTS), "bin_size": ERROR_BIN_SIZE},
+                {},
+            ),
+        },
+        timeout=Config.OVERALL_FETCH_TIMEOUT,
+    )
+    results_charts = data.pop(RESULTS_CHARTS_TASK)
+    if RESULTS_CHARTS_TASK in unavailable:
+        unavailable.remove(RESULTS_CHARTS_TASK)
+        unavailable.extend(chart for chart, _ in RESULTS_CHARTS.values())
+    for name, (chart, default) in RESULTS_CHARTS.items():
+        data[chart] = results_charts.get(name, default)
 
     # Average Scores per Minigame
-    avg_scores, max_score_by_minigame = oa.get_avg_scores_for_practice_assessment(start_month=start_month, end_month=end_month)
+    avg_scores, max_score_by_minigame = data["Average Scores"]
     print(f"[DEBUG] /overall avg score results length: {len(avg_scores) if avg_scores else 0}")
 
     avg_scores_analysis = "Loading..."
@@ -259,17 +415,14 @@ def overall():
     }
 
     # Error Frequency vs Results
-    results = oa.get_error_frequency_results(start_month=start_month, end_month=end_month)
-    print(f"[DEBUG] /overall results length: {len(results) if results else 0}")
-    if not results:
+    binned = data["Error Frequency"]
+    if not oa.has_binned_errors(binned):
         analysis_text = "No data found."
         chart_data = {"labels": [], "datasets": []}
     else:
         analysis_text = "Loading..."
         # analysis_text = oa.extract_relevant_text(analysis_response)
 
-        binned = oa.bin_errors_over_time(results, bin_size=5)
-
         time_bins = list(binned.keys())
         warnings = [binned[t]["warnings"] for t in time_bins]
         minors = [binned[t]["minors"] for t in time_bins]
@@ -285,44 +438,54 @@ def overall():
         }
 
     # Performance vs Duration Analysis
-    duration_data = oa.get_duration_vs_errors(start_month=start_month, end_month=end_month)
-    print(f"[DEBUG] /overall results length perf vs dura: {len(results) if results else 0}")
+    duration_data = data["Performance vs Duration"]
+    print(f"[DEBUG] /overall results length perf vs dura: {len(duration_data) if duration_data else 0}")
     duration_analysis = "Loading..."
 
-    scatter_chart_data = {
-        "datasets": [
-            {
-                "label": "Score vs Session Duration",
-                "data": [
-                    {"x": entry["duration_minutes"], "y": entry["score"]}
-                    for entry in duration_data
-                ],
-                "backgroundColor": "blue",
-                "pointRadius": 4,
-            }
-        ]
-    }
+    if chart_mode == "summary":
+        scatter_chart_data = _summary_scatter(
+            oa.describe_duration_vs_score(duration_data),
+            "duration_minutes", "score", "Score vs Session Duration", "blue",
+        )
+    else:
+        scatter_chart_data = {
+            "datasets": [
+                {
+                    "label": "Score vs Session Duration",
+                    "data": [
+                        {"x": entry["duration_minutes"], "y": entry["score"]}
+                        for entry in duration_data
+                    ],
+                    "backgroundColor": "blue",
+                    "pointRadius": 4,
+                }
+            ]
+        }
 
     # Error vs Completion Time Chart Data
-    error_vs_completion_data_rows = oa.get_error_type_vs_score(start_month=start_month, end_month=end_month)
-    error_vs_completion_chart_data = {
-        "datasets": [
-            {
-                "label": "Errors vs Completion Time",
-                "data": [
-                    {"x": row["total_time"], "y": row.get("total_errors", 0)}
-                    for row in error_vs_completion_data_rows
-                ],
-                "backgroundColor": "purple",
-                "pointRadius": 4
-            }
-        ]
-    }
+    error_vs_completion_data_rows = data["Errors vs Completion Time"]
+    if chart_mode == "summary":
+        error_vs_completion_chart_data = _summary_scatter(
+            oa.describe_error_vs_time(error_vs_completion_data_rows),
+            "total_time", "total_errors", "Errors vs Completion Time", "purple",
+        )
+    else:
+        error_vs_completion_chart_data = {
+            "datasets": [
+                {
+                    "label": "Errors vs Completion Time",
+                    "data": [
+                        {"x": row["total_time"], "y": row.get("total_errors", 0)}
+                        for row in error_vs_completion_data_rows
+                    ],
+                    "backgroundColor": "purple",
+                    "pointRadius": 4
+                }
+            ]
+        }
 
     # --- Student Improvements Monthly ---
-    student_improvement_data = oa.get_monthly_avg_scores_by_minigame(
-        start_month=start_month, end_month=end_month
-    )
+    student_improvement_data = data["Student Improvements"]
     # Collect all unique months across all minigames
     all_months = sorted(
         {entry["month"] for game_data in student_improvement_data.values() for entry in game_data}
@@ -355,12 +518,9 @@ def overall():
     }
 
     # Top vs Bottom Students
-    top_bottom_data = oa.get_student_game_results(
-        start_month=start_month, end_month=end_month
-    )
+    top_bottom_data = data["Top vs Bottom Students"].as_dict()
 
-    # Overall User Performance
-    results2 = oa.get_user_results()
+    # Overall User Performance (loaded on demand by /api/analysis/overall-user)
     insights = "Loading..."
 
     return render_template(
@@ -375,5 +535,6 @@ def overall():
         avg_scores_analysis=avg_scores_analysis,
         error_vs_completion_chart_data=error_vs_completion_chart_data,
         studentImprovementChartData=student_improvement_chart_data,
-        top_bottom_data=top_bottom_data
+        top_bottom_data=top_bottom_data,
+        unavailable=unavailable,
     )
@@ -0,0 +1,35 @@
+from flask import Blueprint, jsonify
+from utils.db import get_pool_stats, get_replica_status
+from utils.ingest import get_ingest_status
+from utils.results_cache import get_cache_stats
+from utils.auth import admin_required
+
+status_bp = Blueprint("status", __name__, template_folder="templates")
+
+
+@status_bp.route("/api/status/db-pool")
+@admin_required
+def api_db_pool_stats():
+    """
+    Live connection pool statistics for this worker process,
+    plus health and lag of any configured read replicas.
+    """
+    return jsonify({"primary": get_pool_stats(), "replicas": get_replica_status()})
+
+
+@status_bp.route("/api/status/attempt-summary")
+@admin_required
+def api_attempt_summary_status():
+    """
+    Watermark, backlog and lag of the attempt summary ingester.
+    """
+    return jsonify(get_ingest_status())
+
+
+@status_bp.route("/api/status/results-cache")
+@admin_required
+def api_results_cache_stats():
+    """
+    Hit/miss counters and sizes of this worker's decoded Results cache.
+    """
+    return jsonify(get_cache_stats())
@@ -1,5 +1,6 @@
 from flask import Blueprint, render_template, request, jsonify
 from analysis import user_analysis as ua
+from analysis.records import as_dicts
 from utils.context import get_llm_client
 from utils.cache import cache, generate_cache_key
 from utils.auth import login_required
@@ -70,7 +71,7 @@ def user():
                         {
                             "status": "success",
                             "message": f"Overall assessment shows {analysis['total_games']} minigames analyzed.",
-                            "results": results,
+                            "results": as_dicts(results),
                             "analysis": analysis,
                         }
                     )
@@ -92,7 +93,7 @@ def user():
                         {
                             "status": "success",
                             "message": "Gameplay records retrieved for the selected user and game are displayed below.",
-                            "results": results,
+                            "results": as_dicts(results),
                             "analysis": analysis,
                         }
                     )
@@ -15,22 +15,21 @@ document.addEventListener('DOMContentLoaded', () => {
     };
     const sliders = {};
 
-    fetch('/api/minigames')
+    // One batch request for every card's summary; the full stats (error buckets,
+    // warning trend) are fetched per game when its details are opened
+    const summaries = fetch('/api/minigames/stats')
         .then(r => r.json())
-        .then(games => Promise.all(
-            games.map(game =>
-                fetch(`/api/minigames/${game.Level_ID}/stats`)
-                    .then(r => r.json())
-                    .then(stats => {
-                        game.stats = stats; // Store full stats
-                        return game;
-                    })
-                    .catch(err => {
-                        console.error(`Stats failed for Game ID ${game.Level_ID}`, err);
-                        return game;
-                    })
-            )
-        ))
+        .catch(err => {
+            console.error('Batch stats failed', err);
+            return {};
+        });
+
+    Promise.all([fetch('/api/minigames').then(r => r.json()), summaries])
+        .then(([games, stats]) => games.map(game => {
+            const summary = stats[game.Level_ID];
+            if (summary) game.stats = { summary };
+            return game;
+        }))
         .then(gamesWithStats => {
             grid.innerHTML = '';
             window._allGames = gamesWithStats;
@@ -44,6 +44,8 @@ document.addEventListener('DOMContentLoaded', async() => {
             const newParams = new URLSearchParams();
             if (startMonth) newParams.set("start_month", startMonth);
             if (endMonth) newParams.set("end_month", endMonth);
+            const chartMode = new URLSearchParams(window.location.search).get("chart_mode");
+            if (chartMode) newParams.set("chart_mode", chartMode);
 
             console.log("[DEBUG] Redirecting to URL:", `/overall?${newParams.toString()}`);
             window.location.href = `/overall?${newParams.toString()}`;
@@ -54,7 +54,8 @@ document.addEventListener("DOMContentLoaded", function () {
     const scatterCtx = document.getElementById('scatterChart').getContext('2d');
 
     if (scatterChartDataFromFlask && scatterChartDataFromFlask.datasets && scatterChartDataFromFlask.datasets.length > 0) {
-        const dataPoints = scatterChartDataFromFlask.datasets[0].data;
+        // All datasets: summary mode splits the points into medians, trend and outliers
+        const dataPoints = scatterChartDataFromFlask.datasets.flatMap(dataset => dataset.data);
 
         // Use a loop to find the min and max for x and y
         let xMin = Infinity, xMax = -Infinity;
@@ -169,7 +170,7 @@ document.addEventListener("DOMContentLoaded", function () {
     // Error vs Completion Time Scatter Chart
     const errorCompletionCtx = document.getElementById('ErrorVsCompletionScatterChart').getContext('2d');
     if (errorVsCompletionDataFromFlask && errorVsCompletionDataFromFlask.datasets.length > 0) {
-        const dataPoints = errorVsCompletionDataFromFlask.datasets[0].data;
+        const dataPoints = errorVsCompletionDataFromFlask.datasets.flatMap(dataset => dataset.data);
         let xMin = Infinity, xMax = -Infinity, yMin = Infinity, yMax = -Infinity;
         dataPoints.forEach(point => {
             if (point.x < xMin) xMin = point.x;
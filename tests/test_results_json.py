@@ -0,0 +1,132 @@
+"""
+Results.valid and the scalar probe (utils/results_json.py) must agree with a
+full json.loads of the blob: malformed blobs are invalid, whatever the probe
+reads, and the scalars it returns are the decoded ones.
+
+    python -m unittest discover -s tests -t .
+"""
+
+import json
+import os
+import random
+import unittest
+
+# Config refuses to import without these
+for _name in ("DB_USER", "DB_PASSWORD", "DB_HOST", "DB_PORT", "DB_DATABASE",
+              "DEEPSEEK_API_KEY", "OLLAMA_PATH", "SECRET_KEY"):
+    os.environ.setdefault(_name, "3306" if _name == "DB_PORT" else "test")
+
+from utils.results_json import SCALAR_KEYS, Results, decode, probe_scalars  # noqa: E402
+
+MALFORMED = [
+    '{"final-score":5 "status":"x"}',  # missing comma
+    '{,"final-score":5}',  # leading comma
+    '{"final-score":5,}',  # trailing comma
+    '{"final-score":5,,"status":"x"}',
+    '{"final-score":01}',  # leading zero
+    '{"final-score":1.}',
+    '{"final-score":.5}',
+    '{"final-score":+5}',
+    '{"status":"a\tb"}',  # literal control character
+    '{"status":"a\\qb"}',  # unknown escape
+    '{"status":"\\u12"}',
+    "{'status':'x'}",
+    '{"status" "x"}',
+    '{"status":x}',
+    '{"status":"x"',  # truncated
+    '{"status":"x"}}',
+    '{"status":"x"} {}',
+    '{"status":"x"}\x0b',  # not JSON whitespace
+    '{"a":{"b":1 "c":2},"status":"x"}',  # missing comma in a nested object
+    '{"a":{,"b":1},"status":"x"}',
+    '{"final-score":truex}',
+    "[]",
+    '"text"',
+    "",
+    "{",
+]
+
+ACCEPTED = [
+    "{}",
+    ' \n{ "final-score" : -0.5e+3 , "status" : "a\\"\\u00e9\\n" }\r\n',
+    '{"final-score":NaN,"status":"x"}',  # json.loads accepts NaN/Infinity
+    '{"final-score":-Infinity}',
+    '{"a":{"b":{}},"c":{"d":true},"status":"done"}',
+    '{"status":"x","status":"y"}',  # duplicate keys: the last one wins
+    '{"final-score":5,"errors":{"minor":[{"time":1}]},"status":"x"}',
+]
+
+SCALARS = ["0", "-1", "12.5", "3e2", "true", "false", "null", '"a b"', '"\\u00e9\\"q"', "{}", '{"x":1}']
+
+
+def _expected(raw):
+    data = decode(raw)
+    return None if data is None else {k: v for k, v in data.items() if k in SCALAR_KEYS}
+
+
+def _blob(rng):
+    keys = rng.sample(sorted(SCALAR_KEYS) + ["other", "nested"], rng.randint(0, 6))
+    members = [f'"{key}"{rng.choice(["", " "])}:{rng.choice(SCALARS)}' for key in keys]
+    return "{" + rng.choice([",", ", ", " ,\n"]).join(members) + "}"
+
+
+def _mutate(raw, rng):
+    pos = rng.randrange(len(raw) + 1)
+    edit = rng.choice(["insert", "delete", "replace"])
+    char = rng.choice(',:{}[]"\\ \t0123456789.-+eExtnul\x01')
+    if edit == "insert":
+        return raw[:pos] + char + raw[pos:]
+    if edit == "delete":
+        return raw[:pos] + raw[pos + 1:]
+    return raw[:pos] + char + raw[pos + 1:]
+
+
+class ResultsValidityTest(unittest.TestCase):
+    def assert_matches_json(self, raw):
+        expected = _expected(raw)
+        results = Results(raw)
+        probed = probe_scalars(raw)
+        if probed is not None and not probed[1]:
+            results.data  # past the first array only the full decode checks
+        self.assertEqual(results.valid, expected is not None, repr(raw))
+        if expected is not None:
+            for key in SCALAR_KEYS:
+                value = results.get(key)
+                if value == value:  # NaN never equals itself
+                    self.assertEqual(value, expected.get(key), repr(raw))
+
+    def test_malformed_blobs_are_invalid(self):
+        for raw in MALFORMED:
+            with self.subTest(raw=raw):
+                self.assertIsNone(decode(raw))
+                self.assertIsNone(probe_scalars(raw))
+                self.assertFalse(Results(raw).valid)
+
+    def test_accepted_blobs_are_valid(self):
+        for raw in ACCEPTED:
+            with self.subTest(raw=raw):
+                self.assert_matches_json(raw)
+
+    def test_array_stop_is_checked_by_the_full_decode(self):
+        # Malformed after the first array: only the full decode can tell
+        raw = '{"status":"x","errors":{"minor":[1 2]}}'
+        results = Results(raw)
+        self.assertTrue(results.valid)
+        self.assertEqual(results.errors("minor"), [])
+        self.assertFalse(results.valid)
+
+    def test_generated_blobs_match_json_loads(self):
+        rng = random.Random(20)
+        for _ in range(5000):
+            raw = _blob(rng)
+            if rng.random() < 0.8:
+                raw = _mutate(raw, rng)
+            with self.subTest(raw=raw):
+                self.assert_matches_json(raw)
+                probed = probe_scalars(raw)
+                if probed is not None and probed[1]:
+                    self.assertEqual(probed[0], _expected(raw))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,224 @@
+"""
+attempt_summary.py
+------------------
+Materialised per-attempt summary table owned by the dashboard.
+
+Every analysis page used to pull IMA_Plan_Session_Game_Status.Results and
+json.loads() it on each request just to read a handful of fields. This module
+keeps one row per (Session_ID, Plan_Game_ID) in Dashboard_Attempt_Summary with
+those fields already extracted:
+
+    final-score, total-time, accuracy, status, level_name / game, max-score,
+    the number of errors.{imprecision,warning,minor,severe} entries,
+    the resolved Level_ID, the session mode (training/practice/assessment)
+    and the practice/training play mode used by the minigames page.
+
+The table is created and kept up to date by the background ingester in
+utils/ingest.py, which only parses attempts it has not seen yet (or that were
+still open when last seen), so each Results blob is decoded once.
+
+Readers call summary_ready() and fall back to parsing Results when it returns
+False (table not built yet, no CREATE privilege, or disabled via
+ATTEMPT_SUMMARY_ENABLED=false).
+"""
+
+from sqlalchemy import text
+
+from config import Config
+from utils import results_json
+
+SUMMARY_TABLE = "Dashboard_Attempt_Summary"
+
+CREATE_SUMMARY_TABLE = text(
+    f"""
+    CREATE TABLE IF NOT EXISTS {SUMMARY_TABLE} (
+        Session_ID        BIGINT       NOT NULL,
+        Plan_Game_ID      BIGINT       NOT NULL,
+        User_ID           BIGINT       NULL,
+        Level_ID          BIGINT       NULL,
+        Mode              VARCHAR(16)  NOT NULL DEFAULT 'unknown',
+        Play_Mode         VARCHAR(16)  NULL,
+        Game_Start        DATETIME     NULL,
+        Game_End          DATETIME     NULL,
+        Score             DOUBLE       NULL,
+        Results_Valid     TINYINT(1)   NOT NULL DEFAULT 0,
+        Final_Score       DOUBLE       NULL,
+        Max_Score         DOUBLE       NULL,
+        Total_Time        DOUBLE       NULL,
+        Accuracy          DOUBLE       NULL,
+        Result_Status     VARCHAR(32)  NULL,
+        Level_Name        VARCHAR(255) NULL,
+        Game_Name         VARCHAR(255) NULL,
+        Imprecision_Count INT          NULL,
+        Warning_Count     INT          NULL,
+        Minor_Count       INT          NULL,
+        Severe_Count      INT          NULL,
+        PRIMARY KEY (Session_ID, Plan_Game_ID),
+        KEY idx_das_game_start (Game_Start),
+        KEY idx_das_game_end (Game_End),
+        KEY idx_das_user_level (User_ID, Level_ID, Game_Start),
+        KEY idx_das_level_mode (Level_ID, Mode, Game_Start),
+        KEY idx_das_play_mode (Play_Mode, Plan_Game_ID)
+    )
+    """
+)
+
+# Session mode, same precedence as the Level_ID resolution below (Training first)
+SESSION_MODE_SQL = """
+    CASE
+        WHEN ps.Results LIKE '%Training%' THEN 'training'
+        WHEN ps.Results LIKE '%Practice%' THEN 'practice'
+        WHEN ps.Results LIKE '%Assessment%' THEN 'assessment'
+        ELSE 'unknown'
+    END
+"""
+
+# Practice/training label used by the minigames page: practice first, matched on
+# both the session and the game Results (ps / psgs aliases)
+PLAY_MODE_SQL = """
+    CASE
+        WHEN COALESCE(LOWER(ps.Results), '') LIKE '%practice%'
+          OR COALESCE(LOWER(psgs.Results), '') LIKE '%practice%' THEN 'practice'
+        WHEN COALESCE(LOWER(ps.Results), '') LIKE '%training%'
+          OR COALESCE(LOWER(psgs.Results), '') LIKE '%training%' THEN 'training'
+        ELSE 'unknown'
+    END
+"""
+
+# Level played in the attempt: plans with a progression sequence resolve through
+# Sequence_Order (0 = training, 1 = practice); the rest (e.g. assessments) use pg.Level
+LEVEL_ID_SQL = """
+    CASE
+        WHEN NOT EXISTS (
+            SELECT 1 FROM IMA_Progression_Sequence_Level psl
+            WHERE psl.Sequence_ID = pg.Sequence
+        ) THEN pg.Level
+        WHEN ps.Results LIKE '%Training%' THEN (
+            SELECT MAX(psl.Level_ID) FROM IMA_Progression_Sequence_Level psl
+            WHERE psl.Sequence_ID = pg.Sequence AND psl.Sequence_Order = 0
+        )
+        WHEN ps.Results LIKE '%Practice%' THEN (
+            SELECT MAX(psl.Level_ID) FROM IMA_Progression_Sequence_Level psl
+            WHERE psl.Sequence_ID = pg.Sequence AND psl.Sequence_Order = 1
+        )
+    END
+"""
+
+# Source columns for one attempt; utils.ingest adds the WHERE clause
+ATTEMPT_SOURCE_SQL = f"""
+    SELECT psgs.Session_ID, psgs.Plan_Game_ID, ps.User_ID,
+           psgs.Game_Start, psgs.Game_End, psgs.Score, psgs.Results,
+           pg.Level AS Plan_Level,
+           {LEVEL_ID_SQL} AS Level_ID,
+           {SESSION_MODE_SQL} AS Mode,
+           {PLAY_MODE_SQL} AS Play_Mode
+    FROM IMA_Plan_Session_Game_Status psgs
+    LEFT JOIN IMA_Plan_Session ps ON ps.Session_ID = psgs.Session_ID
+    LEFT JOIN IMA_Plan_Game pg ON pg.Plan_Game_ID = psgs.Plan_Game_ID
+"""
+
+# Columns extracted from the Results JSON by summarize_results()
+RESULT_COLUMNS = (
+    "Final_Score", "Max_Score", "Total_Time", "Accuracy", "Result_Status",
+    "Level_Name", "Game_Name",
+    "Imprecision_Count", "Warning_Count", "Minor_Count", "Severe_Count",
+)
+
+SUMMARY_COLUMNS = (
+    "Session_ID", "Plan_Game_ID", "User_ID", "Level_ID", "Mode", "Play_Mode",
+    "Game_Start", "Game_End", "Score", "Results_Valid",
+) + RESULT_COLUMNS
+
+UPSERT_SUMMARY = text(
+    f"""
+    INSERT INTO {SUMMARY_TABLE} ({", ".join(SUMMARY_COLUMNS)})
+    VALUES ({", ".join(":" + c for c in SUMMARY_COLUMNS)}) AS new
+    ON DUPLICATE KEY UPDATE
+    {", ".join(f"{c} = new.{c}" for c in SUMMARY_COLUMNS[2:])}
+    """
+)
+
+ERROR_COLUMNS = {
+    "imprecision": "Imprecision_Count",
+    "warning": "Warning_Count",
+    "minor": "Minor_Count",
+    "severe": "Severe_Count",
+}
+
+
+def _number(value):
+    # bools are ints in Python but not scores
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return float(value)
+
+
+def _text(value, limit):
+    return None if value is None else str(value)[:limit]
+
+
+def _length(value):
+    # Mirrors JSON_LENGTH: NULL for a missing path, 1 for a scalar
+    if value is None:
+        return None
+    if isinstance(value, (list, dict)):
+        return len(value)
+    return 1
+
+
+def summarize_results(raw):
+    """
+    Extract the summary fields from one Results JSON blob.
+    Returns None when the blob is missing or not a JSON object.
+    """
+    data = results_json.decode(raw)
+    if data is None:
+        return None
+    try:
+        errors = data.get("errors") or {}
+        summary = {
+            "Final_Score": _number(data.get("final-score")),
+            "Max_Score": _number(data.get("max-score") or data.get("max_score")),
+            "Total_Time": _number(data.get("total-time")),
+            "Accuracy": _number(data.get("accuracy")),
+            "Result_Status": _text(data.get("status"), 32),
+            "Level_Name": _text(data.get("level_name"), 255),
+            "Game_Name": _text(data.get("game"), 255),
+        }
+        for key, column in ERROR_COLUMNS.items():
+            summary[column] = _length(errors.get(key))
+        return summary
+    except Exception:
+        return None
+
+
+def summary_row(row):
+    summary = summarize_results(row.Results)
+    out = {
+        "Session_ID": row.Session_ID,
+        "Plan_Game_ID": row.Plan_Game_ID,
+        "User_ID": row.User_ID,
+        "Level_ID": row.Level_ID,
+        "Mode": row.Mode,
+        "Play_Mode": row.Play_Mode,
+        "Game_Start": row.Game_Start,
+        "Game_End": row.Game_End,
+        "Score": row.Score,
+        "Results_Valid": 1 if summary is not None else 0,
+    }
+    for column in RESULT_COLUMNS:
+        out[column] = summary.get(column) if summary else None
+    return out
+
+
+def summary_ready():
+    """
+    True when readers can query the summary table, i.e. the ingester has caught
+    up with the existing history at least once (see utils.ingest).
+    """
+    if not Config.ATTEMPT_SUMMARY_ENABLED:
+        return False
+
+    from utils import ingest
+
+    return ingest.is_backfilled()
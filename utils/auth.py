@@ -1,5 +1,5 @@
 from functools import wraps
-from flask import session, redirect, url_for, flash
+from flask import session, redirect, url_for, flash, jsonify
 
 def login_required(f):
     @wraps(f)
@@ -9,3 +9,12 @@ def login_required(f):
             return redirect(url_for("login.login"))  # redirect to login page
         return f(*args, **kwargs)
     return decorated_function
+
+def admin_required(f):
+    @wraps(f)
+    @login_required
+    def decorated_function(*args, **kwargs):
+        if session.get("role") != "admin":  # teachers may not see server internals
+            return jsonify({"error": "admin access required"}), 403
+        return f(*args, **kwargs)
+    return decorated_function
@@ -1,7 +1,303 @@
-from sqlalchemy import create_engine
+from contextlib import contextmanager
+import itertools
+import logging
+import threading
+import time
+
+from sqlalchemy import create_engine, make_url
+from sqlalchemy.exc import DBAPIError, TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
 from config import Config
 
-engine = create_engine(Config.DB_URI)
+logger = logging.getLogger(__name__)
+
+
+class TimedQueuePool(QueuePool):
+    """
+    QueuePool that also records how long callers waited for a connection,
+    so pool pressure can be read at runtime via get_pool_stats().
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            timed_out = True
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            with self._stats_lock:
+                self.checkouts += 1
+                self.total_wait += waited
+                self.max_wait = max(self.max_wait, waited)
+                if timed_out:
+                    self.timeouts += 1
+
+
+def create_db_engine(uri=None):
+    """
+    Build an engine with the pool settings from Config.
+    Every module should share the engine below instead of calling create_engine itself.
+    """
+    url = make_url(uri or Config.DB_URI)
+
+    # Each DBAPI driver names its connect timeout differently
+    timeout_arg = (
+        "connection_timeout" if url.get_driver_name() == "mysqlconnector" else "connect_timeout"
+    )
+
+    return create_engine(
+        url,
+        poolclass=TimedQueuePool,
+        pool_size=Config.DB_POOL_SIZE,
+        max_overflow=Config.DB_MAX_OVERFLOW,
+        pool_timeout=Config.DB_POOL_TIMEOUT,
+        pool_recycle=Config.DB_POOL_RECYCLE,
+        pool_pre_ping=Config.DB_POOL_PRE_PING,
+        connect_args={timeout_arg: Config.DB_CONNECT_TIMEOUT},
+    )
+
+
+engine = create_db_engine()
+
+
+def get_pool_stats(target_engine=None):
+    """
+    Return live statistics for the pool behind an engine (defaults to the shared engine).
+    """
+    pool = (target_engine or engine).pool
+    stats = {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "max_overflow": pool._max_overflow,
+    }
+
+    if isinstance(pool, TimedQueuePool):
+        with pool._stats_lock:
+            checkouts = pool.checkouts
+            stats.update(
+                {
+                    "checkouts": checkouts,
+                    "timeouts": pool.timeouts,
+                    "avg_wait_ms": (
+                        round(pool.total_wait / checkouts * 1000, 3) if checkouts else 0.0
+                    ),
+                    "max_wait_ms": round(pool.max_wait * 1000, 3),
+                }
+            )
+
+    return stats
+
+
+class ReplicaRouter:
+    """
+    Route read-only queries to a healthy replica, falling back to the primary.
+
+    A replica is skipped while it is unreachable or lagging more than
+    Config.DB_REPLICA_MAX_LAG seconds. Health is re-checked at most every
+    Config.DB_REPLICA_CHECK_INTERVAL seconds per replica.
+    """
+
+    def __init__(self, primary, replicas, max_lag, check_interval):
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._health = {}  # id(engine) -> {"healthy", "lag", "checked_at", "error"}
+        self._lock = threading.Lock()
+        self._cycle = itertools.cycle(range(len(self.replicas))) if self.replicas else None
+
+    def get_read_engine(self):
+        if not self.replicas:
+            return self.primary
+
+        # Round-robin over replicas, starting from the next one in the cycle
+        with self._lock:
+            start = next(self._cycle)
+        for offset in range(len(self.replicas)):
+            replica = self.replicas[(start + offset) % len(self.replicas)]
+            if self._is_healthy(replica):
+                return replica
+        return self.primary
+
+    def mark_down(self, replica, error=None):
+        with self._lock:
+            self._health[id(replica)] = {
+                "healthy": False,
+                "lag": None,
+                "checked_at": time.monotonic(),
+                "error": str(error) if error else None,
+            }
+
+    def status(self):
+        out = []
+        for replica in self.replicas:
+            health = self._health.get(id(replica), {})
+            out.append(
+                {
+                    "url": replica.url.render_as_string(hide_password=True),
+                    "healthy": health.get("healthy"),
+                    "lag_seconds": health.get("lag"),
+                    "error": health.get("error"),
+                    "pool": get_pool_stats(replica),
+                }
+            )
+        return out
+
+    def _is_healthy(self, replica):
+        health = self._health.get(id(replica))
+        if health and time.monotonic() - health["checked_at"] < self.check_interval:
+            return health["healthy"]
+
+        try:
+            lag = self._replication_lag(replica)
+        except Exception as e:
+            logger.warning("Replica %s unavailable, using primary: %s", replica.url.host, e)
+            self.mark_down(replica, e)
+            return False
+
+        healthy = lag is not None and lag <= self.max_lag
+        if not healthy:
+            logger.warning(
+                "Replica %s lagging (%s s behind), using primary", replica.url.host, lag
+            )
+        with self._lock:
+            self._health[id(replica)] = {
+                "healthy": healthy,
+                "lag": lag,
+                "checked_at": time.monotonic(),
+                "error": None,
+            }
+        return healthy
+
+    @staticmethod
+    def _replication_lag(replica):
+        """
+        Seconds behind the primary, 0 when the server is not replicating,
+        or None when replication is broken (NULL lag).
+        """
+        with replica.connect() as conn:
+            try:
+                row = conn.exec_driver_sql("SHOW REPLICA STATUS").mappings().first()
+                lag_key = "Seconds_Behind_Source"
+            except DBAPIError:
+                # MySQL < 8.0.22
+                conn.rollback()
+                row = conn.exec_driver_sql("SHOW SLAVE STATUS").mappings().first()
+                lag_key = "Seconds_Behind_Master"
+
+        if row is None:
+            return 0
+        lag = row.get(lag_key)
+        return None if lag is None else int(lag)
+
+
+replica_engines = [create_db_engine(uri) for uri in Config.DB_REPLICA_URIS]
+router = ReplicaRouter(
+    engine,
+    replica_engines,
+    max_lag=Config.DB_REPLICA_MAX_LAG,
+    check_interval=Config.DB_REPLICA_CHECK_INTERVAL,
+)
+
+
+_deadline = threading.local()  # .at: time.monotonic() by which this thread's reads must end
+
+
+@contextmanager
+def statement_deadline(deadline):
+    """
+    Make read_connection() in this thread give up at deadline (a time.monotonic()
+    value): MySQL aborts statements still running then, and a connection
+    requested after it raises TimeoutError instead of querying.
+    """
+    previous = getattr(_deadline, "at", None)
+    _deadline.at = deadline
+    try:
+        yield
+    finally:
+        _deadline.at = previous
+
+
+def _set_statement_timeout(conn, seconds):
+    # Per-session SELECT time limit; 0 removes it. Other backends have no equivalent
+    if conn.dialect.name != "mysql":
+        return
+    if conn.dialect.is_mariadb:
+        conn.exec_driver_sql(f"SET SESSION max_statement_time = {seconds:.3f}")
+    else:
+        conn.exec_driver_sql(f"SET SESSION max_execution_time = {int(seconds * 1000)}")
+
+
+@contextmanager
+def read_connection():
+    """
+    Connection for read-only analysis queries.
+    Uses a healthy replica when one is configured, otherwise the primary engine.
+    Writes (e.g. login) should keep using `engine` directly.
+    """
+    deadline = getattr(_deadline, "at", None)
+    if deadline is not None and deadline <= time.monotonic():
+        raise TimeoutError("statement deadline passed before the query started")
+
+    target = router.get_read_engine()
+    try:
+        conn = target.connect()
+    except DBAPIError as e:
+        if target is engine:
+            raise
+        logger.warning("Replica connection failed, falling back to primary: %s", e)
+        router.mark_down(target, e)
+        conn = engine.connect()
+
+    with conn:
+        if deadline is None:
+            yield conn
+            return
+        _set_statement_timeout(conn, max(deadline - time.monotonic(), 0.001))
+        try:
+            yield conn
+        finally:
+            try:
+                _set_statement_timeout(conn, 0)
+            except DBAPIError:
+                # Don't return a connection with the limit still set to the pool
+                conn.invalidate()
+
+
+def stream_rows(query, params=None, batch_size=None):
+    """
+    Yield the rows of a read-only query without materialising the full result.
+
+    Rows are fetched in batches of Config.DB_STREAM_BATCH_SIZE. With a driver that
+    supports server-side cursors (DB_DRIVER=pymysql / mysqldb) the rows stay on the
+    server until fetched; mysql-connector buffers them client-side, but callers still
+    avoid building intermediate lists of dicts.
+    The connection is held until the generator is exhausted or closed.
+    """
+    with read_connection() as conn:
+        result = conn.execution_options(
+            stream_results=True,
+            yield_per=batch_size or Config.DB_STREAM_BATCH_SIZE,
+        ).execute(query, params or {})
+        for row in result:
+            yield row
+
+
+def get_replica_status():
+    return router.status()
 
 
 def test_db_connection():
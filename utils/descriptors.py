@@ -0,0 +1,279 @@
+"""
+descriptors.py
+--------------
+Statistical descriptors of scatter data, sent to the LLM and to the /overall
+summary charts instead of every raw point.
+
+    summary = describe_pairs(durations, scores, "duration_minutes", "score")
+    summary["error_types"] = effect_sizes(times, {"warnings": counts, ...})
+
+describe_pairs gives the size, five-number summaries, Pearson correlation,
+least-squares slope, the y quartiles within x-quantile bands and the points
+whose residual from the trend is an outlier (IQR fences or |z| > Z_LIMIT).
+effect_sizes compares sessions with and without each error type (Cohen's d)
+and co_occurrence gives how often error types appear together.
+
+The output size does not grow with the data. Arrays go through NumPy when
+vector_stats uses it; otherwise the same formulas run in Python.
+"""
+
+from bisect import bisect_right
+from itertools import combinations
+import math
+import statistics
+
+from utils import vector_stats
+
+BANDS = 4  # x-quantile bands in describe_pairs
+MAX_OUTLIERS = 10  # most extreme outliers listed (all are counted)
+Z_LIMIT = 3.0
+DIGITS = 3
+
+
+def _round(value):
+    if value is None or isinstance(value, int):
+        return value
+    return round(float(value), DIGITS) if math.isfinite(value) else None
+
+
+def is_number(value):
+    """
+    True for finite ints and floats (not bools).
+    """
+    return (
+        isinstance(value, (int, float))
+        and not isinstance(value, bool)
+        and math.isfinite(value)
+    )
+
+
+# -- Primitives (NumPy array or list of floats) --
+def _array(values):
+    np = vector_stats.np
+    return np.asarray(values, dtype=float) if np is not None else [float(v) for v in values]
+
+
+def _mean(a):
+    return float(vector_stats.np.mean(a)) if vector_stats.np is not None else statistics.fmean(a)
+
+
+def _std(a):
+    # Population standard deviation
+    return float(vector_stats.np.std(a)) if vector_stats.np is not None else statistics.pstdev(a)
+
+
+def _quantiles(a, qs):
+    """
+    Linearly interpolated quantiles (NumPy's default method).
+    """
+    np = vector_stats.np
+    if np is not None:
+        return [float(v) for v in np.quantile(a, qs)]
+    ordered = sorted(a)
+    out = []
+    for q in qs:
+        pos = q * (len(ordered) - 1)
+        lower = math.floor(pos)
+        upper = min(lower + 1, len(ordered) - 1)
+        out.append(ordered[lower] + (ordered[upper] - ordered[lower]) * (pos - lower))
+    return out
+
+
+def _trend(x, y):
+    """
+    (correlation, slope, intercept); correlation is None when either side is
+    constant and slope is None when x is.
+    """
+    np = vector_stats.np
+    if np is not None:
+        dx, dy = x - x.mean(), y - y.mean()
+        sxx, syy, sxy = float(dx @ dx), float(dy @ dy), float(dx @ dy)
+        x_mean, y_mean = float(x.mean()), float(y.mean())
+    else:
+        x_mean, y_mean = statistics.fmean(x), statistics.fmean(y)
+        sxx = math.fsum((a - x_mean) ** 2 for a in x)
+        syy = math.fsum((b - y_mean) ** 2 for b in y)
+        sxy = math.fsum((a - x_mean) * (b - y_mean) for a, b in zip(x, y))
+    correlation = sxy / math.sqrt(sxx * syy) if sxx > 0 and syy > 0 else None
+    slope = sxy / sxx if sxx > 0 else None
+    intercept = y_mean - slope * x_mean if slope is not None else y_mean
+    return correlation, slope, intercept
+
+
+def five_numbers(values):
+    """
+    min/q1/median/q3/max, mean and standard deviation of numeric values, or
+    None when there are none.
+    """
+    if not len(values):
+        return None
+    a = _array(values)
+    q = _quantiles(a, [0, 0.25, 0.5, 0.75, 1])
+    return {
+        "min": _round(q[0]),
+        "q1": _round(q[1]),
+        "median": _round(q[2]),
+        "q3": _round(q[3]),
+        "max": _round(q[4]),
+        "mean": _round(_mean(a)),
+        "std": _round(_std(a)),
+    }
+
+
+# -- Descriptors --
+def describe_pairs(xs, ys, x_name="x", y_name="y"):
+    """
+    Descriptors of (x, y) pairs; pairs with a non-numeric side are dropped.
+    Returns {"n": 0} when nothing is left.
+    """
+    pairs = [(x, y) for x, y in zip(xs, ys) if is_number(x) and is_number(y)]
+    if not pairs:
+        return {"n": 0}
+    x = _array([p[0] for p in pairs])
+    y = _array([p[1] for p in pairs])
+    correlation, slope, intercept = _trend(x, y)
+
+    return {
+        "n": len(pairs),
+        x_name: five_numbers(x),
+        y_name: five_numbers(y),
+        "correlation": _round(correlation),
+        "slope": _round(slope),  # change in y per unit of x
+        "intercept": _round(intercept),
+        "bands": _bands(x, y, x_name, y_name),
+        "outliers": _outliers(x, y, slope, intercept, x_name, y_name),
+    }
+
+
+def _bands(x, y, x_name, y_name):
+    # y quartiles within x-quantile bands (the last band includes its upper edge)
+    edges = _quantiles(x, [i / BANDS for i in range(BANDS + 1)])
+    np = vector_stats.np
+    if np is not None:
+        index = np.minimum(np.searchsorted(edges, x, side="right") - 1, BANDS - 1)
+        members = [y[index == band] for band in range(BANDS)]
+    else:
+        members = [[] for _ in range(BANDS)]
+        for a, b in zip(x, y):
+            members[min(bisect_right(edges, a) - 1, BANDS - 1)].append(b)
+
+    bands = []
+    for band, values in enumerate(members):
+        if not len(values):
+            continue  # ties can leave a band empty
+        q1, median, q3 = _quantiles(values, [0.25, 0.5, 0.75])
+        bands.append(
+            {
+                x_name: [_round(edges[band]), _round(edges[band + 1])],
+                "n": len(values),
+                y_name: {
+                    "q1": _round(q1),
+                    "median": _round(median),
+                    "q3": _round(q3),
+                    "mean": _round(_mean(values)),
+                },
+            }
+        )
+    return bands
+
+
+def _outliers(x, y, slope, intercept, x_name, y_name):
+    # Residuals from the trend line; outside the IQR fences or beyond Z_LIMIT
+    np = vector_stats.np
+    slope = slope or 0.0
+    if np is not None:
+        residuals = y - (intercept + slope * x)
+    else:
+        residuals = [b - (intercept + slope * a) for a, b in zip(x, y)]
+    q1, q3 = _quantiles(residuals, [0.25, 0.75])
+    low, high = q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1)
+    spread = _std(residuals)
+
+    if np is not None:
+        z = residuals / spread if spread > 0 else np.zeros_like(residuals)
+        flagged = np.flatnonzero((residuals < low) | (residuals > high) | (np.abs(z) > Z_LIMIT))
+        flagged = flagged[np.argsort(-np.abs(z[flagged]), kind="stable")].tolist()
+        z = z.tolist()
+    else:
+        z = [r / spread if spread > 0 else 0.0 for r in residuals]
+        flagged = sorted(
+            (
+                i
+                for i, r in enumerate(residuals)
+                if r < low or r > high or abs(z[i]) > Z_LIMIT
+            ),
+            key=lambda i: -abs(z[i]),
+        )
+
+    return {
+        "count": len(flagged),
+        "points": [
+            {
+                x_name: _round(x[i]),
+                y_name: _round(y[i]),
+                "residual": _round(residuals[i]),
+                "z": _round(z[i]),
+            }
+            for i in flagged[:MAX_OUTLIERS]
+        ],
+    }
+
+
+def effect_sizes(values, counts_by_name):
+    """
+    For each name, compare values of the sessions where its count is > 0 with
+    the rest: share of sessions, both means, Cohen's d and the correlation of
+    the count with the value. values and each count list are parallel.
+    """
+    np = vector_stats.np
+    out = {}
+    v = _array(values)
+    for name, counts in counts_by_name.items():
+        c = _array(counts)
+        if np is not None:
+            present = c > 0
+            with_, without = v[present], v[~present]
+        else:
+            with_ = [a for a, n in zip(v, c) if n > 0]
+            without = [a for a, n in zip(v, c) if n <= 0]
+        correlation, _, _ = _trend(c, v) if len(v) else (None, None, None)
+        out[name] = {
+            "sessions": len(with_),
+            "share": _round(len(with_) / len(v)) if len(v) else None,
+            "mean_with": _round(_mean(with_)) if len(with_) else None,
+            "mean_without": _round(_mean(without)) if len(without) else None,
+            "cohens_d": _round(_cohens_d(with_, without)),
+            "correlation": _round(correlation),
+        }
+    return out
+
+
+def _cohens_d(a, b):
+    if len(a) < 2 or len(b) < 2:
+        return None
+    var_a = _std(a) ** 2 * len(a) / (len(a) - 1)
+    var_b = _std(b) ** 2 * len(b) / (len(b) - 1)
+    pooled = math.sqrt(((len(a) - 1) * var_a + (len(b) - 1) * var_b) / (len(a) + len(b) - 2))
+    return (_mean(a) - _mean(b)) / pooled if pooled > 0 else None
+
+
+def co_occurrence(counts_by_name):
+    """
+    {"a+b": share of sessions with both} for each pair of names.
+    """
+    np = vector_stats.np
+    present = {}
+    for name, counts in counts_by_name.items():
+        c = _array(counts)
+        present[name] = c > 0 if np is not None else [n > 0 for n in c]
+    out = {}
+    for a, b in combinations(present, 2):
+        total = len(present[a])
+        if not total:
+            continue
+        if np is not None:
+            both = int(np.count_nonzero(present[a] & present[b]))
+        else:
+            both = sum(1 for p, q in zip(present[a], present[b]) if p and q)
+        out[f"{a}+{b}"] = _round(both / total)
+    return out
@@ -0,0 +1,388 @@
+"""
+ingest.py
+---------
+Background ingester that keeps the dashboard's derived tables up to date.
+
+Game attempts are append-only, so instead of recomputing from scratch this
+keeps a watermark (highest Session_ID and Game_End already processed) in
+Dashboard_Ingest_State and, on a schedule, only pulls attempts past it:
+
+  1. New attempts: keyset scan of IMA_Plan_Session_Game_Status after the
+     watermark (re-checking the last few sessions for late rows), skipping
+     attempts already in the summary.
+  2. Closed attempts: attempts that were still open (Game_End IS NULL) when
+     summarised and have since ended.
+
+Each batch upserts Dashboard_Attempt_Summary, recomputes the affected
+(plan level, month) rows of Dashboard_Game_Level_Month_Errors from the summary
+and advances the watermark in one transaction, so a crash or restart never
+double counts and re-running a batch is harmless. A MySQL named lock keeps a single
+ingester active across worker processes.
+"""
+
+from datetime import date
+import logging
+import threading
+import time
+
+from sqlalchemy import text
+
+from config import Config
+from utils.attempt_summary import (
+    ATTEMPT_SOURCE_SQL,
+    CREATE_SUMMARY_TABLE,
+    SUMMARY_TABLE,
+    UPSERT_SUMMARY,
+    summary_row,
+)
+from utils.db import engine
+
+logger = logging.getLogger(__name__)
+
+STATE_TABLE = "Dashboard_Ingest_State"
+GAME_LEVEL_MONTH_TABLE = "Dashboard_Game_Level_Month_Errors"
+STATE_NAME = "attempts"
+LOCK_NAME = "dashboard_attempt_ingest"
+
+CREATE_STATE_TABLE = text(
+    f"""
+    CREATE TABLE IF NOT EXISTS {STATE_TABLE} (
+        Name            VARCHAR(64) NOT NULL PRIMARY KEY,
+        Last_Session_ID BIGINT      NOT NULL DEFAULT 0,
+        Last_Game_End   DATETIME    NULL,
+        Backfilled      TINYINT(1)  NOT NULL DEFAULT 0,
+        Rows_Ingested   BIGINT      NOT NULL DEFAULT 0,
+        Last_Run_At     DATETIME    NULL,
+        Last_Error      TEXT        NULL
+    )
+    """
+)
+
+# The per-(level, month) counters: errors per IMA_Plan_Game.Level (0 = none), as
+# used by the minigames page, and calendar month of Game_End; only ended attempts
+# are counted
+CREATE_GAME_LEVEL_MONTH_TABLE = text(
+    f"""
+    CREATE TABLE IF NOT EXISTS {GAME_LEVEL_MONTH_TABLE} (
+        Game_Level     BIGINT      NOT NULL,
+        Month          DATE        NOT NULL,
+        Attempts       INT         NOT NULL DEFAULT 0,
+        Imprecisions   INT         NOT NULL DEFAULT 0,
+        Warnings       INT         NOT NULL DEFAULT 0,
+        Minors         INT         NOT NULL DEFAULT 0,
+        Severes        INT         NOT NULL DEFAULT 0,
+        PRIMARY KEY (Game_Level, Month)
+    )
+    """
+)
+
+# Recomputed from the summary rather than incremented, so replays are idempotent
+RECOMPUTE_GAME_LEVEL_MONTH = text(
+    f"""
+    INSERT INTO {GAME_LEVEL_MONTH_TABLE}
+        (Game_Level, Month, Attempts, Imprecisions, Warnings, Minors, Severes)
+    SELECT * FROM (
+        SELECT :game_level AS Game_Level, :month AS Month,
+               COUNT(*) AS Attempts,
+               COALESCE(SUM(ds.Imprecision_Count), 0) AS Imprecisions,
+               COALESCE(SUM(ds.Warning_Count), 0) AS Warnings,
+               COALESCE(SUM(ds.Minor_Count), 0) AS Minors,
+               COALESCE(SUM(ds.Severe_Count), 0) AS Severes
+        FROM {SUMMARY_TABLE} ds
+        LEFT JOIN IMA_Plan_Game pg ON pg.Plan_Game_ID = ds.Plan_Game_ID
+        WHERE ds.Game_End >= :month AND ds.Game_End < :next_month
+          AND COALESCE(pg.Level, 0) = :game_level
+    ) AS agg
+    ON DUPLICATE KEY UPDATE
+        Attempts = agg.Attempts, Imprecisions = agg.Imprecisions,
+        Warnings = agg.Warnings, Minors = agg.Minors, Severes = agg.Severes
+    """
+)
+
+NEW_ATTEMPTS = text(
+    ATTEMPT_SOURCE_SQL
+    + f"""
+    LEFT JOIN {SUMMARY_TABLE} ds
+        ON ds.Session_ID = psgs.Session_ID AND ds.Plan_Game_ID = psgs.Plan_Game_ID
+    WHERE (psgs.Session_ID, psgs.Plan_Game_ID) > (:after_session_id, :after_plan_game_id)
+      AND ds.Session_ID IS NULL
+    ORDER BY psgs.Session_ID, psgs.Plan_Game_ID
+    LIMIT :limit
+    """
+)
+
+CLOSED_ATTEMPTS = text(
+    ATTEMPT_SOURCE_SQL
+    + f"""
+    JOIN {SUMMARY_TABLE} ds
+        ON ds.Session_ID = psgs.Session_ID AND ds.Plan_Game_ID = psgs.Plan_Game_ID
+    WHERE ds.Game_End IS NULL AND psgs.Game_End IS NOT NULL
+    LIMIT :limit
+    """
+)
+
+_status = {"backfilled": False, "checked_at": None, "running": False, "last_error": None}
+_status_lock = threading.Lock()
+_started = False
+
+
+def ensure_tables(conn):
+    conn.execute(CREATE_SUMMARY_TABLE)
+    conn.execute(CREATE_STATE_TABLE)
+    conn.execute(CREATE_GAME_LEVEL_MONTH_TABLE)
+    conn.execute(
+        text(f"INSERT IGNORE INTO {STATE_TABLE} (Name) VALUES (:name)"), {"name": STATE_NAME}
+    )
+    conn.commit()
+
+
+def _load_state(conn):
+    return conn.execute(
+        text(f"SELECT * FROM {STATE_TABLE} WHERE Name = :name"), {"name": STATE_NAME}
+    ).mappings().first()
+
+
+def _month_bounds(moment):
+    month = date(moment.year, moment.month, 1)
+    if moment.month == 12:
+        return month, date(moment.year + 1, 1, 1)
+    return month, date(moment.year, moment.month + 1, 1)
+
+
+def _apply_batch(conn, rows, watermark):
+    """
+    Write one batch of attempts and advance the watermark, all in one transaction.
+    """
+    summaries = [summary_row(row) for row in rows]
+    conn.execute(UPSERT_SUMMARY, summaries)
+
+    game_level_keys = {
+        (row.Plan_Level or 0, *_month_bounds(row.Game_End))
+        for row in rows
+        if row.Game_End is not None
+    }
+    for game_level, month, next_month in sorted(game_level_keys):
+        conn.execute(
+            RECOMPUTE_GAME_LEVEL_MONTH,
+            {"game_level": game_level, "month": month, "next_month": next_month},
+        )
+
+    watermark["Last_Session_ID"] = max(
+        [watermark["Last_Session_ID"]] + [s["Session_ID"] for s in summaries]
+    )
+    game_ends = [s["Game_End"] for s in summaries if s["Game_End"] is not None]
+    if watermark["Last_Game_End"] is not None:
+        game_ends.append(watermark["Last_Game_End"])
+    watermark["Last_Game_End"] = max(game_ends) if game_ends else None
+    watermark["Rows_Ingested"] += len(summaries)
+
+    conn.execute(
+        text(
+            f"""
+            UPDATE {STATE_TABLE}
+            SET Last_Session_ID = :Last_Session_ID, Last_Game_End = :Last_Game_End,
+                Rows_Ingested = :Rows_Ingested
+            WHERE Name = :name
+            """
+        ),
+        {**watermark, "name": STATE_NAME},
+    )
+    conn.commit()
+
+
+def run_ingest_once(batch_size=None):
+    """
+    Ingest everything past the watermark. Returns the number of attempts written,
+    or None when another process holds the ingest lock.
+    """
+    batch_size = batch_size or Config.DB_STREAM_BATCH_SIZE
+
+    with engine.connect() as conn:
+        if not conn.execute(text("SELECT GET_LOCK(:name, 0)"), {"name": LOCK_NAME}).scalar():
+            conn.rollback()
+            return None
+
+        try:
+            ensure_tables(conn)
+            state = _load_state(conn)
+            watermark = {
+                "Last_Session_ID": state["Last_Session_ID"],
+                "Last_Game_End": state["Last_Game_End"],
+                "Rows_Ingested": state["Rows_Ingested"],
+            }
+            written = 0
+
+            # 1. New attempts; re-check the last few sessions for rows added late
+            cursor = (max(state["Last_Session_ID"] - Config.ATTEMPT_SUMMARY_LOOKBACK_SESSIONS, 0), 0)
+            while True:
+                rows = conn.execute(
+                    NEW_ATTEMPTS,
+                    {
+                        "after_session_id": cursor[0],
+                        "after_plan_game_id": cursor[1],
+                        "limit": batch_size,
+                    },
+                ).fetchall()
+                if not rows:
+                    break
+                _apply_batch(conn, rows, watermark)
+                written += len(rows)
+                cursor = (rows[-1].Session_ID, rows[-1].Plan_Game_ID)
+
+            # 2. Attempts that were open when summarised and have ended since
+            while True:
+                rows = conn.execute(CLOSED_ATTEMPTS, {"limit": batch_size}).fetchall()
+                if not rows:
+                    break
+                _apply_batch(conn, rows, watermark)
+                written += len(rows)
+
+            conn.execute(
+                text(
+                    f"""
+                    UPDATE {STATE_TABLE}
+                    SET Backfilled = 1, Last_Run_At = NOW(), Last_Error = NULL
+                    WHERE Name = :name
+                    """
+                ),
+                {"name": STATE_NAME},
+            )
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            try:
+                conn.execute(
+                    text(f"UPDATE {STATE_TABLE} SET Last_Error = :error WHERE Name = :name"),
+                    {"error": str(e)[:2000], "name": STATE_NAME},
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+            raise
+        finally:
+            conn.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": LOCK_NAME})
+            conn.rollback()
+
+    with _status_lock:
+        _status["backfilled"] = True
+    return written
+
+
+def _ingest_loop():
+    while True:
+        with _status_lock:
+            _status["running"] = True
+        started = time.monotonic()
+        try:
+            written = run_ingest_once()
+            if written:
+                logger.info(
+                    "Ingested %s attempts in %.1fs", written, time.monotonic() - started
+                )
+            with _status_lock:
+                _status["last_error"] = None
+        except Exception as e:
+            logger.warning(f"Attempt ingest failed, will retry: {e}")
+            with _status_lock:
+                _status["last_error"] = str(e)
+        finally:
+            with _status_lock:
+                _status["running"] = False
+        time.sleep(Config.ATTEMPT_SUMMARY_REFRESH_INTERVAL)
+
+
+def start_ingester():
+    """
+    Start the background ingest thread for this process (once).
+    Safe to call from every worker: only the lock holder does the work.
+    """
+    global _started
+    if not Config.ATTEMPT_SUMMARY_ENABLED:
+        return False
+    with _status_lock:
+        if _started:
+            return False
+        _started = True
+    threading.Thread(target=_ingest_loop, name="attempt-ingester", daemon=True).start()
+    return True
+
+
+def is_backfilled():
+    """
+    True once any process has caught up with the existing history.
+    The state table is re-checked at most every ATTEMPT_SUMMARY_REFRESH_INTERVAL seconds.
+    """
+    with _status_lock:
+        if _status["backfilled"]:
+            return True
+        checked_at = _status["checked_at"]
+        if (
+            checked_at is not None
+            and time.monotonic() - checked_at < Config.ATTEMPT_SUMMARY_REFRESH_INTERVAL
+        ):
+            return False
+        _status["checked_at"] = time.monotonic()
+
+    try:
+        with engine.connect() as conn:
+            backfilled = conn.execute(
+                text(f"SELECT Backfilled FROM {STATE_TABLE} WHERE Name = :name"),
+                {"name": STATE_NAME},
+            ).scalar()
+    except Exception:
+        backfilled = False  # tables not created yet
+
+    with _status_lock:
+        _status["backfilled"] = bool(backfilled)
+    return bool(backfilled)
+
+
+def get_ingest_status():
+    """
+    Watermark, backlog and lag of the ingester (lag = age of the oldest
+    attempt past the watermark, 0 when caught up).
+    """
+    with _status_lock:
+        status = {
+            "enabled": Config.ATTEMPT_SUMMARY_ENABLED,
+            "running": _status["running"],
+            "last_error": _status["last_error"],
+        }
+
+    try:
+        with engine.connect() as conn:
+            state = _load_state(conn)
+            if state is None:
+                return {**status, "backfilled": False}
+
+            backlog = conn.execute(
+                text(
+                    """
+                    SELECT COUNT(*) AS pending,
+                           TIMESTAMPDIFF(SECOND, MIN(Game_Start), NOW()) AS lag_seconds
+                    FROM IMA_Plan_Session_Game_Status
+                    WHERE Session_ID > :last_session_id
+                    """
+                ),
+                {"last_session_id": state["Last_Session_ID"]},
+            ).mappings().first()
+            open_attempts = conn.execute(
+                text(f"SELECT COUNT(*) FROM {SUMMARY_TABLE} WHERE Game_End IS NULL")
+            ).scalar()
+    except Exception as e:
+        return {**status, "backfilled": False, "error": str(e)}
+
+    return {
+        **status,
+        "backfilled": bool(state["Backfilled"]),
+        "watermark": {
+            "session_id": state["Last_Session_ID"],
+            "game_end": state["Last_Game_End"].isoformat() if state["Last_Game_End"] else None,
+        },
+        "rows_ingested": state["Rows_Ingested"],
+        "last_run_at": state["Last_Run_At"].isoformat() if state["Last_Run_At"] else None,
+        "pending_attempts": backlog["pending"],
+        "open_attempts": open_attempts,
+        "lag_seconds": backlog["lag_seconds"] or 0,
+        "last_db_error": state["Last_Error"],
+    }
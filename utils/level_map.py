@@ -0,0 +1,152 @@
+"""
+level_map.py
+------------
+Process-level Plan_Game_ID -> Level_ID resolution.
+
+The level an attempt belongs to depends on its plan game and the session mode:
+plans with a progression sequence resolve through
+IMA_Progression_Sequence_Level (Sequence_Order 0 for Training, 1 for Practice),
+the rest (e.g. assessments) use IMA_Plan_Game.Level. This is the same rule as
+attempt_summary.LEVEL_ID_SQL, evaluated in Python against a map loaded once:
+
+    level_id = resolve_level(plan_game_id, session_mode(ps_results))
+
+The mapping tables rarely change, so the map is reused for
+Config.LEVEL_MAP_TTL seconds. After that a cheap version query is run and the
+map is reloaded only if the tables changed.
+"""
+
+import logging
+import threading
+import time
+
+from sqlalchemy import text
+
+from config import Config
+from utils.db import read_connection
+
+logger = logging.getLogger(__name__)
+
+PLAN_GAME_LEVELS = text(
+    """
+    SELECT pg.Plan_Game_ID, pg.Level, psl.Sequence_Order, psl.Level_ID
+    FROM IMA_Plan_Game pg
+    LEFT JOIN IMA_Progression_Sequence_Level psl ON psl.Sequence_ID = pg.Sequence
+    """
+)
+
+LEVEL_NAMES = text(
+    """
+    SELECT Level_ID, Name, REPLACE(Name, '<br>', ' - ') AS Display_Name
+    FROM IMA_Game_Level
+    """
+)
+
+MAP_VERSION = text(
+    """
+    SELECT (SELECT COUNT(*) FROM IMA_Plan_Game),
+           (SELECT MAX(Plan_Game_ID) FROM IMA_Plan_Game),
+           (SELECT COUNT(*) FROM IMA_Progression_Sequence_Level),
+           (SELECT COALESCE(SUM(Level_ID), 0) FROM IMA_Progression_Sequence_Level),
+           (SELECT COUNT(*) FROM IMA_Game_Level)
+    """
+)
+
+# Position of each session mode in a resolved entry
+_MODE_INDEX = {"training": 0, "practice": 1}
+
+_state = {"version": None, "expires_at": 0.0, "levels": {}, "by_level": {}, "names": {}}
+_lock = threading.Lock()
+
+
+def session_mode(session_results):
+    """
+    'training' / 'practice' / None from IMA_Plan_Session.Results, with the
+    precedence (Training first) and case-insensitivity of the SQL LIKE checks.
+    """
+    results = (session_results or "").lower()
+    if "training" in results:
+        return "training"
+    if "practice" in results:
+        return "practice"
+    return None
+
+
+def _load():
+    sequence_levels = {}  # plan game -> [training level, practice level]
+    plan_levels = {}
+    with read_connection() as conn:
+        for plan_game_id, level, order, level_id in conn.execute(PLAN_GAME_LEVELS):
+            plan_levels[plan_game_id] = level
+            if order is None:
+                continue
+            levels = sequence_levels.setdefault(plan_game_id, [None, None])
+            # MAX(Level_ID) per Sequence_Order, as in the SQL resolution
+            if order in (0, 1) and level_id is not None:
+                current = levels[order]
+                levels[order] = level_id if current is None else max(current, level_id)
+        names = {
+            r.Level_ID: (r.Display_Name, r.Name) for r in conn.execute(LEVEL_NAMES)
+        }
+
+    # Entry: (training level, practice level, level for any other session)
+    resolved = {}
+    by_level = {}
+    for plan_game_id, level in plan_levels.items():
+        if plan_game_id in sequence_levels:
+            training, practice = sequence_levels[plan_game_id]
+            resolved[plan_game_id] = (training, practice, None)
+        else:
+            resolved[plan_game_id] = (level, level, level)
+        for level_id in set(resolved[plan_game_id]) - {None}:
+            by_level.setdefault(level_id, []).append(plan_game_id)
+    return resolved, by_level, names
+
+
+def _current():
+    now = time.monotonic()
+    with _lock:
+        if now < _state["expires_at"]:
+            return _state
+
+        with read_connection() as conn:
+            version = tuple(conn.execute(MAP_VERSION).one())
+        if version != _state["version"]:
+            levels, by_level, names = _load()
+            _state.update(version=version, levels=levels, by_level=by_level, names=names)
+            logger.info("Loaded level map for %d plan games", len(levels))
+        _state["expires_at"] = now + Config.LEVEL_MAP_TTL
+        return _state
+
+
+def resolve_level(plan_game_id, mode):
+    """
+    Level_ID played in an attempt of this plan game in a session of this mode
+    (see session_mode), or None when it cannot be resolved.
+    """
+    entry = _current()["levels"].get(plan_game_id)
+    if entry is None:
+        return None
+    return entry[_MODE_INDEX.get(mode, 2)]
+
+
+def plan_games_for_level(level_id):
+    """
+    Plan games that resolve to level_id in at least one session mode.
+    """
+    return _current()["by_level"].get(level_id, [])
+
+
+def level_name(level_id):
+    """
+    (display name with '<br>' as ' - ', raw name) of a level, or None.
+    """
+    return _current()["names"].get(level_id)
+
+
+def invalidate():
+    """
+    Force a version check on the next lookup.
+    """
+    with _lock:
+        _state["expires_at"] = 0.0
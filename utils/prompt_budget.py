@@ -0,0 +1,352 @@
+"""
+prompt_budget.py
+----------------
+Compact, size-bounded data payloads for the LLM prompts.
+
+    data = prompt_budget.payload(attempts, "multiple_attempts")
+    prompt = f"... JSON Data:\n{data}"
+    prompt_budget.log_prompt("multiple_attempts", prompt)
+
+payload() serializes without indentation and turns lists of dicts into
+columnar tables ({"columns": [...], "rows": [[...], ...]}), so keys are sent
+once per table instead of once per row. Dates become ISO strings and Decimals
+floats. When the result is over the endpoint's token budget
+(Config.PROMPT_TOKEN_BUDGETS[name], else Config.PROMPT_TOKEN_BUDGET) it is
+reduced step by step until it fits:
+
+    1. floats are rounded to DIGITS decimals
+    2. lists longer than the current limit keep an evenly spaced sample (first
+       and last included) plus their length and a summary of each column
+       (five-number summary for numbers, most common values otherwise); the
+       limit is halved until the payload fits
+    3. strings are cut to the longest length that fits, but not below
+       MIN_STRING characters
+
+Prompts that must see every item verbatim use chunks() instead: the items are
+split into consecutive parts that each fit the budget, nothing is sampled or
+cut, and the caller sends one prompt per part.
+
+Tokens are estimated locally: with tiktoken's cl100k_base encoding when it is
+installed and Config.PROMPT_TOKENIZER allows it, otherwise by counting words,
+3-digit groups and punctuation runs. Both are estimates; the model's own tokenizer
+may differ by a few percent.
+"""
+
+from collections import Counter
+from datetime import date, datetime, time
+from decimal import Decimal
+import json
+import logging
+import re
+
+from config import Config
+from utils import descriptors
+
+logger = logging.getLogger(__name__)
+
+DIGITS = 3  # decimals kept once floats are rounded
+MIN_LIST = 3  # lists this short are never sampled
+TOP_VALUES = 3  # most common values listed for a non-numeric column
+MIN_STRING = 30  # strings are never cut shorter than this
+
+_WORDS = re.compile(r"[^\W\d_]+|\d+|[^\w\s]+|_+")
+_encoding = None  # tiktoken encoding, loaded on first use
+
+
+class _Table(dict):
+    # {"columns": [...], "rows": [[...], ...]} built from a list of dicts
+    pass
+
+
+# -- Token estimates --
+def _heuristic_tokens(text):
+    # ~4 letters per token for words, 3 digits per token, 2 punctuation marks per token
+    total = 0
+    for piece in _WORDS.findall(text):
+        if piece.isdigit():
+            total += (len(piece) + 2) // 3
+        elif piece.isalpha():
+            total += (len(piece) + 3) // 4
+        else:
+            total += (len(piece) + 1) // 2
+    return total
+
+
+def _load_encoding():
+    global _encoding
+    if _encoding is None:
+        _encoding = False
+        if Config.PROMPT_TOKENIZER in ("auto", "tiktoken"):
+            try:
+                import tiktoken
+
+                _encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception as e:  # not installed, or the encoding can't be fetched
+                if Config.PROMPT_TOKENIZER == "tiktoken":
+                    logger.warning("tiktoken unavailable, estimating tokens: %s", e)
+    return _encoding
+
+
+def estimate_tokens(text):
+    """
+    Estimated number of tokens in text.
+    """
+    encoding = _load_encoding()
+    if encoding:
+        return len(encoding.encode(text, disallowed_special=()))
+    return _heuristic_tokens(text)
+
+
+# -- Serialization --
+def _plain(value):
+    """
+    JSON-ready copy of value with lists of dicts turned into _Tables.
+    """
+    if isinstance(value, dict):
+        return {str(k): _plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        items = [_plain(v) for v in value]
+        if len(items) >= 2 and all(isinstance(v, dict) for v in items):
+            columns = list(dict.fromkeys(k for item in items for k in item))
+            return _Table(
+                columns=columns,
+                rows=[[item.get(c) for c in columns] for item in items],
+            )
+        return items
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    return value
+
+
+def dumps(value):
+    """
+    Compact JSON: no indentation or spaces after separators.
+    """
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+# -- Reductions --
+def _round_floats(value):
+    if isinstance(value, float):
+        return round(value, DIGITS)
+    if isinstance(value, _Table):
+        return _Table(columns=value["columns"], rows=[_round_floats(r) for r in value["rows"]])
+    if isinstance(value, dict):
+        return {k: _round_floats(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_round_floats(v) for v in value]
+    return value
+
+
+def _sample(items, k):
+    # k evenly spaced items, keeping the first and the last
+    if k <= 1:
+        return items[:k]
+    n = len(items)
+    return [items[round(i * (n - 1) / (k - 1))] for i in range(k)]
+
+
+def _describe(values):
+    numbers = [v for v in values if descriptors.is_number(v)]
+    if numbers and len(numbers) == sum(v is not None for v in values):
+        return descriptors.five_numbers(numbers)
+    hashable = [v for v in values if isinstance(v, (str, bool, int, float))]
+    if not hashable:
+        return None
+    counts = Counter(hashable)
+    top = counts.most_common(TOP_VALUES)
+    if top[0][1] == 1:
+        # All distinct (e.g. timestamps): the range says more than counts of 1
+        return {"distinct": len(counts), "first": hashable[0], "last": hashable[-1]}
+    return {"distinct": len(counts), "top": top}
+
+
+def _summary(value, summaries):
+    # Column summaries of a table or list, computed once per fit()
+    key = id(value)
+    if key not in summaries:
+        if isinstance(value, _Table):
+            columns = list(zip(*value["rows"]))
+            summaries[key] = {
+                name: _describe(column) for name, column in zip(value["columns"], columns)
+            }
+        else:
+            summaries[key] = _describe(value)
+    return summaries[key]
+
+
+def _shrink(value, keep, summaries):
+    """
+    Copy of value with lists longer than keep sampled down to keep items.
+    """
+    if isinstance(value, _Table):
+        rows = value["rows"]
+        if len(rows) > max(keep, MIN_LIST):
+            return {
+                "total_rows": len(rows),
+                "column_summary": _summary(value, summaries),
+                "columns": value["columns"],
+                "sampled_rows": [
+                    [_shrink(cell, keep, summaries) for cell in row] for row in _sample(rows, keep)
+                ],
+            }
+        return _Table(
+            columns=value["columns"],
+            rows=[[_shrink(cell, keep, summaries) for cell in row] for row in rows],
+        )
+    if isinstance(value, dict):
+        return {k: _shrink(v, keep, summaries) for k, v in value.items()}
+    if isinstance(value, list):
+        if len(value) > max(keep, MIN_LIST):
+            reduced = {
+                "total_items": len(value),
+                "sample": [_shrink(v, keep, summaries) for v in _sample(value, keep)],
+            }
+            summary = _summary(value, summaries)
+            if summary is not None:
+                reduced["summary"] = summary
+            return reduced
+        return [_shrink(v, keep, summaries) for v in value]
+    return value
+
+
+def _cut_strings(value, limit):
+    if isinstance(value, str):
+        return value if len(value) <= limit else value[:limit] + "…"
+    if isinstance(value, dict):
+        return {k: _cut_strings(v, limit) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_cut_strings(v, limit) for v in value]
+    return value
+
+
+def _longest_string(value):
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, dict):
+        return max((_longest_string(v) for v in value.values()), default=0)
+    if isinstance(value, list):
+        return max((_longest_string(v) for v in value), default=0)
+    return 0
+
+
+def _longest_list(value):
+    if isinstance(value, _Table):
+        nested = [_longest_list(cell) for row in value["rows"] for cell in row]
+        return max([len(value["rows"]), *nested])
+    if isinstance(value, dict):
+        return max((_longest_list(v) for v in value.values()), default=0)
+    if isinstance(value, list):
+        return max([len(value), *(_longest_list(v) for v in value)])
+    return 0
+
+
+def budget_for(name):
+    """
+    Payload token budget of an endpoint.
+    """
+    return Config.PROMPT_TOKEN_BUDGETS.get(name, Config.PROMPT_TOKEN_BUDGET)
+
+
+def fit(data, budget):
+    """
+    (compact JSON text, estimated tokens, reduction steps applied) for data
+    reduced until it is within budget tokens, or as far as it goes.
+    """
+    value = _plain(data)
+    text = dumps(value)
+    tokens = estimate_tokens(text)
+    steps = []
+    if tokens <= budget:
+        return text, tokens, steps
+
+    value = _round_floats(value)
+    text = dumps(value)
+    tokens = estimate_tokens(text)
+    steps.append("rounded")
+
+    summaries = {}
+    keep = _longest_list(value)
+    if tokens > budget and keep > MIN_LIST:
+        while tokens > budget and keep > 0:
+            keep //= 2
+            reduced = _shrink(value, keep, summaries)
+            text = dumps(reduced)
+            tokens = estimate_tokens(text)
+        value = reduced
+        steps.append(f"lists sampled to {keep}")
+
+    longest = _longest_string(value)
+    if tokens > budget and longest > MIN_STRING:
+        # Binary search for the longest string limit that fits
+        low, high, best = MIN_STRING, longest - 1, None
+        while low <= high:
+            limit = (low + high) // 2
+            cut = dumps(_cut_strings(value, limit))
+            cut_tokens = estimate_tokens(cut)
+            if cut_tokens <= budget:
+                best = (limit, cut, cut_tokens)
+                low = limit + 1
+            else:
+                high = limit - 1
+        if best is None:
+            # Nothing fits: cut as far as allowed
+            cut = dumps(_cut_strings(value, MIN_STRING))
+            best = (MIN_STRING, cut, estimate_tokens(cut))
+        limit, text, tokens = best
+        steps.append(f"strings cut to {limit}")
+    return text, tokens, steps
+
+
+def payload(data, name, share=1.0):
+    """
+    Compact JSON of data within the budget of endpoint name. share is the part
+    of the budget this payload may use when a prompt carries several.
+    """
+    budget = int(budget_for(name) * share)
+    text, tokens, steps = fit(data, budget)
+    if steps:
+        level = logging.WARNING if tokens > budget else logging.INFO
+        logger.log(
+            level,
+            "Prompt %s: payload reduced to ~%d tokens (budget %d): %s",
+            name,
+            tokens,
+            budget,
+            ", ".join(steps),
+        )
+    return text
+
+
+def chunks(items, name):
+    """
+    Compact JSON texts of consecutive parts of the list items, each within the
+    budget of endpoint name. Items are never sampled or cut; one over the budget
+    on its own is sent as a part by itself.
+    """
+    budget = budget_for(name)
+    parts, current, used = [], [], 0
+    for item in items:
+        tokens = estimate_tokens(dumps(_plain(item))) + 1  # + separator
+        if tokens > budget:
+            logger.warning("Prompt %s: one item is ~%d tokens (budget %d)", name, tokens, budget)
+        if current and used + tokens > budget:
+            parts.append(current)
+            current, used = [], 0
+        current.append(item)
+        used += tokens
+    if current or not parts:
+        parts.append(current)
+    if len(parts) > 1:
+        logger.info("Prompt %s: %d items split into %d parts (budget %d)", name, len(items), len(parts), budget)
+    return [dumps(_plain(part)) for part in parts]
+
+
+def log_prompt(name, prompt):
+    """
+    Log the estimated size of the final prompt; returns it unchanged.
+    """
+    logger.info("Prompt %s: ~%d tokens, %d characters", name, estimate_tokens(prompt), len(prompt))
+    return prompt
@@ -0,0 +1,168 @@
+"""
+query_builder.py
+----------------
+SQLAlchemy Core building blocks for the role-scoped analysis queries.
+
+Every analysis fetcher needs the same three filters: role scope (a teacher only
+sees their own students, an admin sees everyone), an optional date range and,
+for some charts, the session mode. Instead of a teacher and an admin variant of
+each query with date predicates appended as strings, statements are built once
+at import time from these helpers and always carry every filter:
+
+    ERRORS = (
+        select(game_status.c.Results)
+        .where(scope_by_session(game_status.c.Session_ID))
+        .where(in_date_range(game_status.c.Game_Start))
+    )
+    rows = stream_rows(ERRORS, query_params(scope, start_dt, end_dt))
+
+A filter that is not in use is switched off by its parameter being NULL
+(`:admin_id IS NULL OR ...`), so one statement serves every role and date range
+and SQLAlchemy compiles it once (compiled cache). Teacher scope is an IN list of
+the teacher's cached student IDs (utils.student_scope) rather than a join, so
+MySQL sees one SQL string per fetcher and class size. Adding a filter dimension
+means one helper here plus one key in query_params().
+"""
+
+from dataclasses import dataclass
+
+from flask import has_request_context, session
+from sqlalchemy import Column, MetaData, Table, bindparam, or_, select
+
+from utils.attempt_summary import SUMMARY_COLUMNS, SUMMARY_TABLE
+from utils.student_scope import get_student_ids
+
+metadata = MetaData()
+
+plan_session = Table(
+    "IMA_Plan_Session",
+    metadata,
+    Column("Session_ID"),
+    Column("User_ID"),
+    Column("Results"),
+    Column("Session_Start"),
+)
+
+game_status = Table(
+    "IMA_Plan_Session_Game_Status",
+    metadata,
+    Column("Session_ID"),
+    Column("Plan_Game_ID"),
+    Column("Status"),
+    Column("Score"),
+    Column("Results"),
+    Column("Game_Start"),
+    Column("Game_End"),
+)
+
+account = Table(
+    "Account",
+    metadata,
+    Column("Id"),
+    Column("Username"),
+)
+
+attempt_summary = Table(
+    SUMMARY_TABLE,
+    metadata,
+    *(Column(name) for name in SUMMARY_COLUMNS),
+)
+
+# Shared parameters; values are supplied per execution by query_params()
+ADMIN_ID = bindparam("admin_id")
+STUDENT_IDS = bindparam("student_ids", expanding=True)
+START_DT = bindparam("start_dt")
+END_DT = bindparam("end_dt")
+
+SESSION_MODES = ("practice", "training", "assessment")
+
+
+@dataclass(frozen=True)
+class Scope:
+    """
+    Who the rows are for. Teachers are limited to their students; anyone else
+    (admin) sees every user.
+    """
+
+    role: str = None
+    user_id: object = None
+
+    @property
+    def admin_id(self):
+        return self.user_id if self.role == "teacher" else None
+
+    @property
+    def student_ids(self):
+        """
+        The teacher's students (cached, see utils.student_scope); empty for admins.
+        """
+        if self.admin_id is None:
+            return frozenset()
+        return get_student_ids(self.admin_id)
+
+
+def current_scope():
+    """
+    Scope of the logged-in user. Outside a request (e.g. on a fetch worker
+    thread) there is no session to read it from, so this raises instead of
+    falling back to an unrestricted scope; pass the scope explicitly there.
+    """
+    if not has_request_context():
+        raise RuntimeError(
+            "No request context for the query scope; pass scope= to the fetcher"
+        )
+    return Scope(session.get("role"), session.get("user_id"))
+
+
+def query_params(scope=None, start_dt=None, end_dt=None, **extra):
+    """
+    Parameters for a statement built from the helpers below.
+    """
+    scope = scope or current_scope()
+    return {
+        "admin_id": scope.admin_id,
+        "student_ids": list(scope.student_ids),
+        "start_dt": start_dt,
+        "end_dt": end_dt,
+        **extra,
+    }
+
+
+def scope_by_user(user_col):
+    """
+    Rows whose user belongs to the teacher in scope (no-op for admins).
+    """
+    return or_(ADMIN_ID.is_(None), user_col.in_(STUDENT_IDS))
+
+
+def scope_by_session(session_col):
+    """
+    Rows whose session belongs to a student of the teacher in scope (no-op for
+    admins). For tables without a user column, so admin queries need no join.
+    """
+    teacher_sessions = (
+        select(plan_session.c.Session_ID)
+        .where(plan_session.c.User_ID.in_(STUDENT_IDS))
+        .correlate(None)
+    )
+    return or_(ADMIN_ID.is_(None), session_col.in_(teacher_sessions))
+
+
+def in_date_range(date_col):
+    """
+    Inclusive start/end filter on one date column; either bound may be NULL.
+    """
+    return (
+        or_(START_DT.is_(None), date_col >= START_DT)
+        & or_(END_DT.is_(None), date_col <= END_DT)
+    )
+
+
+def session_mode_in(modes, results_col=None, mode_col=None):
+    """
+    Session mode filter. Pass the precomputed summary mode column when there is
+    one, otherwise the session Results column is matched as text.
+    """
+    if mode_col is not None:
+        return mode_col.in_(modes)
+    return or_(*(results_col.like(f"%{mode.capitalize()}%") for mode in modes))
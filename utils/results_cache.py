@@ -0,0 +1,320 @@
+"""
+results_cache.py
+----------------
+Two-tier cache of decoded game Results, keyed by attempt
+(Session_ID, Plan_Game_ID).
+
+The Results of an attempt do not change once it has ended (Game_End set), but
+several pages decode the same blobs: the /overall charts, the minigame error
+buckets and the per-user error list. A finished attempt that gets decoded in
+full is cut down with results_json.compact() and kept in:
+
+    1. a per-process LRU of decoded dicts (Config.RESULTS_CACHE_MEMORY_MB)
+    2. a SQLite file shared by the workers on the host
+       (Config.RESULTS_CACHE_PATH, capped at Config.RESULTS_CACHE_DISK_MB,
+       oldest entries evicted), holding the marshal-encoded form
+
+Callers select Results with their rows and look the rows up in bulk:
+
+    views = results_for_rows(rows)  # rows carrying Session_ID, Plan_Game_ID, Results, Game_End
+
+Hits come back already decoded. Misses are plain lazy views over the row's
+blob, so a reader of top-level scalars still never decodes the arrays; a
+finished attempt is cached the first time something decodes it in full.
+Attempts still in progress are never cached. Hit/miss counters are shown at
+/api/status/results-cache.
+"""
+
+from collections import OrderedDict
+import logging
+import marshal
+import os
+import sqlite3
+import threading
+
+from config import Config
+from utils.results_json import Results, compact
+
+logger = logging.getLogger(__name__)
+
+DISK_CHUNK = 400  # attempts per SQLite lookup (2 parameters each)
+DISK_FLUSH = 500  # newly decoded attempts buffered per SQLite write
+
+CREATE_DISK_TABLE = """
+    CREATE TABLE IF NOT EXISTS results (
+        session_id   INTEGER NOT NULL,
+        plan_game_id INTEGER NOT NULL,
+        body         BLOB    NOT NULL,
+        size         INTEGER NOT NULL,
+        PRIMARY KEY (session_id, plan_game_id)
+    )
+"""
+
+_memory = OrderedDict()  # key -> (compact dict or None, size in bytes)
+_memory_bytes = 0
+_pending = {}  # key -> marshal-encoded compact dict awaiting a disk write
+_lock = threading.Lock()
+_counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "decoded": 0, "evicted": 0}
+
+_local = threading.local()  # per-thread SQLite connection
+_disk = {"disabled": not Config.RESULTS_CACHE_PATH, "bytes": None}
+_disk_lock = threading.Lock()
+
+
+def _key(session_id, plan_game_id):
+    return int(session_id), int(plan_game_id)
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+# -- Memory tier --
+def _memory_get(keys):
+    found = {}
+    with _lock:
+        for key in keys:
+            entry = _memory.get(key)
+            if entry is not None:
+                _memory.move_to_end(key)
+                found[key] = entry[0]
+        _counters["memory_hits"] += len(found)
+    return found
+
+
+def _memory_put(entries):
+    # entries: {key: (compact dict or None, size)}
+    global _memory_bytes
+    limit = Config.RESULTS_CACHE_MEMORY_MB * 1024 * 1024
+    with _lock:
+        for key, entry in entries.items():
+            old = _memory.pop(key, None)
+            if old is not None:
+                _memory_bytes -= old[1]
+            _memory[key] = entry
+            _memory_bytes += entry[1]
+        while _memory_bytes > limit and _memory:
+            _, (_, size) = _memory.popitem(last=False)
+            _memory_bytes -= size
+            _counters["evicted"] += 1
+
+
+# -- Disk tier --
+def _disk_connection():
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        directory = os.path.dirname(Config.RESULTS_CACHE_PATH)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(Config.RESULTS_CACHE_PATH, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(CREATE_DISK_TABLE)
+        _local.conn = conn
+    return conn
+
+
+def _disk_failed(e):
+    if not _disk["disabled"]:
+        logger.warning(f"Results disk cache disabled: {e}")
+    _disk["disabled"] = True
+
+
+def _disk_get(keys):
+    if _disk["disabled"] or not keys:
+        return {}
+    found = {}
+    try:
+        conn = _disk_connection()
+        for chunk in _chunks(keys, DISK_CHUNK):
+            rows = conn.execute(
+                "SELECT session_id, plan_game_id, body FROM results "
+                "WHERE (session_id, plan_game_id) IN (VALUES "
+                + ",".join(["(?, ?)"] * len(chunk))
+                + ")",
+                [part for key in chunk for part in key],
+            )
+            for session_id, plan_game_id, body in rows:
+                found[(session_id, plan_game_id)] = body
+    except (sqlite3.Error, OSError) as e:
+        _disk_failed(e)
+        return {}
+    return found
+
+
+def _disk_put(bodies):
+    # bodies: {key: marshal-encoded compact dict}
+    if _disk["disabled"] or not bodies:
+        return
+    try:
+        conn = _disk_connection()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                [(*key, body, len(body)) for key, body in bodies.items()],
+            )
+        with _disk_lock:
+            if _disk["bytes"] is None:
+                _disk["bytes"] = conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+            else:
+                _disk["bytes"] += sum(len(body) for body in bodies.values())
+            if _disk["bytes"] > Config.RESULTS_CACHE_DISK_MB * 1024 * 1024:
+                _disk_evict(conn)
+    except (sqlite3.Error, OSError) as e:
+        _disk_failed(e)
+
+
+def _disk_delete(keys):
+    # Drop entries that can't be read back; they are decoded again as misses
+    if _disk["disabled"] or not keys:
+        return
+    logger.warning(f"Dropping {len(keys)} unreadable Results disk cache entries")
+    try:
+        conn = _disk_connection()
+        with conn:
+            conn.executemany(
+                "DELETE FROM results WHERE session_id = ? AND plan_game_id = ?", keys
+            )
+        with _disk_lock:
+            _disk["bytes"] = None  # recounted on the next write
+    except (sqlite3.Error, OSError) as e:
+        _disk_failed(e)
+
+
+def _disk_evict(conn):
+    # Drop the oldest entries (lowest rowid) down to 90% of the limit
+    target = Config.RESULTS_CACHE_DISK_MB * 1024 * 1024 * 0.9
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+    excess, last_rowid = total - target, None
+    for rowid, size in conn.execute("SELECT rowid, size FROM results ORDER BY rowid"):
+        if excess <= 0:
+            break
+        excess -= size
+        last_rowid = rowid
+    if last_rowid is not None:
+        with conn:
+            deleted = conn.execute("DELETE FROM results WHERE rowid <= ?", (last_rowid,)).rowcount
+        with _lock:
+            _counters["evicted"] += deleted
+    _disk["bytes"] = conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+
+# -- Lookups --
+def _lookup(keys):
+    """
+    {key: compact dict or None} for the cached keys, from memory then disk.
+    """
+    found = _memory_get(keys)
+    missing = [key for key in keys if key not in found]
+    promoted = {}
+    if missing:
+        unreadable = []
+        for key, body in _disk_get(missing).items():
+            try:
+                data = marshal.loads(body)
+            except (EOFError, ValueError, TypeError):
+                # Corrupt, or written by a Python with another marshal format
+                unreadable.append(key)
+                continue
+            found[key] = data
+            promoted[key] = (data, len(body))
+        _memory_put(promoted)
+        _disk_delete(unreadable)
+    with _lock:
+        _counters["disk_hits"] += len(promoted)
+        _counters["misses"] += len(keys) - len(found)
+    return found
+
+
+def _remember(key, data):
+    # Cache a finished attempt decoded by a reader; disk writes are batched
+    body = marshal.dumps(data)
+    _memory_put({key: (data, len(body))})
+    with _lock:
+        _counters["decoded"] += 1
+        _pending[key] = body
+        full = len(_pending) >= DISK_FLUSH
+    if full:
+        _flush_pending()
+
+
+def _flush_pending():
+    with _lock:
+        bodies = dict(_pending)
+        _pending.clear()
+    _disk_put(bodies)
+
+
+class _CachedOnDecode(Results):
+    """
+    Lazy view of a finished attempt that wasn't cached: read like any other
+    Results, and cached the first time it is decoded in full.
+    """
+
+    __slots__ = ("key",)
+
+    def __init__(self, raw, key):
+        super().__init__(raw)
+        self.key = key
+
+    @property
+    def data(self):
+        if self._data is self._UNSET:
+            _remember(self.key, compact(Results.data.fget(self)))
+        return self._data
+
+
+def results_for_rows(rows):
+    """
+    Results views for rows (mappings) that carry Session_ID, Plan_Game_ID,
+    Results and Game_End, in row order. Cached attempts skip decoding; the
+    others read the row's Results lazily.
+    """
+    if not Config.RESULTS_CACHE_ENABLED:
+        return [Results(row["Results"]) for row in rows]
+
+    _flush_pending()
+    keys = [_key(row["Session_ID"], row["Plan_Game_ID"]) for row in rows]
+    found = _lookup(list(dict.fromkeys(keys)))
+    views = []
+    for key, row in zip(keys, rows):
+        if key in found:
+            views.append(Results.from_data(found[key]))
+        elif row["Game_End"] is not None:
+            views.append(_CachedOnDecode(row["Results"], key))
+        else:
+            views.append(Results(row["Results"]))
+    return views
+
+
+def get_cache_stats():
+    """
+    Hit/miss counters and sizes of this worker's cache.
+    """
+    with _lock:
+        stats = dict(_counters)
+        stats.update(memory_entries=len(_memory), memory_bytes=_memory_bytes)
+    lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+    stats["hit_rate"] = round((lookups - stats["misses"]) / lookups, 4) if lookups else 0.0
+    stats["disk_enabled"] = not _disk["disabled"]
+    stats["disk_bytes"] = _disk["bytes"]
+    return stats
+
+
+def clear():
+    """
+    Empty both tiers (e.g. after Results were corrected in place).
+    """
+    global _memory_bytes
+    with _lock:
+        _memory.clear()
+        _memory_bytes = 0
+        _pending.clear()
+    if not _disk["disabled"]:
+        try:
+            conn = _disk_connection()
+            with conn:
+                conn.execute("DELETE FROM results")
+            _disk["bytes"] = 0
+        except (sqlite3.Error, OSError) as e:
+            _disk_failed(e)
@@ -0,0 +1,315 @@
+"""
+results_json.py
+---------------
+Shared decoding of IMA_Plan_Session_Game_Status.Results.
+
+A Results blob is mostly large arrays (errors.good, gameEvent, the error
+entries) while most readers only want a few top-level scalars. Wrap a blob in
+Results(raw) and use the typed accessors:
+
+    results = Results(row.Results)
+    if results.valid:
+        results.score(0), results.status(""), results.error_count("minor")
+
+Scalar accessors first scan the object's top-level keys up to the first array
+and stop there, so the arrays are never decoded. When a scalar is not found
+before the first array, or for anything under "errors", the blob is decoded
+in full, once per Results. Full decodes use the fastest installed backend
+(orjson, then ujson, then the standard json module), chosen by
+Config.RESULTS_JSON_BACKEND.
+"""
+
+import json
+import logging
+import re
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Top-level scalar keys read through the accessors; probed in one scan
+SCALAR_KEYS = frozenset(
+    {
+        "final-score",
+        "max-score",
+        "max_score",
+        "total-time",
+        "accuracy",
+        "status",
+        "level_name",
+        "game",
+        "warning-count",
+        "minor-count",
+        "severe-count",
+    }
+)
+
+# Fields of an errors entry the analyses read (time bins, text/type buckets)
+ERROR_ENTRY_KEYS = ("text", "type", "time")
+
+# JSON's own whitespace, string and number grammar (no control characters in
+# strings, no leading zeros), so the probe accepts only what json.loads accepts
+_WS = r"[ \t\n\r]*"
+_STRING = r'"(?:[^"\\\x00-\x1f]|\\["\\/bfnrt]|\\u[0-9a-fA-F]{4})*"'
+_NUMBER = r"-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?"
+_OPEN = re.compile(_WS + r"\{")
+_CLOSE = re.compile(_WS + r"\}")
+_COMMA = re.compile(_WS + ",")
+# One member: key, then a scalar value or the opening bracket of a container
+_MEMBER = re.compile(
+    rf"""{_WS}({_STRING}){_WS}:{_WS}(?:({_STRING}|{_NUMBER}|true|false|null)|([\[{{]))"""
+)
+
+
+def _select_backend(name):
+    if name in ("auto", "orjson"):
+        try:
+            import orjson
+
+            return "orjson", orjson.loads
+        except ImportError:
+            pass
+    if name in ("auto", "ujson"):
+        try:
+            import ujson
+
+            return "ujson", ujson.loads
+        except ImportError:
+            pass
+    if name not in ("auto", "json"):
+        logger.warning("JSON backend %r is not installed, using json", name)
+    return "json", json.loads
+
+
+BACKEND, _fast_loads = _select_backend(Config.RESULTS_JSON_BACKEND)
+
+
+def loads(raw):
+    """
+    Decode JSON with the configured backend. Raises ValueError if it is invalid.
+    """
+    try:
+        return _fast_loads(raw)
+    except ValueError:
+        if _fast_loads is json.loads:
+            raise
+        # The standard module also accepts NaN/Infinity and big integers
+        return json.loads(raw)
+
+
+def decode(raw):
+    """
+    Results as a dict, or None when missing, invalid or not a JSON object.
+    """
+    if not raw:
+        return None
+    try:
+        data = loads(raw)
+    except (TypeError, ValueError):
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def compact(data):
+    """
+    The part of a decoded Results dict the analyses read: top-level scalars and
+    the errors entries cut down to ERROR_ENTRY_KEYS. gameEvent and any other
+    container is dropped. Used as the cached form (utils.results_cache).
+    """
+    if data is None:
+        return None
+    out = {key: value for key, value in data.items() if not isinstance(value, (dict, list))}
+    errors = data.get("errors")
+    if isinstance(errors, dict):
+        out["errors"] = {
+            category: [
+                {k: entry[k] for k in ERROR_ENTRY_KEYS if k in entry}
+                if isinstance(entry, dict)
+                else entry
+                for entry in entries
+            ]
+            if isinstance(entries, list)
+            else entries
+            for category, entries in errors.items()
+        }
+    return out
+
+
+def probe_scalars(raw, keys=SCALAR_KEYS):
+    """
+    Read the wanted top-level scalar members without decoding any array.
+    Returns ({key: value}, complete): complete is True when the whole object was
+    scanned (so missing keys are absent), False when the scan stopped at the
+    first array or at a wanted key whose value is an object (missing keys may
+    follow it). Returns None when the scanned
+    part is not a JSON object, when text follows the object, or, after a stop
+    at an array, when the blob does not end with "}" (truncated or trailing
+    text). Values the probe can't decode (NaN, Infinity, a malformed string
+    or number) also return None; Results then falls back to a full decode.
+    """
+    match = _OPEN.match(raw)
+    if not match:
+        return None
+    # One entry per open object: True until its first member has been read
+    pos, first, found = match.end(), [True], {}
+    while True:
+        match = _CLOSE.match(raw, pos)
+        if match:
+            pos = match.end()
+            first.pop()
+            if not first:
+                return (found, True) if not raw[pos:].strip(" \t\n\r") else None
+            continue
+        if not first[-1]:
+            # Every member after the first needs its comma
+            match = _COMMA.match(raw, pos)
+            if not match:
+                return None
+            pos = match.end()
+        match = _MEMBER.match(raw, pos)
+        if not match:
+            return None
+        pos = match.end()
+        first[-1] = False
+        key, scalar, opener = match.groups()
+        if len(first) == 1:
+            try:
+                key = json.loads(key) if "\\" in key else key[1:-1]
+                if key in keys and not opener:
+                    found[key] = json.loads(scalar)
+            except ValueError:
+                # e.g. an integer past Python's int digit limit
+                return None
+        # Stop at the first array, or at a wanted key holding an object (left
+        # to the full decode)
+        if opener == "[" or opener and len(first) == 1 and key in keys:
+            return (found, False) if raw.rstrip(" \t\n\r").endswith("}") else None
+        if opener == "{":
+            first.append(True)
+
+
+class Results:
+    """
+    Lazily decoded view of one Results blob.
+    """
+
+    __slots__ = ("raw", "_data", "_scalars")
+
+    _UNSET = object()
+
+    def __init__(self, raw):
+        self.raw = raw
+        self._data = self._UNSET
+        self._scalars = self._UNSET
+
+    @classmethod
+    def from_data(cls, data):
+        """
+        View over an already decoded (e.g. cached compact) dict, or None.
+        """
+        results = cls(None)
+        results._data = data
+        return results
+
+    @property
+    def data(self):
+        """
+        The fully decoded dict, or None when missing or not a JSON object.
+        """
+        if self._data is self._UNSET:
+            self._data = decode(self.raw)
+            if self._data is None:
+                # A probe that passed was wrong about the rest of the blob
+                self._scalars = None
+        return self._data
+
+    def _probe(self):
+        # (members found before the first array, complete) or None if invalid
+        if self._scalars is self._UNSET:
+            probed = None
+            if self._data is self._UNSET and isinstance(self.raw, str):
+                probed = probe_scalars(self.raw)
+            if probed is None:
+                # Already decoded, or a blob the probe can't read (e.g. NaN):
+                # the full decode decides, as it would for any other reader
+                data = self.data
+                probed = None if data is None else (data, True)
+            self._scalars = probed
+        return self._scalars
+
+    @property
+    def valid(self):
+        """
+        True when Results is a JSON object. Until something outside the scalars
+        is read, the part before the first array is parsed and the blob must end
+        with "}"; anything malformed inside the arrays is only caught by the full
+        decode, after which valid is False.
+        """
+        return self._probe() is not None
+
+    def get(self, key, default=None):
+        """
+        A top-level member; scalars in SCALAR_KEYS are probed before decoding.
+        """
+        if key in SCALAR_KEYS:
+            probed = self._probe()
+            if probed is None:
+                return default
+            members, complete = probed
+            if key in members or complete:
+                return members.get(key, default)
+        data = self.data
+        return default if data is None else data.get(key, default)
+
+    def score(self, default=None):
+        return self.get("final-score", default)
+
+    def max_score(self, default=None):
+        return self.get("max-score") or self.get("max_score") or default
+
+    def total_time(self, default=None):
+        return self.get("total-time", default)
+
+    def accuracy(self, default=None):
+        return self.get("accuracy", default)
+
+    def status(self, default=None):
+        return self.get("status", default)
+
+    def level_name(self, default=None):
+        return self.get("level_name", default)
+
+    def game(self, default=None):
+        return self.get("game", default)
+
+    def errors(self, category):
+        """
+        The entries of errors.<category> ([] when missing, or when errors is not
+        an object or the category not a list).
+        """
+        data = self.data
+        errors = None if data is None else data.get("errors")
+        if not isinstance(errors, dict):
+            return []
+        entries = errors.get(category)
+        return entries if isinstance(entries, list) else []
+
+    def error_count(self, category):
+        return len(self.errors(category))
+
+    def error_counts(self, categories=("warning", "minor", "severe")):
+        return {category: self.error_count(category) for category in categories}
+
+    def error_times(self, category):
+        """
+        The times of the errors.<category> entries that have one.
+        """
+        return [
+            err["time"]
+            for err in self.errors(category)
+            if isinstance(err, dict) and _is_time(err.get("time"))
+        ]
+
+
+def _is_time(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
@@ -0,0 +1,62 @@
+"""
+student_scope.py
+----------------
+Cached student sets for teacher-scoped queries.
+
+A teacher only sees the students linked to them in IMA_Admin_User. That set is
+small and rarely changes, so it is resolved once (at login, or on first use)
+and kept per process as a frozenset of User_IDs for Config.STUDENT_SCOPE_TTL
+seconds. Queries filter with `User_ID IN :student_ids` and in-memory code can
+test membership directly, instead of every query joining IMA_Admin_User.
+
+Call invalidate_student_ids() after changing a teacher's students.
+"""
+
+import logging
+import threading
+import time
+
+from sqlalchemy import text
+
+from config import Config
+from utils.db import read_connection
+
+logger = logging.getLogger(__name__)
+
+STUDENTS_OF_ADMIN = text("SELECT User_ID FROM IMA_Admin_User WHERE Admin_ID = :admin_id")
+
+_cache = {}  # admin_id -> (expires_at, frozenset of User_IDs)
+_lock = threading.Lock()
+
+
+def get_student_ids(admin_id, refresh=False):
+    """
+    User_IDs of the teacher's students, from cache unless expired or refresh=True.
+    """
+    now = time.monotonic()
+    if not refresh:
+        with _lock:
+            entry = _cache.get(admin_id)
+        if entry and entry[0] > now:
+            return entry[1]
+
+    with read_connection() as conn:
+        student_ids = frozenset(
+            conn.execute(STUDENTS_OF_ADMIN, {"admin_id": admin_id}).scalars()
+        )
+
+    with _lock:
+        _cache[admin_id] = (now + Config.STUDENT_SCOPE_TTL, student_ids)
+    logger.info("Resolved %d students for teacher %s", len(student_ids), admin_id)
+    return student_ids
+
+
+def invalidate_student_ids(admin_id=None):
+    """
+    Drop one teacher's cached students, or every teacher's when admin_id is None.
+    """
+    with _lock:
+        if admin_id is None:
+            _cache.clear()
+        else:
+            _cache.pop(admin_id, None)
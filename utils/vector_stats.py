@@ -0,0 +1,161 @@
+"""
+vector_stats.py
+---------------
+Array kernels for the hot aggregation loops: error time binning and score
+statistics.
+
+When NumPy is installed (`pip install numpy`) and Config.VECTOR_STATS_BACKEND
+allows it, large inputs are reduced over typed arrays: np.bincount per error
+category for time bins, integer sums and min/max for scores. Otherwise, and for
+inputs too small to be worth converting, the same results are computed in
+Python. Both paths return identical values; inputs an array would change
+(Decimal, bool, NaN, non-integer scores) always take the Python path.
+
+Compare the two paths on synthetic data with:
+
+    python -m utils.vector_stats
+"""
+
+import logging
+from statistics import mean
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Below this many values the array conversion costs more than it saves
+MIN_VECTOR_SIZE = 64
+
+
+def _select_backend(name):
+    if name in ("auto", "numpy"):
+        try:
+            import numpy
+
+            return "numpy", numpy
+        except ImportError:
+            pass
+    if name not in ("auto", "python"):
+        logger.warning("Stats backend %r is not installed, using python", name)
+    return "python", None
+
+
+BACKEND, np = _select_backend(Config.VECTOR_STATS_BACKEND)
+
+
+def _array(values, kinds):
+    # Typed array of values when NumPy is used and their dtype kind is allowed
+    if np is None or not len(values) or len(values) < MIN_VECTOR_SIZE:
+        return None
+    try:
+        arr = np.asarray(values)
+    except (OverflowError, TypeError, ValueError):
+        return None
+    if arr.ndim != 1 or arr.dtype.kind not in kinds:
+        return None
+    if arr.dtype.kind == "f" and not np.isfinite(arr).all():
+        return None
+    return arr
+
+
+# -- Time binning --
+def bin_times(times_by_key, bin_size, counts=None):
+    """
+    Count times into bin_size-wide bins, per key. Adds to counts
+    ({bin_start: {key: n}}, a new dict when None) and returns (counts, max_time),
+    max_time being the largest time seen (0 when none is positive).
+    Bins are only created where a time falls.
+    """
+    counts = {} if counts is None else counts
+    keys = tuple(times_by_key)
+    max_time = 0
+    for key, times in times_by_key.items():
+        arr = _array(times, "iuf")
+        if arr is None:
+            key_max = _bin_python(times, key, keys, bin_size, counts)
+        else:
+            key_max = _bin_numpy(arr, key, keys, bin_size, counts)
+        if key_max > max_time:
+            max_time = key_max
+    return counts, max_time
+
+
+def _bin_python(times, key, keys, bin_size, counts):
+    max_time = 0
+    for t in times:
+        bin_start = int(t // bin_size) * bin_size
+        if bin_start not in counts:
+            counts[bin_start] = dict.fromkeys(keys, 0)
+        counts[bin_start][key] += 1
+        if t > max_time:
+            max_time = t
+    return max_time
+
+
+def _bin_numpy(arr, key, keys, bin_size, counts):
+    bins = np.floor_divide(arr, bin_size).astype(np.int64)
+    offset = int(bins.min())
+    per_bin = np.bincount(bins - offset)
+    for index in np.flatnonzero(per_bin).tolist():
+        bin_start = (index + offset) * bin_size
+        if bin_start not in counts:
+            counts[bin_start] = dict.fromkeys(keys, 0)
+        counts[bin_start][key] += int(per_bin[index])
+    return arr.max().item()
+
+
+# -- Score statistics --
+def score_stats(scores):
+    """
+    (mean, min, max) of the scores as statistics.mean/min/max give them, or
+    (None, None, None) when there are none.
+    """
+    if not scores:
+        return None, None, None
+    arr = _array(scores, "i")
+    if arr is None:
+        return mean(scores), min(scores), max(scores)
+    total, n = int(arr.sum(dtype=np.int64)), arr.size
+    # statistics.mean returns an int when integer scores divide evenly
+    average = total // n if total % n == 0 else total / n
+    return average, arr.min().item(), arr.max().item()
+
+
+# -- Benchmark --
+def _benchmark(n=1_000_000, repeat=3):
+    import random
+    import timeit
+
+    global np
+    rng = random.Random(7)
+    times = {
+        key: [round(rng.uniform(0, 600), 2) for _ in range(n // 3)]
+        for key in ("warnings", "minors", "severes")
+    }
+    scores = [rng.randint(0, 100) for _ in range(n)]
+
+    cases = {
+        "bin_times": lambda: bin_times(times, 5),
+        "score_stats": lambda: score_stats(scores),
+    }
+    numpy_module = np
+    print(f"{n:,} values, best of {repeat}")
+    for name, case in cases.items():
+        np = None
+        python_result = case()
+        python_time = min(timeit.repeat(case, number=1, repeat=repeat))
+        np = numpy_module
+        if np is None:
+            print(f"{name:14} python {python_time * 1000:8.1f} ms   (numpy not installed)")
+            continue
+        numpy_result = case()
+        numpy_time = min(timeit.repeat(case, number=1, repeat=repeat))
+        same = "identical" if numpy_result == python_result else "DIFFERENT"
+        print(
+            f"{name:14} python {python_time * 1000:8.1f} ms   numpy {numpy_time * 1000:8.1f} ms"
+            f"   x{python_time / numpy_time:5.1f}   {same}"
+        )
+
+
+if __name__ == "__main__":
+    _benchmark()